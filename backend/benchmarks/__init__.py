@@ -0,0 +1 @@
+"""Benchmarks, load generators and performance checks for the billing API."""
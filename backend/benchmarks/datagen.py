@@ -0,0 +1,303 @@
+"""
+Bulk synthetic data generator for benchmarks.
+
+Seeds users, merchants, stores, categories, products, store inventory, bills,
+bill items and payments with Core executemany inserts in chunks of
+``--chunk-size`` rows. Primary keys are assigned up front, so child rows never
+have to read their parents back. Output is deterministic for a given --seed.
+
+Sizes follow --users: one merchant per 200 users with two stores each, one
+product per 20 users, five bills per user with one to five items, and a
+payment on about 60% of bills. --users 1000000 gives ~5M bills and ~15M items.
+
+Usage:
+    python -m benchmarks.datagen --users 100000 [--database sqlite:///bench.db] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, time as dt_time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import func, select
+from src.extensions import db, init_db, create_missing_indexes
+
+STORES_PER_MERCHANT = 2
+USERS_PER_MERCHANT = 200
+USERS_PER_PRODUCT = 20
+BILLS_PER_USER = 5
+INVENTORY_PER_STORE = 200
+CATEGORY_ROOTS = 10
+CATEGORY_CHILDREN = 5
+PAYMENT_METHODS = ('cash', 'upi', 'card')
+BILL_STATUSES = ('pending', 'paid', 'partially_paid', 'overdue')
+CITIES = ('Mumbai', 'Delhi', 'Bengaluru', 'Hyderabad', 'Chennai', 'Pune', 'Kolkata', 'Jaipur')
+
+
+def build_app(database_uri=None):
+    app = Flask(__name__)
+    if database_uri:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_db(app)
+    return app
+
+
+class Generator:
+    """Writes one synthetic data set with a fixed seed."""
+
+    def __init__(self, users, seed=1, chunk_size=10000):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.now = datetime.utcnow().replace(microsecond=0)
+
+        self.users = users
+        self.merchants = max(1, users // USERS_PER_MERCHANT)
+        self.stores = self.merchants * STORES_PER_MERCHANT
+        self.products = max(50, users // USERS_PER_PRODUCT)
+        self.categories = CATEGORY_ROOTS * (1 + CATEGORY_CHILDREN)
+        self.bills = users * BILLS_PER_USER
+        self.prices = {}
+
+    def _insert(self, table_name, rows):
+        """Insert rows in chunks, returning how many were written."""
+        table = db.metadata.tables[table_name]
+        written = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                with db.engine.begin() as connection:
+                    connection.execute(table.insert(), chunk)
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            with db.engine.begin() as connection:
+                connection.execute(table.insert(), chunk)
+            written += len(chunk)
+        return written
+
+    def _stamp(self):
+        return {'created_at': self.now, 'updated_at': self.now}
+
+    def user_rows(self):
+        for user_id in range(1, self.users + 1):
+            yield {
+                'id': user_id,
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'phone_number': f'9{user_id:09d}',
+                'password_hash': 'x',
+                'first_name': 'User',
+                'last_name': str(user_id),
+                'is_active': True,
+                **self._stamp()
+            }
+
+    def merchant_rows(self):
+        for merchant_id in range(1, self.merchants + 1):
+            yield {
+                'id': merchant_id,
+                'business_name': f'Merchant {merchant_id} Stores',
+                'gst_number': f'GST{merchant_id:012d}',
+                'email': f'merchant{merchant_id}@example.com',
+                'phone_number': f'8{merchant_id:09d}',
+                'password_hash': 'x',
+                'is_active': True,
+                'is_verified': True,
+                **self._stamp()
+            }
+
+    def store_rows(self):
+        for store_id in range(1, self.stores + 1):
+            yield {
+                'id': store_id,
+                'merchant_id': (store_id - 1) // STORES_PER_MERCHANT + 1,
+                'store_name': f'Store {store_id}',
+                'address_line1': f'{store_id} Market Road',
+                'city': self.rng.choice(CITIES),
+                'state': 'State',
+                'postal_code': f'{400000 + store_id % 100000:06d}',
+                'country': 'India',
+                'location': f'{self.rng.uniform(8, 35):.5f},{self.rng.uniform(68, 97):.5f}',
+                'opening_time': dt_time(8, 0),
+                'closing_time': dt_time(22, 0),
+                'is_active': True,
+                **self._stamp()
+            }
+
+    def category_rows(self):
+        category_id = 0
+        for root in range(CATEGORY_ROOTS):
+            category_id += 1
+            root_id = category_id
+            yield {'id': root_id, 'name': f'Category {root_id}', 'parent_category_id': None, **self._stamp()}
+            for _ in range(CATEGORY_CHILDREN):
+                category_id += 1
+                yield {'id': category_id, 'name': f'Category {category_id}', 'parent_category_id': root_id, **self._stamp()}
+
+    def product_rows(self):
+        for product_id in range(1, self.products + 1):
+            price = round(self.rng.uniform(5, 2000), 2)
+            self.prices[product_id] = price
+            yield {
+                'id': product_id,
+                'name': f'Product {product_id}',
+                'category_id': self.rng.randint(1, self.categories),
+                'base_price': price,
+                'tax_rate': self.rng.choice((0, 5, 12, 18)),
+                'sku': f'SKU{product_id:08d}',
+                'barcode': f'89{product_id:011d}',
+                **self._stamp()
+            }
+
+    def inventory_rows(self):
+        per_store = min(INVENTORY_PER_STORE, self.products)
+        for store_id in range(1, self.stores + 1):
+            merchant_id = (store_id - 1) // STORES_PER_MERCHANT + 1
+            for product_id in self.rng.sample(range(1, self.products + 1), per_store):
+                yield {
+                    'merchant_id': merchant_id,
+                    'store_id': store_id,
+                    'product_id': product_id,
+                    'stock_quantity': self.rng.randint(100, 100000),
+                    'price': self.prices[product_id],
+                    'is_available': True,
+                    **self._stamp()
+                }
+
+    def bill_batches(self):
+        """Yield (bills, items, payments) row lists one chunk of bills at a time."""
+        item_id = 0
+        payment_id = 0
+        bills, items, payments = [], [], []
+
+        for bill_id in range(1, self.bills + 1):
+            store_id = self.rng.randint(1, self.stores)
+            bill_date = self.now - timedelta(seconds=self.rng.randint(0, 365 * 86400))
+            total = 0.0
+            tax = 0.0
+
+            for _ in range(self.rng.randint(1, 5)):
+                item_id += 1
+                product_id = self.rng.randint(1, self.products)
+                quantity = self.rng.randint(1, 5)
+                unit_price = self.prices[product_id]
+                item_tax = round(quantity * unit_price * 0.05, 2)
+                item_total = round(quantity * unit_price + item_tax, 2)
+                total += item_total
+                tax += item_tax
+                items.append({
+                    'id': item_id,
+                    'bill_id': bill_id,
+                    'product_id': product_id,
+                    'product_name': f'Product {product_id}',
+                    'quantity': quantity,
+                    'unit_price': unit_price,
+                    'tax_rate': 5,
+                    'tax_amount': item_tax,
+                    'discount_amount': 0,
+                    'total_amount': item_total,
+                    'created_at': bill_date
+                })
+
+            status = self.rng.choice(BILL_STATUSES)
+            bills.append({
+                'id': bill_id,
+                'bill_number': f'BILL-{bill_id:012d}',
+                'merchant_id': (store_id - 1) // STORES_PER_MERCHANT + 1,
+                'store_id': store_id,
+                'user_id': (bill_id - 1) // BILLS_PER_USER + 1,
+                'bill_date': bill_date,
+                'total_amount': round(total, 2),
+                'tax_amount': round(tax, 2),
+                'discount_amount': 0,
+                'status': status,
+                'created_at': bill_date,
+                'updated_at': bill_date
+            })
+
+            if status != 'pending' and self.rng.random() < 0.8:
+                payment_id += 1
+                payments.append({
+                    'id': payment_id,
+                    'bill_id': bill_id,
+                    'payment_method': self.rng.choice(PAYMENT_METHODS),
+                    'amount': round(total if status == 'paid' else total / 2, 2),
+                    'payment_date': bill_date,
+                    'status': 'completed',
+                    'created_at': bill_date
+                })
+
+            if len(bills) >= self.chunk_size:
+                yield bills, items, payments
+                bills, items, payments = [], [], []
+
+        if bills:
+            yield bills, items, payments
+
+    def run(self, report=print):
+        """Write the whole data set, reporting rows and rate per table."""
+        steps = (
+            ('users', self.user_rows),
+            ('merchants', self.merchant_rows),
+            ('store_locations', self.store_rows),
+            ('product_categories', self.category_rows),
+            ('products', self.product_rows),
+            ('merchant_inventory', self.inventory_rows),
+        )
+        for table_name, rows in steps:
+            started = time.perf_counter()
+            written = self._insert(table_name, rows())
+            report(f'{table_name}: {written} rows in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        counts = {'bills': 0, 'bill_items': 0, 'payments': 0}
+        for bills, items, payments in self.bill_batches():
+            with db.engine.begin() as connection:
+                connection.execute(db.metadata.tables['bills'].insert(), bills)
+                connection.execute(db.metadata.tables['bill_items'].insert(), items)
+                if payments:
+                    connection.execute(db.metadata.tables['payments'].insert(), payments)
+            counts['bills'] += len(bills)
+            counts['bill_items'] += len(items)
+            counts['payments'] += len(payments)
+        elapsed = time.perf_counter() - started
+        report(', '.join(f'{name}: {count} rows' for name, count in counts.items()) + f' in {elapsed:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--database', default=None, help='defaults to DATABASE_URL')
+    args = parser.parse_args()
+
+    app = build_app(args.database)
+    with app.app_context():
+        db.create_all()
+        create_missing_indexes()
+        if db.session.execute(select(func.count()).select_from(db.metadata.tables['users'])).scalar():
+            sys.exit('Target database already has users; generate into an empty database')
+
+        started = time.perf_counter()
+        Generator(args.users, seed=args.seed, chunk_size=args.chunk_size).run()
+
+        # Search indexes, the category closure and planner statistics are built once after the load
+        from src.models.search_service import SearchService
+        from src.models.category_service import CategoryService
+        SearchService.ensure_indexes()
+        CategoryService.ensure_closure()
+        if db.engine.dialect.name in ('sqlite', 'postgresql'):
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql('ANALYZE')
+
+        print(f'Done in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+Scenario benchmarks for the billing API.
+
+Runs the scenarios in benchmarks/scenarios.py against a database produced by
+benchmarks.datagen, either in-process through the Flask test client or over
+HTTP against the production launcher (src/serve.py) with several worker
+processes, and reports p50/p95/p99 latency, throughput and SQL statements per
+request for each scenario.
+Statement counts come from the Server-Timing header, so METRICS_DEBUG_HEADER
+is switched on for the app under test.
+
+Results can be saved as a baseline and later runs compared against it: a
+scenario regresses when its p95 grows by more than --tolerance or it runs more
+statements per request or fails more requests, and the runner then exits
+non-zero. Failed requests are counted in the report rather than stopping the run.
+
+Usage:
+    python -m benchmarks.run --database sqlite:///bench.db [--target client|server]
+        [--workers 4] [--threads 4] [--concurrency 16] [--iterations 500] [--scenarios bill_list,link_click]
+        [--save-baseline baseline.json | --baseline baseline.json [--tolerance 0.2]]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STATEMENTS = re.compile(r'desc="(\d+) statements"')
+SERVER_BOOT_SECONDS = 60
+QUERY_SLACK = 0.1  # relative
+ERROR_RATE_SLACK = 0.01
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarise(samples, elapsed):
+    """
+    Summarise one scenario run.
+
+    Args:
+        samples: List of (seconds, status, statements) per request
+        elapsed: Wall-clock seconds for the whole run
+
+    Returns:
+        dict: Request count, errors, latency percentiles in ms, rps and statements per request
+    """
+    latencies = sorted(seconds for seconds, _, _ in samples)
+    statements = [count for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 400),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(sum(statements) / len(statements), 2) if statements else None,
+    }
+
+
+def _statement_count(server_timing):
+    match = STATEMENTS.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class ClientTarget:
+    """Sends requests in-process through the Flask test client, one at a time."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, requests, concurrency):
+        samples = []
+        for method, url, body in requests:
+            started = time.perf_counter()
+            response = self.client.open(url, method=method, json=body, headers={'X-Debug-Timing': '1'})
+            samples.append((
+                time.perf_counter() - started,
+                response.status_code,
+                _statement_count(response.headers.get('Server-Timing'))
+            ))
+        return samples
+
+
+class ServerTarget:
+    """Runs the production launcher (src/serve.py) with N workers and sends requests over HTTP."""
+
+    def __init__(self, workers, port, threads):
+        self.port = port
+        self.command = [
+            sys.executable, '-m', 'src.serve', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--threads', str(threads)
+        ]
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=BACKEND_DIR, env=os.environ.copy())
+        deadline = time.monotonic() + SERVER_BOOT_SECONDS
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/api/health', timeout=1).close()
+                return self
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > deadline or self.process.poll() is not None:
+                    self.__exit__()
+                    raise RuntimeError(f'Server on port {self.port} did not start')
+                time.sleep(0.1)
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            self.process.terminate()
+        self.process.wait()
+        return False
+
+    def _send(self, request):
+        method, url, body = request
+        data = json.dumps(body).encode() if body is not None else None
+        outgoing = urllib.request.Request(
+            f'http://127.0.0.1:{self.port}{url}', data=data, method=method,
+            headers={'Content-Type': 'application/json', 'X-Debug-Timing': '1'}
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(outgoing, timeout=30) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            status, headers = e.code, e.headers
+        return time.perf_counter() - started, status, _statement_count(headers.get('Server-Timing'))
+
+    def run(self, requests, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(self._send, requests))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a saved baseline.
+
+    Returns:
+        list: Regression descriptions, empty if none
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        print(f"  {name:<16} p95 {before['p95_ms']:>9.2f} -> {result['p95_ms']:>9.2f} ms ({change:+.0%})  "
+              f"queries {before['queries_per_request']} -> {result['queries_per_request']}")
+        if change > tolerance:
+            regressions.append(f'{name}: p95 {change:+.0%} exceeds {tolerance:.0%}')
+        if result['errors'] / result['requests'] > before['errors'] / before['requests'] + ERROR_RATE_SLACK:
+            regressions.append(f"{name}: {result['errors']} errors, was {before['errors']}")
+        # Means over random rows wobble a little, an extra query per request does not
+        queries, queries_before = result['queries_per_request'] or 0, before['queries_per_request'] or 0
+        if queries > queries_before * (1 + QUERY_SLACK) and queries - queries_before >= 0.5:
+            regressions.append(f"{name}: {result['queries_per_request']} statements per request, "
+                               f"was {before['queries_per_request']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default=None, help='defaults to DATABASE_URL')
+    parser.add_argument('--target', choices=('client', 'server'), default='client')
+    parser.add_argument('--workers', type=int, default=4, help='server worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='request threads per server worker')
+    parser.add_argument('--port', type=int, default=5101, help='server port')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent requests for the server target')
+    parser.add_argument('--iterations', type=int, default=300, help='requests per scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per scenario')
+    parser.add_argument('--scenarios', default=None, help='comma-separated, defaults to all')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help='compare against this saved result')
+    parser.add_argument('--save-baseline', help='save this result as a baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 growth over the baseline')
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time, for this process and the server workers
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    os.environ.pop('DATABASE_REPLICA_URLS', None)
+    os.environ['METRICS_DEBUG_HEADER'] = '1'
+    os.environ.setdefault('SLOW_QUERY_LOG', '0')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    os.environ.setdefault('AUTH_ENABLED', '0')
+
+    from src.main import create_app
+    from benchmarks.scenarios import SCENARIOS, Fixtures
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        fixtures = Fixtures.load(rng)
+
+    target = ClientTarget(app) if args.target == 'client' else ServerTarget(args.workers, args.port, args.threads)
+    results = {}
+    with target:
+        print(f"{'scenario':<16} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'rps':>8} {'queries':>8}")
+        for name in names:
+            build = SCENARIOS[name]
+            target.run([build(rng, fixtures) for _ in range(args.warmup)], args.concurrency)
+
+            requests = [build(rng, fixtures) for _ in range(args.iterations)]
+            started = time.perf_counter()
+            samples = target.run(requests, args.concurrency)
+            result = results[name] = summarise(samples, time.perf_counter() - started)
+            print(f"{name:<16} {result['requests']:>8} {result['errors']:>6} {result['p50_ms']:>9.2f} "
+                  f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['rps']:>8} "
+                  f"{result['queries_per_request']!s:>8}")
+
+    report = {
+        'target': args.target,
+        'workers': args.workers if args.target == 'server' else 1,
+        'threads': args.threads if args.target == 'server' else 1,
+        'concurrency': args.concurrency if args.target == 'server' else 1,
+        'iterations': args.iterations,
+        'scenarios': results,
+    }
+    failed = False
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, indent=2)
+        print(f'Saved baseline to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        if baseline.get('target') != args.target:
+            print(f"Warning: baseline was measured against the {baseline.get('target')} target")
+        print(f'Compared with {args.baseline}:')
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'  REGRESSION {regression}')
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Request scenarios for the benchmark runner.
+
+Each scenario is a function ``(rng, fixtures) -> (method, url, json body)``
+that builds one request against existing data. Fixtures sample real rows from
+the database once, so the same scenarios work against any generated data set.
+"""
+from sqlalchemy import func, select
+from src.extensions import db
+from src.models.sms_service import SMSService
+
+
+class Fixtures:
+    """Rows sampled from the benchmark database for building requests."""
+
+    def __init__(self, bills, inventory, tokens, user_bills):
+        self.bills = bills  # [(bill_id, user_id)]
+        self.user_bills = user_bills  # [(user_id, [bill_id, ...])]
+        self.inventory = inventory  # [(merchant_id, store_id, product_id, price)]
+        self.tokens = tokens
+
+    @staticmethod
+    def _sample_ids(table, rng, size):
+        highest = db.session.execute(select(func.max(table.c.id))).scalar() or 0
+        return rng.sample(range(1, highest + 1), min(size, highest))
+
+    @classmethod
+    def load(cls, rng, size=500, tokens=200):
+        """
+        Sample bills and inventory rows and issue SMS link tokens.
+
+        Must run inside an app context. Issuing tokens writes temporary links.
+        """
+        bills = db.metadata.tables['bills']
+        inventory = db.metadata.tables['merchant_inventory']
+
+        bill_rows = db.session.execute(
+            select(bills.c.id, bills.c.user_id)
+            .where(bills.c.id.in_(cls._sample_ids(bills, rng, size)), bills.c.user_id.isnot(None))
+        ).all()
+        inventory_rows = db.session.execute(
+            select(inventory.c.merchant_id, inventory.c.store_id, inventory.c.product_id, inventory.c.price)
+            .where(inventory.c.id.in_(cls._sample_ids(inventory, rng, size)))
+        ).all()
+        if not bill_rows or not inventory_rows:
+            raise RuntimeError('The benchmark database has no bills or inventory; run benchmarks.datagen first')
+
+        by_user = {}
+        for bill_id, user_id in db.session.execute(
+            select(bills.c.id, bills.c.user_id)
+            .where(bills.c.user_id.in_({user_id for _, user_id in bill_rows[:tokens]}))
+        ):
+            by_user.setdefault(user_id, []).append(bill_id)
+
+        issued = [
+            SMSService.generate_temporary_link(bill_id, user_id)['token']
+            for bill_id, user_id in bill_rows[:tokens]
+        ]
+        return cls(
+            [tuple(row) for row in bill_rows],
+            [(row.merchant_id, row.store_id, row.product_id, float(row.price)) for row in inventory_rows],
+            issued,
+            sorted(by_user.items())
+        )
+
+
+def bill_list(rng, fixtures):
+    _, user_id = rng.choice(fixtures.bills)
+    return 'GET', f'/api/bills/?user_id={user_id}', None
+
+
+def bill_detail(rng, fixtures):
+    bill_id, _ = rng.choice(fixtures.bills)
+    return 'GET', f'/api/bills/{bill_id}', None
+
+
+def bill_batch(rng, fixtures):
+    user_id, bill_ids = rng.choice(fixtures.user_bills)
+    return 'GET', f"/api/bills/batch?user_id={user_id}&ids={','.join(map(str, bill_ids[:50]))}", None
+
+
+def create_bill(rng, fixtures):
+    merchant_id, store_id, _, _ = rng.choice(fixtures.inventory)
+    lines = [row for row in fixtures.inventory if row[1] == store_id][:5]
+    _, user_id = rng.choice(fixtures.bills)
+    return 'POST', '/api/bills/', {
+        'merchant_id': merchant_id,
+        'store_id': store_id,
+        'user_id': user_id,
+        'oversell_policy': 'allow',
+        'items': [
+            {'product_id': product_id, 'product_name': f'Product {product_id}', 'quantity': 1, 'unit_price': price}
+            for _, _, product_id, price in lines
+        ]
+    }
+
+
+def record_payment(rng, fixtures):
+    bill_id, _ = rng.choice(fixtures.bills)
+    return 'POST', f'/api/bills/{bill_id}/payment', {'payment_method': 'cash', 'amount': 1}
+
+
+def link_click(rng, fixtures):
+    return 'GET', f'/api/sms/validate-link/{rng.choice(fixtures.tokens)}', None
+
+
+def sms_fanout(rng, fixtures):
+    bill_id, user_id = rng.choice(fixtures.bills)
+    return 'POST', '/api/sms/send-bill-notification', {'bill_id': bill_id, 'user_id': user_id}
+
+
+SCENARIOS = {
+    'bill_list': bill_list,
+    'bill_detail': bill_detail,
+    'bill_batch': bill_batch,
+    'create_bill': create_bill,
+    'record_payment': record_payment,
+    'link_click': link_click,
+    'sms_fanout': sms_fanout,
+}
@@ -0,0 +1,122 @@
+"""
+Serialization benchmark: ORM objects + to_dict + stdlib JSON against column rows + compiled serializers + orjson.
+
+Loads --limit bills (and their items) from a database built by
+benchmarks.datagen, or from a throwaway one it generates, and times loading,
+converting to dicts and encoding to JSON for both paths. The "legacy" path
+reproduces the attribute-by-attribute to_dict the models used before the
+compiled serializers; both paths must produce identical JSON.
+
+Usage:
+    python -m benchmarks.serialization_bench [--database sqlite:///bench.db] [--limit 20000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from src.extensions import db
+from src.models.bill import Bill, BillItem
+from src.serialization import FastJSONProvider, orjson, serializer_for
+from benchmarks.datagen import Generator, build_app
+
+
+def legacy_bill_dict(bill):
+    return {
+        'id': bill.id,
+        'bill_number': bill.bill_number,
+        'merchant_id': bill.merchant_id,
+        'store_id': bill.store_id,
+        'user_id': bill.user_id,
+        'bill_date': bill.bill_date.isoformat() if bill.bill_date else None,
+        'due_date': bill.due_date.isoformat() if bill.due_date else None,
+        'total_amount': float(bill.total_amount),
+        'tax_amount': float(bill.tax_amount),
+        'discount_amount': float(bill.discount_amount),
+        'status': bill.status,
+        'notes': bill.notes,
+        'created_at': bill.created_at.isoformat() if bill.created_at else None,
+        'updated_at': bill.updated_at.isoformat() if bill.updated_at else None
+    }
+
+
+def legacy_item_dict(item):
+    return {
+        'id': item.id,
+        'bill_id': item.bill_id,
+        'product_id': item.product_id,
+        'product_name': item.product_name,
+        'quantity': item.quantity,
+        'unit_price': float(item.unit_price),
+        'tax_rate': float(item.tax_rate),
+        'tax_amount': float(item.tax_amount),
+        'discount_amount': float(item.discount_amount),
+        'total_amount': float(item.total_amount),
+        'created_at': item.created_at.isoformat() if item.created_at else None
+    }
+
+
+def legacy(app, limit):
+    started = time.perf_counter()
+    bills = Bill.query.order_by(Bill.id).limit(limit).all()
+    items = BillItem.query.filter(BillItem.bill_id <= bills[-1].id).order_by(BillItem.id).all()
+    loaded = time.perf_counter()
+    payload = {'bills': [legacy_bill_dict(bill) for bill in bills], 'items': [legacy_item_dict(item) for item in items]}
+    converted = time.perf_counter()
+    body = DefaultJSONProvider(app).dumps(payload, separators=(',', ':'))
+    encoded = time.perf_counter()
+    db.session.expunge_all()
+    return body, (loaded - started, converted - loaded, encoded - converted)
+
+
+def compiled(app, limit):
+    bills, items = serializer_for(Bill), serializer_for(BillItem)
+    started = time.perf_counter()
+    bill_rows = db.session.execute(db.select(*bills.columns).order_by(Bill.id).limit(limit)).all()
+    item_rows = db.session.execute(
+        db.select(*items.columns).where(BillItem.bill_id <= bill_rows[-1].id).order_by(BillItem.id)
+    ).all()
+    loaded = time.perf_counter()
+    payload = {'bills': bills.many(bill_rows), 'items': items.many(item_rows)}
+    converted = time.perf_counter()
+    body = FastJSONProvider(app).dumps(payload)
+    encoded = time.perf_counter()
+    return body, (loaded - started, converted - loaded, encoded - converted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default=None, help='defaults to a generated throwaway SQLite file')
+    parser.add_argument('--limit', type=int, default=20000, help='bills to serialize')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    database = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'serialization.db')}"
+    app = build_app(database)
+    with app.app_context():
+        if args.database is None:
+            db.create_all()
+            Generator(max(1, args.limit // 5 + 1)).run(report=lambda line: None)
+
+        print(f"JSON encoder: {'orjson ' + orjson.__version__ if orjson else 'standard library'}")
+        print(f"{'path':<10} {'load ms':>9} {'dict ms':>9} {'json ms':>9} {'total ms':>9}")
+        bodies = {}
+        for name, run in (('legacy', legacy), ('compiled', compiled)):
+            best = None
+            for _ in range(args.repeat):
+                body, timings = run(app, args.limit)
+                best = timings if best is None or sum(timings) < sum(best) else best
+            bodies[name] = body
+            print(f'{name:<10} ' + ' '.join(f'{seconds * 1000:>9.1f}' for seconds in best) + f' {sum(best) * 1000:>9.1f}')
+
+        if bodies['legacy'] != bodies['compiled']:
+            sys.exit('Outputs differ between the legacy and compiled paths')
+        print(f"Outputs identical ({len(bodies['compiled'])} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Start-up benchmark: how quickly a process, and a forked worker, can serve.
+
+Each repetition starts a fresh interpreter that imports src.main, creates the
+app and serves a first request through the test client, recording each step
+and the app's boot profile. The same process then warms up and forks the way
+the production launcher does (src/serve.py), and the forked child serves its
+first request: that time is "worker ready". The database is a throwaway SQLite
+file with the schema created beforehand, so no step waits on schema work.
+
+The median over the repetitions is compared with --budget-ms (default 300) for
+worker readiness and, if given, with --cold-budget-ms for a cold process; the
+script exits non-zero when a budget is exceeded.
+
+Usage:
+    python -m benchmarks.startup [--repeat 5] [--budget-ms 300] [--cold-budget-ms 800]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+FIRST_REQUESTS = ('/api/health', '/api/bills/?user_id=1')
+
+
+def _first_requests(app):
+    client = app.test_client()
+    for url in FIRST_REQUESTS:
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+
+
+def child():
+    """Runs in a fresh interpreter; prints one JSON line of timings in ms."""
+    started = time.perf_counter()
+    from src.main import create_app
+    from src.serve import reinit_after_fork
+    from sqlalchemy.orm import configure_mappers
+    import gc
+    imported = time.perf_counter()
+
+    app = create_app()
+    created = time.perf_counter()
+    _first_requests(app)
+    served = time.perf_counter()
+
+    # Warm up and fork as the launcher's master does, then time the worker's first requests
+    configure_mappers()
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose()
+    gc.collect()
+    gc.freeze()
+
+    read_end, write_end = os.pipe()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        reinit_after_fork(app)
+        _first_requests(app)
+        os.write(write_end, str(time.perf_counter() - forked).encode())
+        os._exit(0)
+    os.close(write_end)
+    worker_seconds = float(os.read(read_end, 64).decode())
+    os.waitpid(pid, 0)
+
+    print(json.dumps({
+        'after_first_request_ms': (time.perf_counter() - served) * 1000,
+        'import_ms': (imported - started) * 1000,
+        'create_app_ms': (created - imported) * 1000,
+        'first_request_ms': (served - created) * 1000,
+        'worker_ready_ms': worker_seconds * 1000,
+        'boot': {name: seconds * 1000 for name, seconds in app.extensions['boot'].phases},
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=300, help='median worker-ready budget')
+    parser.add_argument('--cold-budget-ms', type=float, default=None, help='median cold-process budget')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    env.pop('DATABASE_REPLICA_URLS', None)
+    env['SLOW_QUERY_LOG'] = '0'
+    env.setdefault('AUTH_ENABLED', '0')
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'src.main', 'init-schema'],
+        cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+    runs = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.startup', '--child'],
+            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        elapsed = (time.perf_counter() - started) * 1000
+        run = json.loads(output.strip().splitlines()[-1])
+        # Interpreter start-up, imports, app creation and the first requests
+        run['cold_start_ms'] = elapsed - run['after_first_request_ms']
+        runs.append(run)
+
+    def median(key, source=None):
+        return statistics.median((source or (lambda run: run))(run)[key] for run in runs)
+
+    print(f'Median of {args.repeat} runs')
+    for key in ('cold_start_ms', 'import_ms', 'create_app_ms', 'first_request_ms', 'worker_ready_ms'):
+        print(f'  {key[:-3]:<22} {median(key):>8.1f} ms')
+    print('  create_app phases:')
+    phases = sorted(runs[0]['boot'], key=lambda name: -median(name, lambda run: run['boot']))
+    for name in phases:
+        print(f"    {name:<30} {median(name, lambda run: run['boot']):>8.1f} ms")
+
+    failed = False
+    for key, budget in (('worker_ready_ms', args.budget_ms), ('cold_start_ms', args.cold_budget_ms)):
+        if budget is not None and median(key) > budget:
+            print(f'OVER BUDGET {key[:-3]}: {median(key):.1f} ms > {budget:.0f} ms')
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Concurrency stress check for batched stock decrements.
+
+Many threads create "bills" against the same few inventory rows at once. At the
+end every row must satisfy: initial stock - stock taken by successful lines ==
+final stock, and no row may go below zero. Any lost update shows up as a
+mismatch and the script exits non-zero.
+
+Usage:
+    python benchmarks/stock_decrement_stress.py [--threads 16] [--bills 200] [--database sqlite:///stress.db]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.extensions import db, init_db
+from src.models.product import MerchantInventory
+from src.models.inventory_service import InventoryService
+
+MERCHANT_ID = 1
+STORE_ID = 1
+
+
+def build_app(database_uri):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    init_db(app)
+    return app
+
+
+def seed(products, initial_stock):
+    table = MerchantInventory.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert(), [
+        {
+            'merchant_id': MERCHANT_ID,
+            'store_id': STORE_ID,
+            'product_id': product_id,
+            'stock_quantity': initial_stock,
+            'price': 10
+        }
+        for product_id in products
+    ])
+    db.session.commit()
+
+
+def worker(app, products, bills, taken, lock, errors):
+    rng = random.Random()
+    with app.app_context():
+        for _ in range(bills):
+            items = [
+                {'product_id': product_id, 'quantity': rng.randint(1, 3)}
+                for product_id in rng.sample(products, rng.randint(1, len(products)))
+            ]
+            try:
+                result = InventoryService.decrement_for_bill(db.session, MERCHANT_ID, STORE_ID, items, policy='skip')
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors.append(repr(e))
+                continue
+
+            quantities = InventoryService.aggregate_lines(items)
+            with lock:
+                for product_id in result['decremented']:
+                    taken[product_id] += quantities[product_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--bills', type=int, default=200, help='bills per thread')
+    parser.add_argument('--products', type=int, default=5)
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args()
+
+    database_uri = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}"
+    app = build_app(database_uri)
+    products = list(range(1, args.products + 1))
+
+    with app.app_context():
+        db.create_all()
+        seed(products, args.stock)
+
+    taken = {product_id: 0 for product_id in products}
+    lock = threading.Lock()
+    errors = []
+    threads = [
+        threading.Thread(target=worker, args=(app, products, args.bills, taken, lock, errors))
+        for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        table = MerchantInventory.__table__
+        final = dict(db.session.execute(
+            table.select().with_only_columns(table.c.product_id, table.c.stock_quantity)
+        ).all())
+
+    failed = False
+    for product_id in products:
+        expected = args.stock - taken[product_id]
+        status = 'ok' if final[product_id] == expected and final[product_id] >= 0 else 'LOST UPDATE'
+        failed = failed or status != 'ok'
+        print(f'product {product_id}: taken={taken[product_id]} expected={expected} final={final[product_id]} {status}')
+
+    if errors:
+        print(f'{len(errors)} bills failed with errors, first: {errors[0]}')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,477 @@
+"""
+Bearer-token authentication for the API.
+
+Every endpoint outside PUBLIC_ENDPOINTS needs an ``Authorization: Bearer``
+header with an access token: an HS256 JWT signed with JWT_SECRET_KEY that
+names its subject (``user:<id>`` or ``merchant:<id>``) and the session it was
+issued for (``sid``). Access tokens live ACCESS_TOKEN_SECONDS (default 15
+minutes). ``POST /api/auth/login`` and ``/register`` start a session and
+return its first access token and a refresh token; clients get new access
+tokens with ``POST /api/auth/refresh`` (see AuthService).
+
+Verifying a token needs no database: the signature is checked with a keyed
+HMAC prepared once, and verified tokens are kept in an LRU so a client's
+repeated requests skip even that. Revoked sessions (logout) are rows in
+``token_revocations``; each process keeps them in a Bloom filter synced from
+the table every REVOCATION_SYNC_SECONDS, so for almost every request the
+revocation check is a few bit tests. Only a filter hit is confirmed against
+the table, and the answer is remembered.
+
+A token also limits which ids a request may name (query string or JSON
+body). A user may only pass its own ``user_id`` and no ``merchant_id``, except
+to name the merchant it orders from on USER_MERCHANT_ENDPOINTS. A merchant
+may only pass its own ``merchant_id``, and a customer's ``user_id`` only
+alongside it or on MERCHANT_CUSTOMER_ENDPOINTS, which check the customer
+belongs to the merchant. MERCHANT_ENDPOINTS only accept merchant tokens, so
+e.g. a merchant's ledger (``GET /api/ledger?merchant_id=``) is merchant-only.
+Failures are answered with 401 (no or bad token) or 403 (wrong subject). The
+request's subject is ``g.principal``.
+
+Set AUTH_ENABLED=0 to turn the checks off; tokens are still issued.
+"""
+from flask import current_app, g, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import struct
+import threading
+import time
+
+import jwt
+
+from src.extensions import db
+from src.metrics import record_cache
+from src.models.session import TokenRevocation
+from src.serialization import orjson
+
+ACCESS_TOKEN_SECONDS = int(os.environ.get('ACCESS_TOKEN_SECONDS', '900'))
+TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', '10000'))
+REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', '5'))
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', '100000'))
+
+# Endpoints that need no token: the token-based bill links, the public catalogue and operations
+PUBLIC_ENDPOINTS = frozenset({
+    'index', 'health', 'metrics', 'static',
+    'bill.view_bill_by_token', 'sms.validate_link', 'sms.expired_link',
+    'store.get_open_stores', 'search.search', 'search.autocomplete',
+    'category.get_category_products', 'category.get_category_facets',
+    'auth.register', 'auth.login', 'auth.refresh',
+})
+
+# Endpoints only a merchant may call
+MERCHANT_ENDPOINTS = frozenset({
+    'bill.create_bill', 'bill.record_payment', 'sms.send_bill_notification',
+    'inventory.import_inventory', 'pickup.get_queue', 'pickup.update_pickup_status',
+    'pickup.check_availability', 'ledger.get_top_debtors',
+})
+
+# Endpoints where a user names the merchant it is ordering from
+USER_MERCHANT_ENDPOINTS = frozenset({
+    'pickup.create_pickup_request',
+})
+
+# Endpoints where a merchant may name a customer without its merchant_id, because the handler checks ownership
+MERCHANT_CUSTOMER_ENDPOINTS = frozenset({
+    'sms.send_bill_notification',
+})
+
+SUBJECT_KINDS = ('user', 'merchant')
+
+Principal = namedtuple('Principal', 'kind id sid expires')
+
+logger = logging.getLogger(__name__)
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class AuthError(Exception):
+    """A request's credentials were missing or not acceptable."""
+
+
+def requested_ids(name):
+    """
+    Every ``name`` a request passes, in its query string and its JSON body.
+
+    Handlers read one or the other, so a check has to cover both.
+
+    Returns:
+        set: The values as strings, empty if the request names none
+    """
+    values = {str(value) for value in request.args.getlist(name)}
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and body.get(name) is not None:
+            values.add(str(body[name]))
+    return values
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+class TokenCodec:
+    """Issues access tokens and verifies them locally."""
+
+    MAX_HEADERS = 16
+
+    def __init__(self, secret_key, ttl=ACCESS_TOKEN_SECONDS, cache_size=TOKEN_CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._secret_key = secret_key
+        self._mac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+        self._headers = set()  # Header segments already checked to name HS256
+        self._verified = OrderedDict()  # token -> Principal
+        self._lock = threading.Lock()
+
+    def issue(self, kind, subject_id, sid, now=None):
+        """
+        Create an access token.
+
+        Returns:
+            tuple: (token, expiry as a Unix timestamp)
+        """
+        now = int(now if now is not None else time.time())
+        expires = now + self.ttl
+        token = jwt.encode({
+            'typ': 'access',
+            'sub': f'{kind}:{subject_id}',
+            'sid': sid,
+            'iat': now,
+            'exp': expires,
+        }, self._secret_key, algorithm='HS256')
+        return token, expires
+
+    def verify(self, token, now=None):
+        """
+        Check a token's signature, type and expiry.
+
+        Returns:
+            Principal: The token's subject
+
+        Raises:
+            AuthError: If the token is malformed, forged or expired
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            principal = self._verified.get(token)
+            if principal is not None:
+                self._verified.move_to_end(token)
+        record_cache('auth_tokens', 'miss' if principal is None else 'hit')
+
+        if principal is None:
+            principal = self._decode(token)
+            with self._lock:
+                self._verified[token] = principal
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+
+        if principal.expires <= now:
+            raise AuthError('Access token expired')
+        return principal
+
+    def _decode(self, token):
+        try:
+            header, payload, signature = token.encode('ascii').split(b'.')
+        except (UnicodeEncodeError, ValueError):
+            raise AuthError('Malformed access token')
+
+        if header not in self._headers:
+            try:
+                algorithm = _loads(_b64decode(header)).get('alg')
+            except (binascii.Error, ValueError, AttributeError):
+                raise AuthError('Malformed access token')
+            if algorithm != 'HS256':
+                raise AuthError('Unsupported token algorithm')
+            if len(self._headers) < self.MAX_HEADERS:
+                self._headers.add(header)
+
+        mac = self._mac.copy()
+        mac.update(header + b'.' + payload)
+        try:
+            valid = hmac.compare_digest(mac.digest(), _b64decode(signature))
+        except binascii.Error:
+            valid = False
+        if not valid:
+            raise AuthError('Invalid access token signature')
+
+        try:
+            claims = _loads(_b64decode(payload))
+            kind, _, subject_id = claims['sub'].partition(':')
+            principal = Principal(kind, int(subject_id), str(claims['sid']), float(claims['exp']))
+            token_type = claims.get('typ')
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+            raise AuthError('Malformed access token')
+        if token_type != 'access' or kind not in SUBJECT_KINDS:
+            raise AuthError('Not an access token')
+        return principal
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for ``capacity`` entries at ``error_rate`` false positives."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.bits = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = min(16, max(1, round(self.bits / self.capacity * math.log(2))))
+        self._words = struct.Struct(f'>{self.hashes}I')
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, value):
+        # One digest supplies a 32-bit hash per position
+        digest = hashlib.blake2b(value.encode(), digest_size=4 * self.hashes).digest()
+        bits = self.bits
+        return [word % bits for word in self._words.unpack(digest)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        array = self._array
+        for position in self._positions(value):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationFilter:
+    """
+    Revoked session ids, synced from ``token_revocations``.
+
+    The Bloom filter is replaced wholesale on a full load and only ever added
+    to otherwise, so lookups read it without a lock. A full load happens first,
+    then every REBUILD_SECONDS or when the filter is at capacity, and drops
+    revocations whose tokens have expired; in between, a sync reads the rows
+    revoked since the last one (with an overlap for slow commits and replica
+    lag). A request that finds the filter due for a sync runs it unless another
+    thread already is.
+    """
+
+    REBUILD_SECONDS = 3600
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self, capacity=REVOCATION_FILTER_CAPACITY, sync_seconds=REVOCATION_SYNC_SECONDS):
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self._filter = None
+        self._exact = OrderedDict()  # sid -> revoked, for ids the filter matched
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+        self._built_at = 0.0
+        self._since = None
+
+    def is_revoked(self, sid):
+        if time.monotonic() - self._synced_at >= self.sync_seconds:
+            self.sync()
+
+        if sid not in self._filter:
+            record_cache('revocation_filter', 'negative')
+            return False
+
+        with self._lock:
+            revoked = self._exact.get(sid)
+        if revoked is None:
+            record_cache('revocation_filter', 'lookup')
+            revoked = db.session.execute(
+                select(TokenRevocation.id).where(
+                    TokenRevocation.session_token == sid,
+                    TokenRevocation.expires_at > datetime.utcnow()
+                ).limit(1)
+            ).first() is not None
+            self._remember(sid, revoked)
+        else:
+            record_cache('revocation_filter', 'hit')
+        return revoked
+
+    def add(self, sid):
+        """Revoke a session in this process straight away, ahead of the next sync."""
+        if self._filter is not None:
+            self._filter.add(sid)
+        self._remember(sid, True)
+
+    def _remember(self, sid, revoked):
+        with self._lock:
+            self._exact[sid] = revoked
+            self._exact.move_to_end(sid)
+            while len(self._exact) > self.capacity:
+                self._exact.popitem(last=False)
+
+    def sync(self):
+        """Load revocations from the table; a full load if the filter is empty, old or full."""
+        # Only the first load makes requests wait; later ones are skipped while another thread runs them
+        if not self._sync_lock.acquire(blocking=self._filter is None):
+            return
+        try:
+            if self._filter is not None and time.monotonic() - self._synced_at < self.sync_seconds:
+                return
+            now = datetime.utcnow()
+            rebuild = (
+                self._filter is None
+                or time.monotonic() - self._built_at >= self.REBUILD_SECONDS
+                or self._filter.count >= self.capacity
+            )
+
+            query = select(TokenRevocation.session_token).where(
+                TokenRevocation.expires_at > now
+            )
+            if not rebuild:
+                query = query.where(TokenRevocation.revoked_at >= self._since - self.SYNC_OVERLAP)
+            try:
+                rows = db.session.execute(query).all()
+            except SQLAlchemyError:
+                if self._filter is None:
+                    raise
+                logger.exception('Could not sync token revocations, keeping the current filter')
+                self._synced_at = time.monotonic()
+                return
+
+            bloom = BloomFilter(self.capacity) if rebuild else self._filter
+            for sid, in rows:
+                bloom.add(sid)
+
+            with self._lock:
+                if rebuild:
+                    self._exact.clear()
+                for sid, in rows:
+                    self._exact[sid] = True
+                while len(self._exact) > self.capacity:
+                    self._exact.popitem(last=False)
+
+            self._filter = bloom
+            self._since = now
+            self._synced_at = time.monotonic()
+            if rebuild:
+                self._built_at = self._synced_at
+            record_cache('revocation_filter', 'rebuild' if rebuild else 'sync')
+        finally:
+            self._sync_lock.release()
+
+
+class Authenticator:
+    """Checks a request's bearer token and the ids it names."""
+
+    def __init__(self, codec, revocations):
+        self.codec = codec
+        self.revocations = revocations
+
+    def authenticate(self, authorization):
+        """
+        Get the subject of an ``Authorization`` header.
+
+        Raises:
+            AuthError: If there is no bearer token or it is not acceptable
+        """
+        scheme, _, token = (authorization or '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            raise AuthError('Missing bearer token')
+
+        principal = self.codec.verify(token.strip())
+        if self.revocations.is_revoked(principal.sid):
+            raise AuthError('Session has been signed out')
+        return principal
+
+    @staticmethod
+    def forbidden(principal, endpoint):
+        """Why a principal may not make the current request, or None if it may."""
+        if endpoint in MERCHANT_ENDPOINTS and principal.kind != 'merchant':
+            return 'Only merchants can do this'
+        merchant_ids, user_ids = requested_ids('merchant_id'), requested_ids('user_id')
+        if len(merchant_ids) > 1 or len(user_ids) > 1:
+            return 'The query string and body name different ids'
+
+        if principal.kind == 'user':
+            if merchant_ids and endpoint not in USER_MERCHANT_ENDPOINTS:
+                return 'Only merchants can do this'
+            if user_ids and user_ids != {str(principal.id)}:
+                return 'Cannot act for another user'
+            return None
+
+        if merchant_ids and merchant_ids != {str(principal.id)}:
+            return 'Cannot act for another merchant'
+        if user_ids and not merchant_ids and endpoint not in MERCHANT_CUSTOMER_ENDPOINTS:
+            return 'A customer user_id must come with this merchant_id'
+        return None
+
+
+def current_principal():
+    """The authenticated subject of the current request, or None."""
+    return g.get('principal')
+
+
+def _error(status, message):
+    response = jsonify({
+        'success': False,
+        'message': message
+    })
+    response.status_code = status
+    if status == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+def _before_request():
+    if request.method == 'OPTIONS' or request.endpoint is None or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+
+    authenticator = current_app.extensions['auth']
+    try:
+        principal = authenticator.authenticate(request.headers.get('Authorization'))
+    except AuthError as e:
+        return _error(401, str(e))
+
+    message = authenticator.forbidden(principal, request.endpoint)
+    if message:
+        return _error(403, message)
+    g.principal = principal
+    return None
+
+
+def _signing_key(name, enabled):
+    """A signing key from the environment, or a random one for this run when authentication is off."""
+    key = os.environ.get(name)
+    if key:
+        return key
+    if enabled:
+        raise RuntimeError(f'{name} must be set when AUTH_ENABLED is on')
+    return secrets.token_urlsafe(32)
+
+
+def init_auth(app):
+    """
+    Install token authentication on an app.
+
+    Reads JWT_SECRET_KEY, BILL_LINK_SECRET_KEY, AUTH_ENABLED, ACCESS_TOKEN_SECONDS,
+    AUTH_TOKEN_CACHE_SIZE, REVOCATION_SYNC_SECONDS and
+    REVOCATION_FILTER_CAPACITY. The revocation filter is loaded by the first
+    request that needs it, so in the launcher each worker loads its own after
+    the fork.
+
+    Bill links sent by SMS are signed with their own BILL_LINK_SECRET_KEY
+    (``app.config``). With AUTH_ENABLED=0, a key that is not set is replaced
+    with a random one made here, so its tokens stop working when the app is
+    restarted.
+
+    Args:
+        app: Flask application
+
+    Raises:
+        RuntimeError: If authentication is enabled and a signing key is not set
+    """
+    enabled = os.environ.get('AUTH_ENABLED', '1') != '0'
+    app.config['BILL_LINK_SECRET_KEY'] = _signing_key('BILL_LINK_SECRET_KEY', enabled)
+    app.extensions['auth'] = Authenticator(TokenCodec(_signing_key('JWT_SECRET_KEY', enabled)), RevocationFilter())
+    if enabled:
+        app.before_request(_before_request)
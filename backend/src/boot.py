@@ -0,0 +1,42 @@
+"""
+Start-up timing for the app factory.
+
+``create_app`` records how long each step of building the app takes (the
+model imports, each extension, each blueprint) in a ``BootProfile`` stored in
+``app.extensions['boot']``, next to how long importing ``src.main`` took. The
+profile is logged by the production launcher, printed by
+``flask --app src.main boot-profile`` and exported on /metrics as
+``app_boot_seconds``, so a slow start can be traced to the step that caused it.
+"""
+from contextlib import contextmanager
+import time
+
+
+class BootProfile:
+    """Ordered (phase, seconds) timings for one app start."""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def add(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def lines(self):
+        """Human-readable breakdown, slowest phases first, then the total."""
+        ordered = sorted(self.phases, key=lambda phase: phase[1], reverse=True)
+        return [f'{name:<30} {seconds * 1000:>8.1f} ms' for name, seconds in ordered] + [
+            f"{'total':<30} {self.total * 1000:>8.1f} ms"
+        ]
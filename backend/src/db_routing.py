@@ -0,0 +1,201 @@
+"""
+Read-replica routing for the shared SQLAlchemy session.
+
+Requests that only read (GET/HEAD/OPTIONS) have their queries sent to one of
+the configured replica binds; everything else goes to the primary. Within a
+request, the first write or locking read pins the session to the primary, and
+the client gets a short-lived cookie so its next reads also see its own writes.
+A replica whose heartbeat lags the primary by more than ``REPLICA_MAX_LAG_SECONDS``
+(or cannot be reached) is skipped until it catches up.
+
+To try it locally with two SQLite files:
+
+    DATABASE_URL=sqlite:////tmp/primary.db \\
+    DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db \\
+    flask --app src.main copy-sqlite-replicas
+"""
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary_until'
+HEARTBEAT_TABLE = 'replication_heartbeat'
+
+
+def _is_write(clause):
+    """Tell whether a statement must run on the primary."""
+    if clause is None:
+        return False
+    return getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of read-only requests to a healthy replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or _is_write(clause):
+                self.info['db_wrote'] = True
+            elif g.get('db_read_replica') and not self.info.get('db_wrote'):
+                router = current_app.extensions.get('replica_router')
+                engine = router.pick(self._db) if router else None
+                if engine is not None:
+                    return engine
+
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Chooses a replica engine for read-only requests and tracks replica lag.
+
+    Lag is measured against a single heartbeat row on the primary: when a
+    replica has applied the latest heartbeat it is considered caught up,
+    otherwise its lag is the age of the heartbeat it has. Checks run at most
+    every ``REPLICA_CHECK_SECONDS`` per replica and also refresh the heartbeat.
+    """
+
+    MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '10'))
+    STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+    CHECK_SECONDS = float(os.environ.get('REPLICA_CHECK_SECONDS', '5'))
+
+    def __init__(self, app):
+        self.bind_keys = [
+            key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith(REPLICA_BIND_PREFIX)
+        ]
+        self._health = {}  # {bind_key: (healthy, lag_seconds, checked_at)}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+        app.extensions['replica_router'] = self
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        sticky_until = request.cookies.get(STICKY_COOKIE, type=float)
+        g.db_read_replica = request.method in READ_METHODS and not (sticky_until and sticky_until > time.time())
+
+    def _after_request(self, response):
+        scoped = current_app.extensions['sqlalchemy'].session
+        if scoped.registry.has() and scoped().info.get('db_wrote'):
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + self.STICKY_SECONDS),
+                max_age=int(self.STICKY_SECONDS) + 1,
+                httponly=True
+            )
+        return response
+
+    def _measure_lag(self, db, bind_key):
+        """
+        Compare a replica's heartbeat with the primary's.
+
+        Returns:
+            float: Lag in seconds, or None if the replica has no heartbeat yet
+        """
+        table = db.metadata.tables[HEARTBEAT_TABLE]
+        now = datetime.utcnow()
+
+        with db.engine.begin() as connection:
+            primary_beat = connection.execute(select(table.c.beat_at).where(table.c.id == 1)).scalar()
+            if primary_beat is None:
+                connection.execute(insert(table).values(id=1, beat_at=now))
+            elif (now - primary_beat).total_seconds() >= self.CHECK_SECONDS:
+                connection.execute(update(table).where(table.c.id == 1).values(beat_at=now))
+
+        with db.engines[bind_key].connect() as connection:
+            replica_beat = connection.execute(select(table.c.beat_at).where(table.c.id == 1)).scalar()
+
+        if replica_beat is None:
+            return None
+        if primary_beat is None or replica_beat >= primary_beat:
+            return 0.0
+        return (now - replica_beat).total_seconds()
+
+    def _healthy(self, db, bind_key):
+        healthy, lag, checked_at = self._health.get(bind_key, (False, None, 0))
+        if time.monotonic() - checked_at < self.CHECK_SECONDS:
+            return healthy
+
+        with self._lock:
+            healthy, lag, checked_at = self._health.get(bind_key, (False, None, 0))
+            if time.monotonic() - checked_at < self.CHECK_SECONDS:
+                return healthy
+
+            try:
+                lag = self._measure_lag(db, bind_key)
+            except SQLAlchemyError as e:
+                logger.warning('Replica %s is unreachable, reading from the primary: %s', bind_key, e)
+                lag = None
+
+            healthy = lag is not None and lag <= self.MAX_LAG_SECONDS
+            if lag is not None and not healthy:
+                logger.warning('Replica %s is %.1fs behind, reading from the primary', bind_key, lag)
+            self._health[bind_key] = (healthy, lag, time.monotonic())
+            return healthy
+
+    def pick(self, db):
+        """
+        Choose a replica engine round-robin among the healthy ones.
+
+        Returns:
+            Engine: Replica engine, or None to use the primary
+        """
+        healthy = [key for key in self.bind_keys if self._healthy(db, key)]
+        if not healthy:
+            return None
+        return db.engines[healthy[next(self._counter) % len(healthy)]]
+
+    def status(self):
+        """Get the last known health and lag of each replica."""
+        status = {}
+        for key in self.bind_keys:
+            healthy, lag, _ = self._health.get(key, (False, None, 0))
+            status[key] = {'healthy': healthy, 'lag_seconds': lag}
+        return status
+
+
+def replica_binds(urls):
+    """Turn a comma-separated list of replica URLs into SQLALCHEMY_BINDS entries."""
+    return {
+        f'{REPLICA_BIND_PREFIX}{number}': url.strip()
+        for number, url in enumerate(urls.split(','), start=1) if url.strip()
+    }
+
+
+def copy_sqlite_replicas(db):
+    """
+    Copy the primary SQLite database over every SQLite replica file.
+
+    Stands in for replication when trying the routing locally.
+
+    Returns:
+        list: Bind keys that were copied
+    """
+    copied = []
+    primary = sqlite3.connect(db.engine.url.database)
+    try:
+        for key, engine in db.engines.items():
+            if key and key.startswith(REPLICA_BIND_PREFIX) and engine.dialect.name == 'sqlite':
+                engine.dispose()
+                replica = sqlite3.connect(engine.url.database)
+                try:
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+                copied.append(key)
+    finally:
+        primary.close()
+    return copied
@@ -0,0 +1,158 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
+import importlib
+import os
+
+from src.db_routing import RoutingSession, ReplicaRouter, replica_binds
+
+# The one SQLAlchemy extension shared by every model and route module
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+DEFAULT_DATABASE_URL = 'sqlite:///billing_system.db'
+
+# Modules that declare tables; all of them must be imported before mappers configure
+MODEL_MODULES = (
+    'src.models.user',
+    'src.models.merchant',
+    'src.models.product',
+    'src.models.bill',
+    'src.models.shopping_list',
+    'src.models.pickup_request',
+    'src.models.notification',
+    'src.models.session',
+    'src.models.replication',
+    'src.models.idempotency',
+    'src.models.ledger',
+)
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(database_url):
+    """
+    Build engine options for a database URL from the environment.
+
+    Server databases get a bounded pool (DB_POOL_SIZE + DB_MAX_OVERFLOW
+    connections per worker), recycling and pre-ping so connections dropped by
+    MySQL's wait_timeout are replaced instead of failing a request. SQLite gets
+    a larger per-connection statement cache.
+
+    Args:
+        database_url: SQLAlchemy database URL
+
+    Returns:
+        dict: Options for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    options = {
+        'query_cache_size': _env_int('DB_QUERY_CACHE_SIZE', 1200),
+    }
+
+    if database_url.startswith('sqlite'):
+        options['connect_args'] = {
+            'cached_statements': _env_int('SQLITE_CACHED_STATEMENTS', 512),
+            'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 15),
+        }
+        return options
+
+    options.update({
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+    })
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer; NORMAL is durable at checkpoints
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def load_models():
+    """Import every model module so the shared metadata holds all tables."""
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+
+
+def create_missing_indexes():
+    """
+    Create declared indexes that an existing database does not have yet.
+
+    ``db.create_all()`` skips tables that already exist, so indexes added to
+    models later would otherwise never reach older databases.
+
+    Returns:
+        list: Names of the indexes that were created
+    """
+    existing = inspect(db.engine).get_table_names()
+    created = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {index['name'] for index in inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
+
+
+def init_schema():
+    """
+    Bring the database schema up to date.
+
+    Creates missing tables and declared indexes, the search indexes with their
+    sync triggers, and backfills the category closure table and the customer
+    ledger. Safe to run repeatedly; run it (``flask --app src.main
+    init-schema``) on deploy rather than at start-up. Must run inside an app
+    context.
+
+    Returns:
+        list: Names of the indexes that were created
+    """
+    from src.models.search_service import SearchService
+    from src.models.category_service import CategoryService
+    from src.models.ledger_service import LedgerService
+
+    db.create_all()
+    created = create_missing_indexes()
+    SearchService.ensure_indexes()
+    CategoryService.ensure_closure()
+    LedgerService.ensure_backfilled()
+    return created
+
+
+def init_db(app):
+    """
+    Configure the shared extension and engine for an app.
+
+    Reads DATABASE_URL (default sqlite:///billing_system.db) unless the app
+    already has SQLALCHEMY_DATABASE_URI set, and DATABASE_REPLICA_URLS
+    (comma-separated) for read replicas unless it has SQLALCHEMY_BINDS.
+
+    Args:
+        app: Flask application
+    """
+    database_url = app.config.get('SQLALCHEMY_DATABASE_URI') or os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(database_url))
+    app.config.setdefault('SQLALCHEMY_BINDS', {
+        key: {'url': url, **engine_options(url)}
+        for key, url in replica_binds(os.environ.get('DATABASE_REPLICA_URLS', '')).items()
+    })
+
+    load_models()
+    db.init_app(app)
+    ReplicaRouter(app)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_sqlite_pragmas)
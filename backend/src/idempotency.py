@@ -0,0 +1,320 @@
+"""
+Idempotency-Key support for endpoints that create things.
+
+A view wrapped in ``@idempotent`` honours an ``Idempotency-Key`` request
+header. The first request with a key claims it by inserting an
+``idempotency_keys`` row, runs the view, and stores the response (status,
+body, mimetype) on the row for IDEMPOTENCY_TTL_SECONDS (default 24 hours).
+Retries with the same key get the stored response back with an
+``Idempotent-Replayed: true`` header and the view does not run again. The
+stored response is kept in an in-process LRU in front of the table, so a
+replay on the same worker runs no SQL.
+
+A duplicate that arrives while the first request is still running waits for
+it, up to IDEMPOTENCY_WAIT_SECONDS, and then replays its response. Duplicates
+in the same process wait on an event and only one of them polls the table.
+A key is bound to its request: reusing it with a different method, path or
+body is rejected with 422. Responses with a 5xx status, and views that raise,
+release the key so the client can retry. A claim whose request never
+finished (the worker died) is taken over after IDEMPOTENCY_LOCK_SECONDS.
+
+Requests without the header are not affected. Keys are scoped to the endpoint
+and to the caller (``g.principal``), so two clients that happen to pick the
+same key never see each other's responses.
+"""
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+import functools
+import hashlib
+import itertools
+import logging
+import os
+import secrets
+import threading
+import time
+
+from src.auth import current_principal
+from src.extensions import db
+from src.metrics import record_cache
+from src.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+LOCK_SECONDS = float(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60'))
+CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000'))
+
+# Expired rows are deleted by every PURGE_EVERY-th claim in a process
+PURGE_EVERY = 1000
+FIRST_POLL_SECONDS = 0.02
+MAX_POLL_SECONDS = 0.5
+
+CLAIMED, STORED, BUSY, MISMATCH = 'claimed', 'stored', 'busy', 'mismatch'
+
+StoredResponse = namedtuple('StoredResponse', 'fingerprint status body mimetype expires_at')
+
+
+class ResponseCache:
+    """Thread-safe LRU of stored responses, keyed by (scope, key)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key):
+        with self._lock:
+            stored = self._entries.get(cache_key)
+            if stored is None:
+                return None
+            if stored.expires_at <= datetime.utcnow():
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return stored
+
+    def put(self, cache_key, stored):
+        with self._lock:
+            self._entries[cache_key] = stored
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = ResponseCache(CACHE_SIZE)
+_inflight = {}  # (scope, key) -> Event set when this process is done with the key
+_inflight_lock = threading.Lock()
+_claims = itertools.count(1)
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.full_path.encode(), request.get_data(cache=True)):
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _stored(row):
+    return StoredResponse(row.fingerprint, row.response_status, row.response_body, row.response_mimetype,
+                          row.expires_at)
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Claim a key for this request in the table.
+
+    Returns:
+        tuple: (CLAIMED, claim token), (STORED, StoredResponse), (MISMATCH, None) or (BUSY, None)
+    """
+    table = IdempotencyKey.__table__
+    now = datetime.utcnow()
+    token = secrets.token_hex(16)
+    claim = {
+        'fingerprint': fingerprint,
+        'status': 'in_progress',
+        'claim_token': token,
+        'response_status': None,
+        'response_body': None,
+        'response_mimetype': None,
+        'locked_at': now,
+        'expires_at': now + timedelta(seconds=TTL_SECONDS),
+    }
+
+    try:
+        with db.engine.begin() as connection:
+            connection.execute(table.insert().values(scope=scope, key=key, created_at=now, **claim))
+    except IntegrityError:
+        pass
+    else:
+        if next(_claims) % PURGE_EVERY == 0:
+            _purge_expired()
+        return CLAIMED, token
+
+    with db.engine.begin() as connection:
+        row = connection.execute(
+            select(table).where(table.c.scope == scope, table.c.key == key)
+        ).first()
+        if row is None:
+            # Released between our insert and this read; the caller tries again
+            return BUSY, None
+
+        expired = row.expires_at <= now
+        abandoned = row.status == 'in_progress' and row.locked_at <= now - timedelta(seconds=LOCK_SECONDS)
+        if expired or abandoned:
+            # Only one taker wins: the row must still carry the claim it was read with
+            taken = connection.execute(
+                update(table)
+                .where(table.c.id == row.id, table.c.claim_token == row.claim_token)
+                .values(created_at=now, **claim)
+            ).rowcount
+            return (CLAIMED, token) if taken else (BUSY, None)
+
+        if row.fingerprint != fingerprint:
+            return MISMATCH, None
+        if row.status == 'completed':
+            return STORED, _stored(row)
+        return BUSY, None
+
+
+def _complete(scope, key, fingerprint, token, response):
+    """Store a finished response on the claimed row."""
+    table = IdempotencyKey.__table__
+    now = datetime.utcnow()
+    stored = StoredResponse(fingerprint, response.status_code, response.get_data(as_text=True), response.mimetype,
+                            now + timedelta(seconds=TTL_SECONDS))
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(table)
+            .where(table.c.scope == scope, table.c.key == key, table.c.claim_token == token)
+            .values(status='completed', response_status=stored.status, response_body=stored.body,
+                    response_mimetype=stored.mimetype, expires_at=stored.expires_at)
+        )
+    return stored
+
+
+def _release(scope, key, token):
+    """Drop a claim so the request can be retried."""
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            delete(table).where(table.c.scope == scope, table.c.key == key, table.c.claim_token == token)
+        )
+
+
+def _purge_expired():
+    table = IdempotencyKey.__table__
+    try:
+        with db.engine.begin() as connection:
+            purged = connection.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
+        logger.info('Purged %d expired idempotency keys', purged)
+    except Exception:
+        logger.exception('Could not purge expired idempotency keys')
+
+
+def _replay(stored, fingerprint):
+    if stored.fingerprint != fingerprint:
+        return _mismatch()
+    response = current_app.response_class(stored.body, status=stored.status, mimetype=stored.mimetype)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _mismatch():
+    return jsonify({
+        'success': False,
+        'message': f'{IDEMPOTENCY_HEADER} was already used for a different request'
+    }), 422
+
+
+def _in_progress():
+    response = jsonify({
+        'success': False,
+        'message': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'
+    })
+    response.status_code = 409
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def _run(view, args, kwargs, scope, key, fingerprint, token):
+    try:
+        response = current_app.make_response(view(*args, **kwargs))
+    except Exception:
+        _release(scope, key, token)
+        raise
+
+    if response.status_code >= 500:
+        _release(scope, key, token)
+        return response
+
+    try:
+        stored = _complete(scope, key, fingerprint, token, response)
+    except Exception:
+        # The work is done; a retry after LOCK_SECONDS may run it again
+        logger.exception('Could not store the response for idempotency key %s', key)
+        return response
+    _cache.put((scope, key), stored)
+    return response
+
+
+def _claim_and_run(view, args, kwargs, scope, key, fingerprint, deadline):
+    delay = FIRST_POLL_SECONDS
+    while True:
+        outcome, detail = _claim(scope, key, fingerprint)
+        if outcome == CLAIMED:
+            record_cache('idempotency', 'miss')
+            return _run(view, args, kwargs, scope, key, fingerprint, detail)
+        if outcome == MISMATCH:
+            return _mismatch()
+        if outcome == STORED:
+            record_cache('idempotency', 'stored')
+            _cache.put((scope, key), detail)
+            return _replay(detail, fingerprint)
+
+        # Another worker holds the key: wait for it to finish
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return _in_progress()
+        record_cache('idempotency', 'wait')
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, MAX_POLL_SECONDS)
+
+
+def idempotent(view):
+    """Honour the Idempotency-Key header on a view (see the module docstring)."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'message': f'{IDEMPOTENCY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters'
+            }), 400
+
+        principal = current_principal()
+        scope = request.endpoint if principal is None else f'{request.endpoint}:{principal.kind}:{principal.id}'
+        cache_key = (scope, key)
+        fingerprint = _fingerprint()
+        deadline = time.monotonic() + WAIT_SECONDS
+
+        while True:
+            stored = _cache.get(cache_key)
+            if stored is not None:
+                record_cache('idempotency', 'hit')
+                return _replay(stored, fingerprint)
+
+            with _inflight_lock:
+                leader = _inflight.get(cache_key)
+                if leader is None:
+                    _inflight[cache_key] = done = threading.Event()
+            if leader is None:
+                break
+
+            # Another thread in this process has the key; its result lands in the cache
+            if not leader.wait(max(0.0, deadline - time.monotonic())):
+                return _in_progress()
+
+        try:
+            return _claim_and_run(view, args, kwargs, scope, key, fingerprint, deadline)
+        finally:
+            with _inflight_lock:
+                _inflight.pop(cache_key, None)
+            done.set()
+
+    return wrapper
@@ -2,53 +2,188 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))  # DON'T CHANGE THIS !!!
 
-from flask import Flask, jsonify, render_template
-from flask_sqlalchemy import SQLAlchemy
-import jwt
-from datetime import datetime, timedelta
-
-# Import models
-from src.models.user import db as user_db
-from src.models.merchant import db as merchant_db
-from src.models.product import db as product_db
-from src.models.bill import db as bill_db
-from src.models.shopping_list import db as shopping_list_db
-from src.models.pickup_request import db as pickup_request_db
-from src.models.notification import db as notification_db
-from src.models.sms_service import db as sms_db
-
-# Import routes
-from src.routes.bill import bill_bp
-from src.routes.sms import sms_bp
-
-app = Flask(__name__)
-
-# Configure the database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///billing_system.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize the database
-db = SQLAlchemy(app)
-
-# Register blueprints
-app.register_blueprint(bill_bp, url_prefix='/api/bills')
-app.register_blueprint(sms_bp, url_prefix='/api/sms')
-
-# Initialize models with the app
-with app.app_context():
-    user_db.init_app(app)
-    merchant_db.init_app(app)
-    product_db.init_app(app)
-    bill_db.init_app(app)
-    shopping_list_db.init_app(app)
-    pickup_request_db.init_app(app)
-    notification_db.init_app(app)
-    sms_db.init_app(app)
-    
-    # Create all tables
-    db.create_all()
-
-@app.route('/')
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, current_app, jsonify, render_template
+import click
+from flask.cli import with_appcontext
+from datetime import datetime
+import importlib
+
+from src.boot import BootProfile
+from src.extensions import db, init_db, init_schema, load_models
+from src.db_routing import copy_sqlite_replicas
+from src.metrics import init_metrics
+from src.slow_query_log import init_slow_query_log
+from src.serialization import init_serialization
+from src.rate_limit import init_rate_limit
+from src.auth import init_auth
+from src.models.import_service import InventoryImportService, IMPORT_FORMATS
+
+# Route modules are imported when an app is created, not when this module is
+# (module, blueprint, URL prefix)
+BLUEPRINTS = (
+    ('src.routes.auth', 'auth_bp', '/api/auth'),
+    ('src.routes.bill', 'bill_bp', '/api/bills'),
+    ('src.routes.sms', 'sms_bp', '/api/sms'),
+    ('src.routes.store', 'store_bp', '/api/stores'),
+    ('src.routes.search', 'search_bp', '/api/search'),
+    ('src.routes.inventory', 'inventory_bp', '/api/inventory'),
+    ('src.routes.category', 'category_bp', '/api/categories'),
+    ('src.routes.shopping_list', 'shopping_list_bp', '/api/shopping-lists'),
+    ('src.routes.pickup', 'pickup_bp', '/api/pickups'),
+    ('src.routes.ledger', 'ledger_bp', '/api/ledger'),
+)
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+def create_app():
+    """
+    Create and configure the application.
+    
+    Used by ``flask --app src.main``, the production launcher (src/serve.py),
+    which calls it once before forking its workers, and by scripts and tests.
+    
+    Does not touch the database: create or upgrade the schema with
+    ``flask --app src.main init-schema``. Each step is timed in
+    ``app.extensions['boot']``.
+    """
+    boot = BootProfile()
+    boot.add('import src.main', IMPORT_SECONDS)
+    
+    app = Flask(__name__)
+    
+    with boot.phase('models'):
+        load_models()
+    
+    # Configure the database (DATABASE_URL, pool and SQLite settings come from the environment)
+    with boot.phase('init_db'):
+        init_db(app)
+    
+    # Per-request latency, SQL and pool metrics, served on /metrics
+    with boot.phase('init_metrics'):
+        init_metrics(app)
+    
+    # Statements over SLOW_QUERY_MS go to a rotating JSON-lines file with their plan
+    with boot.phase('init_slow_query_log'):
+        init_slow_query_log(app)
+    
+    # Bearer access tokens on every endpoint but the public ones, verified without the database
+    with boot.phase('init_auth'):
+        init_auth(app)
+    
+    # Token buckets per authenticated user, merchant and IP on the hot endpoints, answered with 429 when empty
+    with boot.phase('init_rate_limit'):
+        init_rate_limit(app)
+    
+    # orjson-backed jsonify and request parsing, with the standard library as fallback
+    with boot.phase('init_serialization'):
+        init_serialization(app)
+    
+    # Register blueprints
+    for module, name, url_prefix in BLUEPRINTS:
+        with boot.phase(f'blueprint {url_prefix}'):
+            app.register_blueprint(getattr(importlib.import_module(module), name), url_prefix=url_prefix)
+    
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/api/health', 'health', health)
+    
+    app.cli.add_command(init_schema_command)
+    app.cli.add_command(import_inventory_command)
+    app.cli.add_command(copy_sqlite_replicas_command)
+    app.cli.add_command(boot_profile_command)
+    app.cli.add_command(check_ledger_command)
+    app.cli.add_command(mark_overdue_command)
+    app.cli.add_command(issue_token_command)
+    
+    app.extensions['boot'] = boot
+    return app
+
+@click.command('init-schema')
+@with_appcontext
+def init_schema_command():
+    """Create missing tables and indexes, search indexes and the category closure."""
+    created = init_schema()
+    click.echo(f"Schema up to date; created indexes: {', '.join(created)}" if created else 'Schema up to date')
+
+@click.command('import-inventory')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--merchant-id', type=int, required=True, help='Merchant that owns the inventory')
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Defaults to the file extension')
+@with_appcontext
+def import_inventory_command(path, merchant_id, fmt):
+    """Bulk upsert a merchant's inventory from a CSV or NDJSON file."""
+    fmt = fmt or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = InventoryImportService.import_stream(merchant_id, stream, fmt)
+    
+    click.echo(f"Read {report['rows_read']} rows: {report['upserted']} upserted, "
+               f"{report['duplicates']} duplicates, {report['failed']} failed")
+    for error in report['errors']:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+@click.command('copy-sqlite-replicas')
+@with_appcontext
+def copy_sqlite_replicas_command():
+    """Copy the primary SQLite database over the SQLite replicas, for trying read routing locally."""
+    copied = copy_sqlite_replicas(db)
+    click.echo(f"Copied primary to {', '.join(copied)}" if copied else 'No SQLite replicas configured')
+
+@click.command('boot-profile')
+@with_appcontext
+def boot_profile_command():
+    """Show how long each step of creating the app took."""
+    for line in current_app.extensions['boot'].lines():
+        click.echo(line)
+
+@click.command('check-ledger')
+@click.option('--merchant-id', type=int, help='Only check this merchant\'s customers')
+@click.option('--fix', is_flag=True, help='Rebuild the checked ledger rows from the bills and payments')
+@with_appcontext
+def check_ledger_command(merchant_id, fix):
+    """Compare the customer ledger with the bills and payments it summarises."""
+    from src.models.ledger_service import LedgerService
+    
+    mismatches = LedgerService.check(db.session, merchant_id)
+    for row_merchant_id, user_id, differences in mismatches:
+        details = ', '.join(f'{column} {ledger} != {expected}' for column, (ledger, expected) in differences.items())
+        click.echo(f'  merchant {row_merchant_id} user {user_id}: {details}', err=True)
+    click.echo(f'{len(mismatches)} ledger rows differ from the bills')
+    
+    if mismatches and fix:
+        rebuilt = LedgerService.rebuild(db.session, merchant_id)
+        db.session.commit()
+        click.echo(f'Rebuilt {rebuilt} ledger rows')
+    elif mismatches:
+        raise SystemExit(1)
+
+@click.command('mark-overdue')
+@with_appcontext
+def mark_overdue_command():
+    """Mark pending and partially paid bills past their due date as overdue."""
+    from src.models.ledger_service import LedgerService
+    
+    click.echo(f'Marked {LedgerService.mark_overdue(db.session)} bills overdue')
+
+@click.command('issue-token')
+@click.option('--user-id', type=int, help='Sign in as this user')
+@click.option('--merchant-id', type=int, help='Sign in as this merchant')
+@with_appcontext
+def issue_token_command(user_id, merchant_id):
+    """Start a session for a user or merchant and print its tokens, for scripts and support."""
+    from src.models.auth_service import AuthService
+    
+    if (user_id is None) == (merchant_id is None):
+        raise click.UsageError('Pass exactly one of --user-id and --merchant-id')
+    kind, subject_id = ('user', user_id) if user_id is not None else ('merchant', merchant_id)
+    
+    tokens = AuthService.start_session(kind, subject_id, user_agent='flask issue-token')
+    click.echo(f"access_token: {tokens['access_token']}")
+    click.echo(f"refresh_token: {tokens['refresh_token']}")
+    click.echo(f"expires_at: {tokens['expires_at']}")
+
 def index():
     return jsonify({
         'message': 'Welcome to the Billing System API',
@@ -56,7 +191,6 @@ def index():
         'status': 'running'
     })
 
-@app.route('/api/health')
 def health():
     return jsonify({
         'status': 'healthy',
@@ -64,4 +198,7 @@ def health():
     })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    # Production launcher: pre-forked workers sharing the preloaded app (see src/serve.py).
+    # For development use `flask --app src.main run --debug`.
+    from src.serve import main
+    main()
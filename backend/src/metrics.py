@@ -0,0 +1,302 @@
+"""
+Per-request performance metrics in Prometheus text format.
+
+Every request records its latency, the number of SQL statements it ran and
+the time spent in them, labelled by Flask endpoint. Connection pool gauges,
+SQLAlchemy's compiled statement cache, the application caches that call
+``record_cache``, and timings and counters recorded with ``observe_duration``
+and ``increment_counter`` are reported alongside. Metrics live in process
+memory, so each worker exposes its own series; scrape every worker or sum in
+Prometheus.
+
+A client can send ``X-Debug-Timing: 1`` to get a ``Server-Timing`` header with
+the request's own breakdown when METRICS_DEBUG_HEADER is enabled (always on in
+debug mode).
+"""
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+DEBUG_REQUEST_HEADER = 'X-Debug-Timing'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """In-process store for request, SQL and cache metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # {(endpoint, method, status): Histogram}
+        self.statements = {}  # {endpoint: Histogram}
+        self.sql_seconds = {}  # {endpoint: float}
+        self.caches = {}  # {(cache, result): count}
+        self.durations = {}  # {name: (help, {labels: Histogram})}
+        self.counters = {}  # {name: (help, {labels: count})}
+
+    def observe_request(self, endpoint, method, status, seconds, statements, sql_seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(seconds)
+
+            if endpoint not in self.statements:
+                self.statements[endpoint] = Histogram(STATEMENT_BUCKETS)
+            self.statements[endpoint].observe(statements)
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_seconds
+
+    def record_cache(self, cache, result, count=1):
+        with self._lock:
+            self.caches[(cache, result)] = self.caches.get((cache, result), 0) + count
+
+    def observe_duration(self, name, help_text, seconds, labels):
+        with self._lock:
+            series = self.durations.setdefault(name, (help_text, {}))[1]
+            if labels not in series:
+                series[labels] = Histogram(LATENCY_BUCKETS)
+            series[labels].observe(seconds)
+
+    def increment(self, name, help_text, count, labels):
+        with self._lock:
+            series = self.counters.setdefault(name, (help_text, {}))[1]
+            series[labels] = series.get(labels, 0) + count
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.statements.clear()
+            self.sql_seconds.clear()
+            self.caches.clear()
+            self.durations.clear()
+            self.counters.clear()
+
+    @staticmethod
+    def _histogram_lines(name, labels, histogram):
+        lines = []
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {_format_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+        return lines
+
+    def render(self, engines, boot=None):
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Args:
+            engines: Mapping of bind key to Engine for the pool gauges
+            boot: The app's BootProfile, for the start-up phase gauges
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_request_duration_seconds Request latency by endpoint.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method, status), histogram in sorted(self.latency.items()):
+                lines += self._histogram_lines(
+                    'http_request_duration_seconds',
+                    {'endpoint': endpoint, 'method': method, 'status': status},
+                    histogram
+                )
+
+            lines += [
+                '# HELP http_request_sql_statements SQL statements run per request.',
+                '# TYPE http_request_sql_statements histogram',
+            ]
+            for endpoint, histogram in sorted(self.statements.items()):
+                lines += self._histogram_lines('http_request_sql_statements', {'endpoint': endpoint}, histogram)
+
+            lines += [
+                '# HELP http_request_sql_seconds_total Time spent executing SQL.',
+                '# TYPE http_request_sql_seconds_total counter',
+            ]
+            for endpoint, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f'http_request_sql_seconds_total{_labels(endpoint=endpoint)} {_format_number(seconds)}')
+
+            lines += [
+                '# HELP cache_requests_total Cache lookups by result.',
+                '# TYPE cache_requests_total counter',
+            ]
+            for (cache, result), count in sorted(self.caches.items()):
+                lines.append(f'cache_requests_total{_labels(cache=cache, result=result)} {count}')
+
+            for name, (help_text, series) in sorted(self.durations.items()):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for labels, histogram in sorted(series.items()):
+                    lines += self._histogram_lines(name, dict(labels), histogram)
+
+            for name, (help_text, series) in sorted(self.counters.items()):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for labels, count in sorted(series.items()):
+                    lines.append(f'{name}{_labels(**dict(labels))} {count}')
+
+        pool_gauges = {
+            'db_pool_size': ('Configured pool size.', 'size'),
+            'db_pool_checked_out': ('Connections currently in use.', 'checkedout'),
+            'db_pool_checked_in': ('Idle connections in the pool.', 'checkedin'),
+            'db_pool_overflow': ('Connections opened beyond the pool size.', 'overflow'),
+        }
+        for name, (help_text, method) in pool_gauges.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            for bind, engine in sorted(engines.items(), key=lambda item: item[0] or ''):
+                stat = getattr(engine.pool, method, None)
+                if stat is not None:
+                    lines.append(f'{name}{_labels(bind=bind or "default")} {stat()}')
+
+        if boot is not None:
+            lines += [
+                '# HELP app_boot_seconds Time spent in each step of creating the app.',
+                '# TYPE app_boot_seconds gauge',
+            ]
+            for phase, seconds in boot.phases:
+                lines.append(f'app_boot_seconds{_labels(phase=phase)} {_format_number(seconds)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+def record_cache(cache, result, count=1):
+    """
+    Count lookups against an application cache.
+
+    Args:
+        cache: Cache name, e.g. 'store_hours'
+        result: 'hit', 'miss' or another outcome such as 'refresh'
+        count: Number of lookups with this result
+    """
+    if count:
+        metrics.record_cache(cache, result, count)
+
+
+def observe_duration(name, help_text, seconds, **labels):
+    """
+    Record how long an application operation took, as a histogram.
+
+    Args:
+        name: Metric name, e.g. 'password_hash_seconds'
+        help_text: Description for the exposition's HELP line
+        seconds: Duration
+        labels: Label values, e.g. operation='verify'
+    """
+    metrics.observe_duration(name, help_text, seconds, tuple(sorted(labels.items())))
+
+
+def increment_counter(name, help_text, count=1, **labels):
+    """Add to an application counter; arguments as for observe_duration."""
+    metrics.increment(name, help_text, count, tuple(sorted(labels.items())))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+
+    cache_hit = getattr(context, 'cache_hit', None)
+    if cache_hit is CACHE_HIT:
+        metrics.record_cache('sql_compiled', 'hit')
+    elif cache_hit is CACHE_MISS:
+        metrics.record_cache('sql_compiled', 'miss')
+
+    if has_request_context() and 'request_started' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def _after_request(response):
+    if 'request_started' not in g:
+        return response
+
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe_request(
+        endpoint, request.method, str(response.status_code), elapsed, g.sql_statements, g.sql_seconds
+    )
+
+    if current_app.config['METRICS_DEBUG_HEADER'] and request.headers.get(DEBUG_REQUEST_HEADER) == '1':
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.2f}, '
+            f'sql;dur={g.sql_seconds * 1000:.2f};desc="{g.sql_statements} statements"'
+        )
+    return response
+
+
+def _metrics_view():
+    db = current_app.extensions['sqlalchemy']
+    return Response(metrics.render(db.engines, current_app.extensions.get('boot')), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app):
+    """
+    Install request instrumentation and the metrics endpoint on an app.
+
+    Reads METRICS_PATH (default /metrics) and METRICS_DEBUG_HEADER.
+
+    Args:
+        app: Flask application with the SQLAlchemy extension initialised
+    """
+    app.config.setdefault('METRICS_DEBUG_HEADER', app.debug or os.environ.get('METRICS_DEBUG_HEADER', '0') == '1')
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule(os.environ.get('METRICS_PATH', '/metrics'), 'metrics', _metrics_view)
@@ -0,0 +1,206 @@
+from flask import current_app
+from sqlalchemy import delete, or_, select, update
+from datetime import datetime, timedelta
+import hashlib
+import os
+import secrets
+
+from src.extensions import db
+from src.models.merchant import Merchant
+from src.models.session import Session, TokenRevocation
+from src.models.user import User
+from src.passwords import hash_password, verify_password
+
+# kind -> (model, columns a login name is matched against, fields a registration takes)
+ACCOUNT_KINDS = {
+    'user': (User, ('username', 'email', 'phone_number'),
+             ('username', 'email', 'phone_number', 'first_name', 'last_name')),
+    'merchant': (Merchant, ('email', 'phone_number', 'gst_number'),
+                 ('business_name', 'gst_number', 'email', 'phone_number', 'contact_person', 'business_type')),
+}
+
+
+class AuthService:
+    """
+    Service for sign-in sessions and the tokens issued for them.
+
+    A session is a ``sessions`` row: its ``session_token`` is the ``sid`` in
+    every access token issued for it, and its ``refresh_token`` column holds
+    the SHA-256 of the current refresh token (the token itself is only given
+    to the client). Refreshing swaps in a new refresh token and issues a new
+    access token; signing out deactivates the session and records it in
+    ``token_revocations`` until its last access token has expired. Access
+    tokens are verified by the auth middleware (src/auth.py) without touching
+    these tables.
+
+    Passwords are hashed and checked on the bounded pool in src/passwords.py,
+    which raises HashPoolBusy when it is saturated.
+    """
+
+    REFRESH_TOKEN_DAYS = int(os.environ.get('REFRESH_TOKEN_DAYS', '30'))
+
+    @staticmethod
+    def _hash(refresh_token):
+        return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+    @staticmethod
+    def _tokens(kind, subject_id, sid, refresh_token, refresh_expires_at):
+        codec = current_app.extensions['auth'].codec
+        access_token, expires = codec.issue(kind, subject_id, sid)
+        return {
+            'access_token': access_token,
+            'token_type': 'Bearer',
+            'expires_in': codec.ttl,
+            'expires_at': datetime.utcfromtimestamp(expires).isoformat(),
+            'refresh_token': refresh_token,
+            'refresh_expires_at': refresh_expires_at.isoformat()
+        }
+
+    @classmethod
+    def start_session(cls, kind, subject_id, ip_address=None, user_agent=None):
+        """
+        Sign a user or merchant in.
+
+        Args:
+            kind: 'user' or 'merchant'
+            subject_id: ID of the user or merchant
+            ip_address: Client address, kept on the session
+            user_agent: Client User-Agent, kept on the session
+
+        Returns:
+            dict: Access token, refresh token and their expiry
+        """
+        now = datetime.utcnow()
+        refresh_token = secrets.token_urlsafe(32)
+        session = Session(
+            session_token=secrets.token_hex(16),
+            refresh_token=cls._hash(refresh_token),
+            ip_address=ip_address,
+            user_agent=user_agent,
+            expires_at=now + timedelta(days=cls.REFRESH_TOKEN_DAYS),
+            last_activity=now,
+            **{f'{kind}_id': subject_id}
+        )
+        db.session.add(session)
+        db.session.commit()
+
+        return cls._tokens(kind, subject_id, session.session_token, refresh_token, session.expires_at)
+
+    @staticmethod
+    def register(kind, fields, password):
+        """
+        Create a user or merchant account with a password.
+
+        Args:
+            kind: 'user' or 'merchant'
+            fields: Column values, limited to the kind's registration fields
+            password: Plain-text password
+
+        Returns:
+            User or Merchant: The new account, not yet committed
+        """
+        model, _, allowed = ACCOUNT_KINDS[kind]
+        account = model(
+            password_hash=hash_password(password),
+            **{name: value for name, value in fields.items() if name in allowed}
+        )
+        db.session.add(account)
+        db.session.flush()
+        return account
+
+    @staticmethod
+    def check_password(kind, login, password):
+        """
+        Find an account by login name and check its password.
+
+        The login name is matched against the kind's login columns. A stored
+        hash made with an old scheme or old costs is replaced with a new one,
+        and last_login is updated; the caller commits.
+
+        Args:
+            kind: 'user' or 'merchant'
+            login: Username, email, phone number (or GST number for merchants)
+            password: Plain-text password
+
+        Returns:
+            User or Merchant: The account, or None if the login name or password is wrong
+        """
+        model, login_columns, _ = ACCOUNT_KINDS[kind]
+        account = db.session.execute(
+            select(model).where(or_(*[getattr(model, column) == login for column in login_columns])).limit(1)
+        ).scalar_one_or_none()
+
+        # Unknown accounts still cost one hash, so timing does not tell them apart
+        matches, needs_rehash = verify_password(password, account.password_hash if account else None)
+        if not matches:
+            return None
+
+        if needs_rehash:
+            # Only replace the hash this login checked, not one a concurrent change just wrote
+            db.session.execute(
+                update(model)
+                .where(model.id == account.id, model.password_hash == account.password_hash)
+                .values(password_hash=hash_password(password))
+            )
+        account.last_login = datetime.utcnow()
+        return account
+
+    @classmethod
+    def refresh(cls, refresh_token):
+        """
+        Issue a new access token and refresh token for a session.
+
+        The refresh token is single use: concurrent refreshes with the same
+        token get one new pair between them.
+
+        Args:
+            refresh_token: The session's current refresh token
+
+        Returns:
+            dict: New tokens, or None if the refresh token is unknown, used, expired or signed out
+        """
+        now = datetime.utcnow()
+        token_hash = cls._hash(refresh_token)
+        session = db.session.execute(
+            select(Session.id, Session.session_token, Session.user_id, Session.merchant_id, Session.expires_at).where(
+                Session.refresh_token == token_hash,
+                Session.is_active.is_(True),
+                Session.expires_at > now
+            )
+        ).first()
+        if session is None:
+            return None
+
+        new_refresh_token = secrets.token_urlsafe(32)
+        swapped = db.session.execute(
+            update(Session)
+            .where(Session.id == session.id, Session.refresh_token == token_hash, Session.is_active.is_(True))
+            .values(refresh_token=cls._hash(new_refresh_token), last_activity=now)
+        ).rowcount
+        db.session.commit()
+        if not swapped:
+            return None
+
+        kind, subject_id = ('user', session.user_id) if session.user_id else ('merchant', session.merchant_id)
+        return cls._tokens(kind, subject_id, session.session_token, new_refresh_token, session.expires_at)
+
+    @classmethod
+    def end_session(cls, sid):
+        """
+        Sign a session out: its refresh token stops working and its access tokens are revoked.
+
+        Also removes revocations whose tokens have all expired.
+
+        Args:
+            sid: The session's ``session_token``
+        """
+        now = datetime.utcnow()
+        codec = current_app.extensions['auth'].codec
+        db.session.execute(
+            update(Session).where(Session.session_token == sid).values(is_active=False, last_activity=now)
+        )
+        db.session.add(TokenRevocation(session_token=sid, revoked_at=now, expires_at=now + timedelta(seconds=codec.ttl)))
+        db.session.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= now))
+        db.session.commit()
+
+        current_app.extensions['auth'].revocations.add(sid)
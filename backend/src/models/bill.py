@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.extensions import db
+from src.serialization import serializer_for
 
-db = SQLAlchemy()
 
 class Bill(db.Model):
     __tablename__ = 'bills'
@@ -21,34 +21,32 @@ class Bill(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_bills_user_id_bill_date', 'user_id', 'bill_date'),
+        db.Index('idx_bills_merchant_id_bill_date', 'merchant_id', 'bill_date'),
+        db.Index('idx_bills_bill_date', 'bill_date'),
+        db.Index('idx_bills_status', 'status'),
+    )
+    
     # Relationships
     items = db.relationship('BillItem', backref='bill', lazy=True, cascade="all, delete-orphan")
     payments = db.relationship('Payment', backref='bill', lazy=True, cascade="all, delete-orphan")
     temporary_links = db.relationship('TemporaryLink', 
-                                     primaryjoin="and_(Bill.id==TemporaryLink.related_entity_id, "
+                                     primaryjoin="and_(Bill.id==foreign(TemporaryLink.related_entity_id), "
                                                 "TemporaryLink.related_entity_type=='bill')",
                                      backref='bill', lazy=True)
     
+    SERIALIZED_FIELDS = (
+        'id', 'bill_number', 'merchant_id', 'store_id', 'user_id', 'bill_date', 'due_date',
+        'total_amount', 'tax_amount', 'discount_amount', 'status', 'notes', 'created_at',
+        'updated_at',
+    )
+    
     def __repr__(self):
         return f'<Bill {self.bill_number}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'bill_number': self.bill_number,
-            'merchant_id': self.merchant_id,
-            'store_id': self.store_id,
-            'user_id': self.user_id,
-            'bill_date': self.bill_date.isoformat() if self.bill_date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'total_amount': float(self.total_amount),
-            'tax_amount': float(self.tax_amount),
-            'discount_amount': float(self.discount_amount),
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(Bill).from_object(self)
 
 
 class BillItem(db.Model):
@@ -66,23 +64,20 @@ class BillItem(db.Model):
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_bill_items_bill_id', 'bill_id'),
+    )
+    
+    SERIALIZED_FIELDS = (
+        'id', 'bill_id', 'product_id', 'product_name', 'quantity', 'unit_price', 'tax_rate',
+        'tax_amount', 'discount_amount', 'total_amount', 'created_at',
+    )
+    
     def __repr__(self):
         return f'<BillItem {self.id} for bill {self.bill_id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'bill_id': self.bill_id,
-            'product_id': self.product_id,
-            'product_name': self.product_name,
-            'quantity': self.quantity,
-            'unit_price': float(self.unit_price),
-            'tax_rate': float(self.tax_rate),
-            'tax_amount': float(self.tax_amount),
-            'discount_amount': float(self.discount_amount),
-            'total_amount': float(self.total_amount),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return serializer_for(BillItem).from_object(self)
 
 
 class Payment(db.Model):
@@ -99,19 +94,18 @@ class Payment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_by = db.Column(db.Integer)  # User or merchant who recorded the payment
     
+    __table_args__ = (
+        db.Index('idx_payments_bill_id', 'bill_id'),
+        db.Index('idx_payments_payment_date', 'payment_date'),
+    )
+    
+    SERIALIZED_FIELDS = (
+        'id', 'bill_id', 'payment_method', 'amount', 'payment_date', 'transaction_reference',
+        'status', 'notes', 'created_at', 'updated_by',
+    )
+    
     def __repr__(self):
         return f'<Payment {self.id} for bill {self.bill_id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'bill_id': self.bill_id,
-            'payment_method': self.payment_method,
-            'amount': float(self.amount),
-            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
-            'transaction_reference': self.transaction_reference,
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_by': self.updated_by
-        }
+        return serializer_for(Payment).from_object(self)
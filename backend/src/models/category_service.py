@@ -0,0 +1,119 @@
+from sqlalchemy import and_, func
+from sqlalchemy.orm import aliased
+
+from src.extensions import db
+from src.models.product import Product, ProductCategory, ProductCategoryClosure
+
+
+class CategoryService:
+    """
+    Service for category subtree queries backed by the ``product_category_closure`` table.
+
+    The closure table holds every (ancestor, descendant) pair and is kept current by
+    the insert/update/delete hooks on ``ProductCategory``, so a whole subtree is one
+    indexed join instead of one lazy load per level.
+    """
+
+    @classmethod
+    def rebuild_closure(cls):
+        """
+        Rebuild the closure table from ``parent_category_id``.
+
+        Returns:
+            int: Number of closure rows written
+        """
+        parents = dict(db.session.query(ProductCategory.id, ProductCategory.parent_category_id).all())
+
+        rows = []
+        for category_id in parents:
+            ancestor_id, depth, seen = category_id, 0, set()
+            # Walk up to the root, stopping on dangling parents or cycles
+            while ancestor_id is not None and ancestor_id in parents and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                rows.append({'ancestor_id': ancestor_id, 'descendant_id': category_id, 'depth': depth})
+                ancestor_id, depth = parents[ancestor_id], depth + 1
+
+        db.session.execute(ProductCategoryClosure.__table__.delete())
+        if rows:
+            db.session.execute(ProductCategoryClosure.__table__.insert(), rows)
+        db.session.commit()
+
+        return len(rows)
+
+    @classmethod
+    def ensure_closure(cls):
+        """Backfill the closure table if categories exist but have never been indexed."""
+        has_closure = db.session.query(ProductCategoryClosure.ancestor_id).limit(1).first()
+        has_categories = db.session.query(ProductCategory.id).limit(1).first()
+
+        if has_categories and not has_closure:
+            cls.rebuild_closure()
+
+    @staticmethod
+    def subtree_ids(category_id):
+        """Get the IDs of a category and all of its descendants."""
+        return [
+            row[0] for row in db.session.query(ProductCategoryClosure.descendant_id).filter(
+                ProductCategoryClosure.ancestor_id == category_id
+            )
+        ]
+
+    @staticmethod
+    def subtree_products(category_id, limit=50, offset=0):
+        """
+        Get the products anywhere under a category.
+
+        Args:
+            category_id: ID of the category
+            limit: Maximum number of products
+            offset: Number of products to skip
+
+        Returns:
+            tuple: (list of Product objects, total count)
+        """
+        query = Product.query.join(
+            ProductCategoryClosure, ProductCategoryClosure.descendant_id == Product.category_id
+        ).filter(
+            ProductCategoryClosure.ancestor_id == category_id
+        )
+
+        total = query.order_by(None).count()
+        products = query.order_by(Product.name, Product.id).limit(limit).offset(offset).all()
+
+        return products, total
+
+    @staticmethod
+    def facet_counts(category_id):
+        """
+        Count the products under each direct subcategory of a category.
+
+        Args:
+            category_id: ID of the parent category
+
+        Returns:
+            list: Dicts with category id, name and product count
+        """
+        children = aliased(ProductCategoryClosure)
+
+        rows = db.session.query(
+            ProductCategory.id,
+            ProductCategory.name,
+            func.count(Product.id)
+        ).join(
+            children, and_(children.descendant_id == ProductCategory.id, children.depth == 1)
+        ).join(
+            ProductCategoryClosure, ProductCategoryClosure.ancestor_id == ProductCategory.id
+        ).outerjoin(
+            Product, Product.category_id == ProductCategoryClosure.descendant_id
+        ).filter(
+            children.ancestor_id == category_id
+        ).group_by(
+            ProductCategory.id, ProductCategory.name
+        ).order_by(
+            ProductCategory.name
+        ).all()
+
+        return [
+            {'category_id': row[0], 'name': row[1], 'product_count': row[2]}
+            for row in rows
+        ]
@@ -0,0 +1,28 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class IdempotencyKey(db.Model):
+    """An Idempotency-Key claimed by a request and, once it finished, the response to replay."""
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(100), nullable=False)  # Flask endpoint and caller, e.g. 'bill.create_bill:merchant:7'
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # 'in_progress' or 'completed'
+    claim_token = db.Column(db.String(32), nullable=False)  # Identifies the request holding the key
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    response_mimetype = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uix_idempotency_scope_key'),
+        db.Index('idx_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope} {self.key} {self.status}>'
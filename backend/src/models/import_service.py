@@ -0,0 +1,323 @@
+from sqlalchemy import bindparam
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import csv
+import importlib
+import json
+import os
+
+from src.extensions import db
+from src.models.merchant import StoreLocation
+from src.models.product import Product, MerchantInventory
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+UPSERT_COLUMNS = ('price', 'stock_quantity', 'is_available')
+# Dialects with a native upsert; their modules are imported on first use
+UPSERT_DIALECTS = ('sqlite', 'mysql', 'postgresql')
+
+
+class InventoryImportService:
+    """
+    Service for streaming bulk inventory imports from merchant ERPs.
+
+    Input is read one record at a time and written in chunks of ``CHUNK_SIZE``
+    rows with a dialect-native upsert on ``uix_merchant_store_product``, one
+    executemany per chunk, so memory stays bounded whatever the file size.
+    Rows can name the product by ``product_id``, ``sku`` or ``barcode``.
+    """
+
+    CHUNK_SIZE = int(os.environ.get('INVENTORY_IMPORT_CHUNK_SIZE', '1000'))
+    MAX_REPORTED_ERRORS = 1000
+
+    @staticmethod
+    def iter_records(stream, fmt):
+        """
+        Yield (line_number, record dict) pairs from a text stream.
+
+        Args:
+            stream: Text stream with CSV (header row first) or NDJSON content
+            fmt: 'csv' or 'ndjson'
+        """
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+                    continue
+                yield line_number, record
+
+    @staticmethod
+    def _parse_record(record):
+        """Validate one record into column values, raising ValueError with a readable message."""
+        if isinstance(record, Exception):
+            raise ValueError(f'Invalid JSON: {record}')
+        if not isinstance(record, dict):
+            raise ValueError('Record must be an object')
+
+        def value(name):
+            raw = record.get(name)
+            return raw.strip() if isinstance(raw, str) else raw
+
+        product_id = value('product_id')
+        sku = value('sku')
+        barcode = value('barcode')
+        if product_id in (None, '') and not sku and not barcode:
+            raise ValueError('One of product_id, sku or barcode is required')
+
+        try:
+            price = Decimal(str(value('price')))
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid price: {record.get('price')!r}")
+        if not price.is_finite():
+            raise ValueError(f"Invalid price: {record.get('price')!r}")
+        if price < 0:
+            raise ValueError('price must not be negative')
+
+        try:
+            stock_quantity = Decimal(str(value('stock_quantity') or 0))
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid stock_quantity: {record.get('stock_quantity')!r}")
+        if not stock_quantity.is_finite() or stock_quantity != stock_quantity.to_integral_value():
+            raise ValueError(f"Invalid stock_quantity: {record.get('stock_quantity')!r}")
+        stock_quantity = int(stock_quantity)
+
+        store_id = value('store_id')
+        is_available = value('is_available')
+        if isinstance(is_available, str):
+            is_available = is_available.lower() not in ('0', 'false', 'no', 'n', '')
+
+        try:
+            product_id = int(product_id) if product_id not in (None, '') else None
+            store_id = int(store_id) if store_id not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ValueError('product_id and store_id must be integers')
+
+        return {
+            'product_id': product_id,
+            'sku': sku or None,
+            'barcode': barcode or None,
+            'store_id': store_id,
+            'price': price,
+            'stock_quantity': stock_quantity,
+            'is_available': True if is_available is None else bool(is_available),
+        }
+
+    @classmethod
+    def _resolve_products(cls, rows):
+        """Fill in product_id for rows identified by SKU or barcode, with one query per code type."""
+        for column in ('sku', 'barcode'):
+            codes = {row[column] for row in rows if row['product_id'] is None and row[column]}
+            if not codes:
+                continue
+            mapping = dict(db.session.query(getattr(Product, column), Product.id).filter(
+                getattr(Product, column).in_(codes)
+            ).all())
+            for row in rows:
+                if row['product_id'] is None and row[column] in mapping:
+                    row['product_id'] = mapping[row[column]]
+
+    @staticmethod
+    def _existing_products(rows):
+        """The product_ids among rows that exist in the catalogue."""
+        product_ids = {row['product_id'] for row in rows if row['product_id'] is not None}
+        if not product_ids:
+            return set()
+        return {product_id for product_id, in db.session.query(Product.id).filter(Product.id.in_(product_ids))}
+
+    @staticmethod
+    def _own_stores(merchant_id, rows):
+        """The store_ids among rows that belong to the merchant."""
+        store_ids = {row['store_id'] for row in rows if row['store_id'] is not None}
+        if not store_ids:
+            return set()
+        return {store_id for store_id, in db.session.query(StoreLocation.id).filter(
+            StoreLocation.id.in_(store_ids),
+            StoreLocation.merchant_id == merchant_id
+        )}
+
+    @classmethod
+    def _upsert(cls, merchant_id, rows, now):
+        """Write one chunk of rows that all carry a store_id."""
+        table = MerchantInventory.__table__
+        dialect = db.engine.dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            raise RuntimeError(f'Bulk import is not supported on {dialect}')
+
+        statement = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert(table)
+        if dialect == 'mysql':
+            statement = statement.on_duplicate_key_update(
+                **{column: statement.inserted[column] for column in UPSERT_COLUMNS},
+                updated_at=now
+            )
+        else:
+            statement = statement.on_conflict_do_update(
+                index_elements=['merchant_id', 'store_id', 'product_id'],
+                set_={**{column: statement.excluded[column] for column in UPSERT_COLUMNS}, 'updated_at': now}
+            )
+
+        db.session.execute(statement, [cls._values(merchant_id, row, now) for row in rows])
+
+    @classmethod
+    def _upsert_merchant_wide(cls, merchant_id, rows, now):
+        """
+        Write rows without a store_id.
+
+        NULL never conflicts in a unique constraint, so these are split into an
+        executemany UPDATE for existing rows and an executemany INSERT for the rest.
+        """
+        table = MerchantInventory.__table__
+        existing = set(db.session.execute(
+            table.select().with_only_columns(table.c.product_id).where(
+                table.c.merchant_id == merchant_id,
+                table.c.store_id.is_(None),
+                table.c.product_id.in_([row['product_id'] for row in rows])
+            )
+        ).scalars())
+
+        updates = [row for row in rows if row['product_id'] in existing]
+        inserts = [cls._values(merchant_id, row, now) for row in rows if row['product_id'] not in existing]
+
+        if updates:
+            statement = table.update().where(
+                table.c.merchant_id == merchant_id,
+                table.c.store_id.is_(None),
+                table.c.product_id == bindparam('b_product_id')
+            ).values(
+                price=bindparam('b_price'),
+                stock_quantity=bindparam('b_stock_quantity'),
+                is_available=bindparam('b_is_available'),
+                updated_at=now
+            )
+            db.session.execute(statement, [
+                {
+                    'b_product_id': row['product_id'],
+                    'b_price': row['price'],
+                    'b_stock_quantity': row['stock_quantity'],
+                    'b_is_available': row['is_available']
+                }
+                for row in updates
+            ])
+        if inserts:
+            db.session.execute(table.insert(), inserts)
+
+    @classmethod
+    def _write(cls, merchant_id, rows, now):
+        store_rows = [row for row in rows if row['store_id'] is not None]
+        merchant_rows = [row for row in rows if row['store_id'] is None]
+        if store_rows:
+            cls._upsert(merchant_id, store_rows, now)
+        if merchant_rows:
+            cls._upsert_merchant_wide(merchant_id, merchant_rows, now)
+
+    @staticmethod
+    def _values(merchant_id, row, now):
+        return {
+            'merchant_id': merchant_id,
+            'store_id': row['store_id'],
+            'product_id': row['product_id'],
+            'price': row['price'],
+            'stock_quantity': row['stock_quantity'],
+            'is_available': row['is_available'],
+            'created_at': now,
+            'updated_at': now
+        }
+
+    @classmethod
+    def _write_chunk(cls, merchant_id, chunk, report):
+        """
+        Resolve, upsert and commit one chunk of (line_number, row) pairs.
+
+        If the chunk's write fails, its rows are retried one at a time so the
+        error is reported against the row that caused it.
+        """
+        rows = [row for _, row in chunk]
+        cls._resolve_products(rows)
+        products = cls._existing_products(rows)
+        own_stores = cls._own_stores(merchant_id, rows)
+
+        valid = []
+        for line_number, row in chunk:
+            if row['product_id'] is None:
+                cls._record_error(report, line_number, 'Unknown product')
+            elif row['product_id'] not in products:
+                cls._record_error(report, line_number, f"Unknown product {row['product_id']}")
+            elif row['store_id'] is not None and row['store_id'] not in own_stores:
+                cls._record_error(report, line_number, f"Store {row['store_id']} does not belong to this merchant")
+            else:
+                valid.append((line_number, row))
+
+        # Last occurrence wins when a file repeats the same product and store
+        deduped = {(row['store_id'], row['product_id']): (line_number, row) for line_number, row in valid}
+        report['duplicates'] += len(valid) - len(deduped)
+        if not deduped:
+            return
+
+        now = datetime.utcnow()
+        try:
+            cls._write(merchant_id, [row for _, row in deduped.values()], now)
+            db.session.commit()
+            report['upserted'] += len(deduped)
+            return
+        except Exception:
+            db.session.rollback()
+
+        for line_number, row in deduped.values():
+            try:
+                cls._write(merchant_id, [row], now)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                cls._record_error(report, line_number, f'{e.__class__.__name__}: {e}')
+                continue
+            report['upserted'] += 1
+
+    @classmethod
+    def _record_error(cls, report, line_number, message):
+        report['failed'] += 1
+        report['error_count'] += 1
+        if len(report['errors']) < cls.MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_number, 'error': message})
+
+    @classmethod
+    def import_stream(cls, merchant_id, stream, fmt='csv'):
+        """
+        Import inventory records for a merchant.
+
+        Args:
+            merchant_id: ID of the merchant that owns the inventory
+            stream: Text stream to read records from
+            fmt: 'csv' or 'ndjson'
+
+        Returns:
+            dict: Counts of rows read, upserted, duplicated and failed, plus per-row errors
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f'Unknown import format: {fmt}')
+
+        report = {'rows_read': 0, 'upserted': 0, 'duplicates': 0, 'failed': 0, 'error_count': 0, 'errors': []}
+        chunk = []
+
+        for line_number, record in cls.iter_records(stream, fmt):
+            report['rows_read'] += 1
+            try:
+                chunk.append((line_number, cls._parse_record(record)))
+            except ValueError as e:
+                cls._record_error(report, line_number, str(e))
+                continue
+
+            if len(chunk) >= cls.CHUNK_SIZE:
+                cls._write_chunk(merchant_id, chunk, report)
+                chunk = []
+
+        if chunk:
+            cls._write_chunk(merchant_id, chunk, report)
+
+        return report
@@ -0,0 +1,200 @@
+from sqlalchemy import case, update
+from datetime import datetime
+import os
+
+from src.models.product import MerchantInventory
+
+OVERSELL_POLICIES = ('reject', 'skip', 'allow')
+
+
+class InventoryService:
+    """
+    Service for stock movements on ``MerchantInventory``.
+
+    Stock is decremented for a whole bill with one conditional UPDATE, so
+    concurrent checkouts only contend on the rows they actually share and a
+    line can never take stock below zero unless the oversell policy allows it.
+    """
+
+    DEFAULT_OVERSELL_POLICY = os.environ.get('STOCK_OVERSELL_POLICY', 'skip')
+
+    @staticmethod
+    def aggregate_lines(items):
+        """
+        Sum requested quantities per product, ignoring custom items without a product_id.
+
+        Args:
+            items: Bill item dicts with 'product_id' and 'quantity'
+
+        Returns:
+            dict: Mapping of product ID to total quantity
+
+        Raises:
+            ValueError: If a quantity is not a whole number of at least 1
+        """
+        quantities = {}
+        for item in items:
+            product_id = item.get('product_id')
+            if product_id is None:
+                continue
+            quantity = item['quantity']
+            if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+                raise ValueError(f'Invalid quantity for product {product_id}: {quantity!r}')
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    @staticmethod
+    def _scope(merchant_id, store_id):
+        table = MerchantInventory.__table__
+        store_filter = table.c.store_id.is_(None) if store_id is None else table.c.store_id == store_id
+        return table, [table.c.merchant_id == merchant_id, store_filter]
+
+    @classmethod
+    def _decrement(cls, session, merchant_id, store_id, quantities, conditional):
+        """
+        Decrement stock for several products in one statement.
+
+        Returns:
+            set: Product IDs whose rows were updated
+        """
+        table, scope = cls._scope(merchant_id, store_id)
+
+        if not session.get_bind().dialect.update_returning:
+            # Without RETURNING, lock just this bill's rows and only update the ones that fit
+            stock = dict(session.execute(
+                table.select().with_only_columns(table.c.product_id, table.c.stock_quantity).where(
+                    *scope,
+                    table.c.product_id.in_(list(quantities))
+                ).with_for_update()
+            ).all())
+            quantities = {
+                product_id: qty for product_id, qty in quantities.items()
+                if product_id in stock and (not conditional or stock[product_id] >= qty)
+            }
+            if not quantities:
+                return set()
+
+        requested = case(quantities, value=table.c.product_id)
+        statement = update(table).where(
+            *scope,
+            table.c.product_id.in_(list(quantities))
+        ).values(
+            stock_quantity=table.c.stock_quantity - requested,
+            updated_at=datetime.utcnow()
+        )
+        if conditional:
+            statement = statement.where(table.c.stock_quantity >= requested)
+
+        if session.get_bind().dialect.update_returning:
+            return set(session.execute(statement.returning(table.c.product_id)).scalars())
+
+        session.execute(statement)
+        return set(quantities)
+
+    @classmethod
+    def reserve(cls, session, merchant_id, store_id, quantities):
+        """
+        Take stock for products that have enough of it, in one statement.
+
+        Args:
+            session: Session to write in
+            merchant_id: ID of the merchant
+            store_id: ID of the store, or None for merchant-wide inventory
+            quantities: Mapping of product ID to quantity
+
+        Returns:
+            set: Product IDs that were reserved
+        """
+        if not quantities:
+            return set()
+        return cls._decrement(session, merchant_id, store_id, quantities, conditional=True)
+
+    @classmethod
+    def release(cls, session, merchant_id, store_id, quantities):
+        """
+        Put back stock taken by ``reserve``, in one statement.
+
+        Args:
+            session: Session to write in
+            merchant_id: ID of the merchant
+            store_id: ID of the store, or None for merchant-wide inventory
+            quantities: Mapping of product ID to quantity
+        """
+        if not quantities:
+            return
+        table, scope = cls._scope(merchant_id, store_id)
+        session.execute(
+            update(table).where(
+                *scope,
+                table.c.product_id.in_(list(quantities))
+            ).values(
+                stock_quantity=table.c.stock_quantity + case(quantities, value=table.c.product_id),
+                updated_at=datetime.utcnow()
+            )
+        )
+
+    @classmethod
+    def decrement_for_bill(cls, session, merchant_id, store_id, items, policy=None):
+        """
+        Take the stock for a bill's lines.
+
+        Policies:
+        - 'reject': the result is not ok if any line is short and the caller must roll back
+        - 'skip': lines with enough stock are decremented, short lines are left alone
+        - 'allow': every line with an inventory row is decremented, even below zero
+
+        Args:
+            session: Session the bill is being written in
+            merchant_id: ID of the merchant
+            store_id: ID of the store, or None for merchant-wide inventory
+            items: Bill item dicts with 'product_id' and 'quantity'
+            policy: Oversell policy, defaults to STOCK_OVERSELL_POLICY
+
+        Returns:
+            dict: 'ok', 'policy', 'decremented' product IDs and 'failed' lines
+        """
+        policy = policy or cls.DEFAULT_OVERSELL_POLICY
+        if policy not in OVERSELL_POLICIES:
+            raise ValueError(f'Unknown oversell policy: {policy}')
+
+        quantities = cls.aggregate_lines(items)
+        if not quantities:
+            return {'ok': True, 'policy': policy, 'decremented': [], 'failed': []}
+
+        decremented = cls._decrement(session, merchant_id, store_id, quantities, conditional=True)
+        short = {product_id: qty for product_id, qty in quantities.items() if product_id not in decremented}
+
+        oversold = set()
+        if short and policy == 'allow':
+            oversold = cls._decrement(session, merchant_id, store_id, short, conditional=False)
+
+        failed = []
+        if short:
+            table, scope = cls._scope(merchant_id, store_id)
+            available = dict(session.execute(
+                table.select().with_only_columns(table.c.product_id, table.c.stock_quantity).where(
+                    *scope,
+                    table.c.product_id.in_(list(short))
+                )
+            ).all())
+
+            for product_id, qty in short.items():
+                if product_id in oversold:
+                    reason = 'oversold'
+                elif product_id in available:
+                    reason = 'insufficient_stock'
+                else:
+                    reason = 'not_stocked'
+                failed.append({
+                    'product_id': product_id,
+                    'requested': qty,
+                    'available': available.get(product_id),
+                    'reason': reason
+                })
+
+        return {
+            'ok': policy != 'reject' or not failed,
+            'policy': policy,
+            'decremented': sorted(decremented | oversold),
+            'failed': failed
+        }
@@ -0,0 +1,44 @@
+from datetime import datetime
+from src.extensions import db
+from src.serialization import serializer_for
+
+
+class CustomerLedger(db.Model):
+    """
+    Running totals of one user's bills with one merchant.
+
+    Kept up to date in the same transaction as the bill and payment writes by
+    LedgerService; cancelled bills are counted but do not add to the amounts.
+    """
+    __tablename__ = 'customer_ledger'
+
+    id = db.Column(db.Integer, primary_key=True)
+    merchant_id = db.Column(db.Integer, db.ForeignKey('merchants.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    bill_count = db.Column(db.Integer, nullable=False, default=0)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    partially_paid_count = db.Column(db.Integer, nullable=False, default=0)
+    paid_count = db.Column(db.Integer, nullable=False, default=0)
+    overdue_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    billed_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    paid_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    balance = db.Column(db.Numeric(12, 2), nullable=False, default=0)  # billed_amount - paid_amount
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('merchant_id', 'user_id', name='uix_customer_ledger_merchant_user'),
+        db.Index('idx_customer_ledger_user_id', 'user_id'),
+        db.Index('idx_customer_ledger_merchant_id_balance', 'merchant_id', 'balance'),
+    )
+
+    SERIALIZED_FIELDS = (
+        'merchant_id', 'user_id', 'bill_count', 'pending_count', 'partially_paid_count', 'paid_count',
+        'overdue_count', 'cancelled_count', 'billed_amount', 'paid_amount', 'balance', 'updated_at',
+    )
+
+    def __repr__(self):
+        return f'<CustomerLedger merchant {self.merchant_id} user {self.user_id} balance {self.balance}>'
+
+    def to_dict(self):
+        return serializer_for(CustomerLedger).from_object(self)
@@ -0,0 +1,298 @@
+from sqlalchemy import case, delete, func, select, update
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import importlib
+
+from src.extensions import db
+from src.models.bill import Bill, Payment
+from src.models.import_service import UPSERT_DIALECTS
+from src.models.ledger import CustomerLedger
+
+CENT = Decimal('0.01')
+BILL_STATUSES = ('pending', 'partially_paid', 'paid', 'overdue', 'cancelled')
+STATUS_COLUMNS = {status: f'{status}_count' for status in BILL_STATUSES}
+AMOUNT_COLUMNS = ('billed_amount', 'paid_amount', 'balance')
+COUNTER_COLUMNS = ('bill_count',) + tuple(STATUS_COLUMNS.values()) + AMOUNT_COLUMNS
+
+# Statuses the overdue sweep moves on once the due date has passed
+OVERDUE_FROM = ('pending', 'partially_paid')
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class LedgerService:
+    """
+    Service maintaining the per-(merchant, user) customer ledger.
+
+    A bill adds to its ledger row according to its status, total and completed
+    payments (see ``contribution``). Every write that changes one of those calls
+    ``record_change`` with the bill's state before and after, which applies the
+    difference as a single atomic upsert in the caller's transaction, so the
+    ledger commits or rolls back with the bill. Reading balances is then one
+    indexed row per customer instead of an aggregate over all bills and
+    payments. ``check`` recomputes the ledger from the raw rows to verify it.
+    Bills without a user are not in the ledger.
+    """
+
+    SWEEP_CHUNK = 500
+    REBUILD_CHUNK = 1000
+
+    @staticmethod
+    def contribution(status, total_amount, paid_amount):
+        """
+        What one bill adds to its ledger row.
+
+        Cancelled bills count towards bill_count and cancelled_count only.
+
+        Args:
+            status: Bill status
+            total_amount: Bill total
+            paid_amount: Sum of the bill's completed payments
+
+        Returns:
+            dict: Column -> amount to add
+        """
+        billed = paid = Decimal('0.00')
+        if status != 'cancelled':
+            billed, paid = _money(total_amount), _money(paid_amount)
+        return {
+            'bill_count': 1,
+            STATUS_COLUMNS[status]: 1,
+            'billed_amount': billed,
+            'paid_amount': paid,
+            'balance': billed - paid,
+        }
+
+    @classmethod
+    def record_change(cls, session, merchant_id, user_id, before=None, after=None):
+        """
+        Apply a change to one bill to its ledger row, in the caller's transaction.
+
+        Args:
+            session: SQLAlchemy session the bill is written with
+            merchant_id: Bill's merchant
+            user_id: Bill's user; bills without one are skipped
+            before: (status, total_amount, paid_amount) before the change, None for a new bill
+            after: (status, total_amount, paid_amount) after the change, None for a deleted bill
+        """
+        if user_id is None:
+            return
+
+        deltas = {}
+        for sign, state in ((-1, before), (1, after)):
+            if state is None:
+                continue
+            for column, value in cls.contribution(*state).items():
+                deltas[column] = deltas.get(column, 0) + sign * value
+
+        deltas = {column: value for column, value in deltas.items() if value}
+        if deltas:
+            cls._apply(session, merchant_id, user_id, deltas)
+
+    @staticmethod
+    def _apply(session, merchant_id, user_id, deltas):
+        """Add deltas to a ledger row, creating it if needed, in one statement where the dialect allows."""
+        table = CustomerLedger.__table__
+        now = datetime.utcnow()
+        dialect = db.engine.dialect.name
+
+        if dialect in UPSERT_DIALECTS:
+            statement = importlib.import_module(f'sqlalchemy.dialects.{dialect}').insert(table).values(
+                merchant_id=merchant_id, user_id=user_id, updated_at=now,
+                **{column: deltas.get(column, 0) for column in COUNTER_COLUMNS}
+            )
+            if dialect == 'mysql':
+                statement = statement.on_duplicate_key_update(
+                    updated_at=now, **{column: table.c[column] + statement.inserted[column] for column in deltas}
+                )
+            else:
+                statement = statement.on_conflict_do_update(
+                    index_elements=['merchant_id', 'user_id'],
+                    set_={'updated_at': now, **{column: table.c[column] + statement.excluded[column] for column in deltas}}
+                )
+            session.execute(statement)
+            return
+
+        updated = session.execute(
+            update(table)
+            .where(table.c.merchant_id == merchant_id, table.c.user_id == user_id)
+            .values(updated_at=now, **{column: table.c[column] + value for column, value in deltas.items()})
+        ).rowcount
+        if not updated:
+            session.execute(table.insert().values(
+                merchant_id=merchant_id, user_id=user_id, updated_at=now,
+                **{column: deltas.get(column, 0) for column in COUNTER_COLUMNS}
+            ))
+
+    @staticmethod
+    def paid_amount(session, bill_id):
+        """Sum of a bill's completed payments."""
+        return _money(session.execute(
+            select(func.sum(Payment.amount)).where(Payment.bill_id == bill_id, Payment.status == 'completed')
+        ).scalar())
+
+    @classmethod
+    def mark_overdue(cls, session, now=None):
+        """
+        Mark pending and partially paid bills past their due date as overdue.
+
+        Works in chunks of SWEEP_CHUNK bills, each committed with its ledger
+        updates. The chunk's bills are locked while they are updated on
+        databases that support SELECT ... FOR UPDATE.
+
+        Args:
+            session: SQLAlchemy session
+            now: Cut-off time, defaults to the current UTC time
+
+        Returns:
+            int: Number of bills marked overdue
+        """
+        now = now or datetime.utcnow()
+        marked = 0
+        while True:
+            rows = session.execute(
+                select(Bill.id, Bill.merchant_id, Bill.user_id, Bill.status)
+                .where(Bill.status.in_(OVERDUE_FROM), Bill.due_date < now)
+                .order_by(Bill.id)
+                .limit(cls.SWEEP_CHUNK)
+                .with_for_update()
+            ).all()
+            if not rows:
+                return marked
+
+            session.execute(
+                update(Bill.__table__)
+                .where(Bill.__table__.c.id.in_([row.id for row in rows]))
+                .values(status='overdue', updated_at=now)
+            )
+            # Amounts do not change between these statuses, only the counts move
+            groups = Counter((row.merchant_id, row.user_id, row.status) for row in rows if row.user_id is not None)
+            for (merchant_id, user_id, status), count in groups.items():
+                cls._apply(session, merchant_id, user_id, {STATUS_COLUMNS[status]: -count, 'overdue_count': count})
+            session.commit()
+            marked += len(rows)
+
+    @staticmethod
+    def compute(session, merchant_id=None):
+        """
+        Compute ledger rows from the bills and payments.
+
+        Args:
+            session: SQLAlchemy session
+            merchant_id: Only this merchant's customers, or None for everyone
+
+        Returns:
+            dict: (merchant_id, user_id) -> {column: value} for COUNTER_COLUMNS
+        """
+        bills, payments = Bill.__table__, Payment.__table__
+        not_cancelled = bills.c.status != 'cancelled'
+        conditions = [bills.c.user_id.isnot(None)]
+        if merchant_id is not None:
+            conditions.append(bills.c.merchant_id == merchant_id)
+
+        totals = select(
+            bills.c.merchant_id,
+            bills.c.user_id,
+            func.count().label('bill_count'),
+            *[func.sum(case((bills.c.status == status, 1), else_=0)).label(column)
+              for status, column in STATUS_COLUMNS.items()],
+            func.sum(case((not_cancelled, bills.c.total_amount), else_=0)).label('billed_amount')
+        ).where(*conditions).group_by(bills.c.merchant_id, bills.c.user_id)
+
+        paid = select(
+            bills.c.merchant_id,
+            bills.c.user_id,
+            func.sum(payments.c.amount).label('paid_amount')
+        ).join(payments, payments.c.bill_id == bills.c.id).where(
+            *conditions, not_cancelled, payments.c.status == 'completed'
+        ).group_by(bills.c.merchant_id, bills.c.user_id)
+
+        expected = {}
+        for row in session.execute(totals):
+            values = {column: int(row._mapping[column] or 0) for column in ('bill_count',) + tuple(STATUS_COLUMNS.values())}
+            values['billed_amount'] = _money(row.billed_amount)
+            values['paid_amount'] = Decimal('0.00')
+            expected[(row.merchant_id, row.user_id)] = values
+
+        for row in session.execute(paid):
+            expected[(row.merchant_id, row.user_id)]['paid_amount'] = _money(row.paid_amount)
+
+        for values in expected.values():
+            values['balance'] = values['billed_amount'] - values['paid_amount']
+        return expected
+
+    @classmethod
+    def check(cls, session, merchant_id=None):
+        """
+        Compare the ledger with rows recomputed from the bills and payments.
+
+        Args:
+            session: SQLAlchemy session
+            merchant_id: Only check this merchant's customers, or None for everyone
+
+        Returns:
+            list: (merchant_id, user_id, {column: (ledger value, expected value)}) per differing row;
+                  rows missing from the ledger have None as the ledger value
+        """
+        expected = cls.compute(session, merchant_id)
+        table = CustomerLedger.__table__
+        query = select(table.c.merchant_id, table.c.user_id, *[table.c[column] for column in COUNTER_COLUMNS])
+        if merchant_id is not None:
+            query = query.where(table.c.merchant_id == merchant_id)
+
+        empty = {column: (Decimal('0.00') if column in AMOUNT_COLUMNS else 0) for column in COUNTER_COLUMNS}
+        mismatches = []
+        for row in session.execute(query):
+            key = (row.merchant_id, row.user_id)
+            wanted = expected.pop(key, empty)
+            differences = {}
+            for column in COUNTER_COLUMNS:
+                value = row._mapping[column]
+                value = _money(value) if column in AMOUNT_COLUMNS else int(value or 0)
+                if value != wanted[column]:
+                    differences[column] = (value, wanted[column])
+            if differences:
+                mismatches.append((*key, differences))
+
+        for (row_merchant_id, user_id), wanted in expected.items():
+            mismatches.append((row_merchant_id, user_id, {column: (None, value) for column, value in wanted.items()}))
+        return mismatches
+
+    @classmethod
+    def rebuild(cls, session, merchant_id=None):
+        """
+        Replace ledger rows with ones recomputed from the bills and payments.
+
+        Runs in the caller's transaction; the caller commits.
+
+        Returns:
+            int: Number of ledger rows written
+        """
+        expected = cls.compute(session, merchant_id)
+        table = CustomerLedger.__table__
+        statement = delete(table)
+        if merchant_id is not None:
+            statement = statement.where(table.c.merchant_id == merchant_id)
+        session.execute(statement)
+
+        now = datetime.utcnow()
+        rows = [
+            {'merchant_id': key[0], 'user_id': key[1], 'updated_at': now, **values}
+            for key, values in expected.items()
+        ]
+        for start in range(0, len(rows), cls.REBUILD_CHUNK):
+            session.execute(table.insert(), rows[start:start + cls.REBUILD_CHUNK])
+        return len(rows)
+
+    @classmethod
+    def ensure_backfilled(cls):
+        """Build the ledger if bills with users exist but it has never been filled."""
+        has_ledger = db.session.query(CustomerLedger.id).limit(1).first()
+        has_bills = db.session.query(Bill.id).filter(Bill.user_id.isnot(None)).limit(1).first()
+
+        if has_bills and not has_ledger:
+            cls.rebuild(db.session)
+            db.session.commit()
@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.extensions import db
+from src.serialization import serializer_for
 
-db = SQLAlchemy()
 
 class Merchant(db.Model):
     __tablename__ = 'merchants'
@@ -22,6 +22,10 @@ class Merchant(db.Model):
     logo_url = db.Column(db.String(255))
     website_url = db.Column(db.String(255))
     
+    __table_args__ = (
+        db.Index('idx_merchants_business_name', 'business_name'),
+    )
+    
     # Relationships
     authentication_methods = db.relationship('MerchantAuthentication', backref='merchant', lazy=True, cascade="all, delete-orphan")
     store_locations = db.relationship('StoreLocation', backref='merchant', lazy=True, cascade="all, delete-orphan")
@@ -31,24 +35,16 @@ class Merchant(db.Model):
     notifications = db.relationship('Notification', backref='merchant', lazy=True)
     sessions = db.relationship('Session', backref='merchant', lazy=True)
     
+    SERIALIZED_FIELDS = (
+        'id', 'business_name', 'gst_number', 'email', 'phone_number', 'contact_person',
+        'business_type', 'created_at', 'is_active', 'is_verified', 'logo_url', 'website_url',
+    )
+    
     def __repr__(self):
         return f'<Merchant {self.business_name}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'business_name': self.business_name,
-            'gst_number': self.gst_number,
-            'email': self.email,
-            'phone_number': self.phone_number,
-            'contact_person': self.contact_person,
-            'business_type': self.business_type,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'is_active': self.is_active,
-            'is_verified': self.is_verified,
-            'logo_url': self.logo_url,
-            'website_url': self.website_url
-        }
+        return serializer_for(Merchant).from_object(self)
 
 
 class MerchantAuthentication(db.Model):
@@ -62,6 +58,10 @@ class MerchantAuthentication(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('idx_merchant_authentication_merchant_id', 'merchant_id'),
+    )
+    
     def __repr__(self):
         return f'<MerchantAuthentication {self.auth_type} for merchant {self.merchant_id}>'
 
@@ -86,32 +86,27 @@ class StoreLocation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_store_locations_merchant_id', 'merchant_id'),
+    )
+    
     # Relationships
     operating_hours = db.relationship('StoreOperatingHours', backref='store', lazy=True, cascade="all, delete-orphan")
     inventory_items = db.relationship('MerchantInventory', backref='store', lazy=True)
     bills = db.relationship('Bill', backref='store', lazy=True)
     pickup_requests = db.relationship('PickupRequest', backref='store', lazy=True)
     
+    SERIALIZED_FIELDS = (
+        'id', 'merchant_id', 'store_name', 'address_line1', 'address_line2', 'city', 'state',
+        'postal_code', 'country', 'location', 'contact_number', 'opening_time', 'closing_time',
+        'is_active',
+    )
+    
     def __repr__(self):
         return f'<StoreLocation {self.store_name} for merchant {self.merchant_id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'merchant_id': self.merchant_id,
-            'store_name': self.store_name,
-            'address_line1': self.address_line1,
-            'address_line2': self.address_line2,
-            'city': self.city,
-            'state': self.state,
-            'postal_code': self.postal_code,
-            'country': self.country,
-            'location': self.location,
-            'contact_number': self.contact_number,
-            'opening_time': self.opening_time.isoformat() if self.opening_time else None,
-            'closing_time': self.closing_time.isoformat() if self.closing_time else None,
-            'is_active': self.is_active
-        }
+        return serializer_for(StoreLocation).from_object(self)
 
 
 class StoreOperatingHours(db.Model):
@@ -124,6 +119,10 @@ class StoreOperatingHours(db.Model):
     closing_time = db.Column(db.Time, nullable=False)
     is_closed = db.Column(db.Boolean, default=False)
     
+    __table_args__ = (
+        db.Index('idx_store_operating_hours_store_id', 'store_id'),
+    )
+    
     def __repr__(self):
         return f'<StoreOperatingHours for store {self.store_id} on day {self.day_of_week}>'
     
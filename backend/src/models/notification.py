@@ -1,7 +1,6 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+from src.extensions import db
 
-db = SQLAlchemy()
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -17,6 +16,12 @@ class Notification(db.Model):
     related_entity_id = db.Column(db.Integer)  # ID of the related entity
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_notifications_user_id', 'user_id'),
+        db.Index('idx_notifications_merchant_id', 'merchant_id'),
+        db.Index('idx_notifications_created_at', 'created_at'),
+    )
+    
     def __repr__(self):
         recipient = f"user {self.user_id}" if self.user_id else f"merchant {self.merchant_id}"
         return f'<Notification {self.id} for {recipient}>'
@@ -87,6 +92,11 @@ class TemporaryLink(db.Model):
     is_revoked = db.Column(db.Boolean, default=False)
     revoked_at = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('idx_temporary_links_expires_at', 'expires_at'),
+        db.Index('idx_temporary_links_related', 'related_entity_type', 'related_entity_id'),
+    )
+    
     # Relationships
     user = db.relationship('User', backref='temporary_links')
     
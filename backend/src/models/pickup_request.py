@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+from src.extensions import db
+from src.serialization import serializer_for
 
-db = SQLAlchemy()
 
 class PickupRequest(db.Model):
     __tablename__ = 'pickup_requests'
@@ -17,25 +17,26 @@ class PickupRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_pickup_requests_store_status_time', 'store_id', 'status', 'requested_pickup_time'),
+        db.Index('idx_pickup_requests_user_id', 'user_id'),
+        db.Index('idx_pickup_requests_merchant_id', 'merchant_id'),
+        db.Index('idx_pickup_requests_status', 'status'),
+    )
+    
     # Relationships
     items = db.relationship('PickupRequestItem', backref='pickup_request', lazy=True, cascade="all, delete-orphan")
     
+    SERIALIZED_FIELDS = (
+        'id', 'user_id', 'merchant_id', 'store_id', 'status', 'requested_pickup_time',
+        'actual_pickup_time', 'notes', 'created_at', 'updated_at',
+    )
+    
     def __repr__(self):
         return f'<PickupRequest {self.id} by user {self.user_id} from merchant {self.merchant_id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'merchant_id': self.merchant_id,
-            'store_id': self.store_id,
-            'status': self.status,
-            'requested_pickup_time': self.requested_pickup_time.isoformat() if self.requested_pickup_time else None,
-            'actual_pickup_time': self.actual_pickup_time.isoformat() if self.actual_pickup_time else None,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(PickupRequest).from_object(self)
 
 
 class PickupRequestItem(db.Model):
@@ -51,19 +52,32 @@ class PickupRequestItem(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_pickup_request_items_request_id', 'pickup_request_id'),
+    )
+    
+    SERIALIZED_FIELDS = (
+        'id', 'pickup_request_id', 'product_id', 'custom_item_name', 'quantity', 'status', 'notes',
+        'created_at', 'updated_at',
+    )
+    
     def __repr__(self):
         item_name = self.custom_item_name if self.custom_item_name else f"product_id: {self.product_id}"
         return f'<PickupRequestItem {item_name} for request {self.pickup_request_id}>'
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'pickup_request_id': self.pickup_request_id,
-            'product_id': self.product_id,
-            'custom_item_name': self.custom_item_name,
-            'quantity': self.quantity,
-            'status': self.status,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+        return serializer_for(PickupRequestItem).from_object(self)
+
+
+class PickupReservation(db.Model):
+    """Stock taken from inventory for a pickup request item, held until the request is cancelled."""
+    __tablename__ = 'pickup_reservations'
+    
+    pickup_request_item_id = db.Column(
+        db.Integer, db.ForeignKey('pickup_request_items.id', ondelete='CASCADE'), primary_key=True
+    )
+    quantity = db.Column(db.Integer, nullable=False)  # Units taken, returned as-is on release
+    reserved_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PickupReservation {self.quantity} for item {self.pickup_request_item_id}>'
@@ -0,0 +1,375 @@
+from sqlalchemy import and_, select
+from sqlalchemy.orm import load_only
+from datetime import datetime, timedelta
+import os
+
+from src.extensions import db
+from src.models.pickup_request import PickupRequest, PickupRequestItem, PickupReservation
+from src.models.product import MerchantInventory
+from src.models.notification import Notification
+from src.models.store_hours_service import StoreHoursService, SLOT_MINUTES
+from src.models.inventory_service import InventoryService
+
+ACTIVE_STATUSES = ('pending', 'accepted', 'ready')
+
+# Allowed status transitions for the merchant-side queue
+STATUS_TRANSITIONS = {
+    'pending': ('accepted', 'cancelled'),
+    'accepted': ('ready', 'cancelled'),
+    'ready': ('completed', 'cancelled'),
+    'completed': (),
+    'cancelled': (),
+}
+
+STATUS_MESSAGES = {
+    'accepted': 'Your pickup request has been accepted by the store.',
+    'ready': 'Your pickup order is ready for collection.',
+    'completed': 'Your pickup order has been collected. Thank you!',
+    'cancelled': 'Your pickup request has been cancelled.',
+}
+
+
+class PickupQueueError(Exception):
+    """A pickup request could not be scheduled or moved to the requested status."""
+
+
+class PickupQueueService:
+    """
+    Service for the merchant-side pickup queue.
+
+    The queue for a store is read straight off the
+    ``(store_id, status, requested_pickup_time)`` index. New requests are
+    snapped to the store's 15-minute open-hours slots and pushed to a later
+    slot when one already holds ``SLOT_CAPACITY`` active pickups.
+    """
+
+    SLOT_CAPACITY = int(os.environ.get('PICKUP_SLOT_CAPACITY', '4'))
+    SEARCH_DAYS = 7
+
+    @staticmethod
+    def queue(store_id, statuses=ACTIVE_STATUSES, limit=20, columns=None, merchant_id=None):
+        """
+        Get the next pickups to prepare for a store.
+
+        Args:
+            store_id: ID of the store
+            statuses: Statuses to include
+            limit: Maximum number of pickups
+            columns: Only load these PickupRequest attributes (the primary key is always loaded)
+            merchant_id: Only pickups made with this merchant (optional)
+
+        Returns:
+            list: PickupRequest objects, earliest pickup time first
+        """
+        query = PickupRequest.query.filter(
+            PickupRequest.store_id == store_id,
+            PickupRequest.status.in_(statuses)
+        )
+        if merchant_id is not None:
+            query = query.filter(PickupRequest.merchant_id == merchant_id)
+        if columns:
+            query = query.options(load_only(*columns))
+        return query.order_by(
+            PickupRequest.requested_pickup_time, PickupRequest.id
+        ).limit(limit).all()
+
+    @staticmethod
+    def _slot_start(when):
+        """Round a datetime up to the next slot boundary."""
+        floored = when.replace(minute=when.minute - when.minute % SLOT_MINUTES, second=0, microsecond=0)
+        return floored if floored == when else floored + timedelta(minutes=SLOT_MINUTES)
+
+    @staticmethod
+    def _booked(store_id, start, end):
+        """Count active pickups per slot start between two times, using only indexed columns."""
+        times = db.session.query(PickupRequest.requested_pickup_time).filter(
+            PickupRequest.store_id == store_id,
+            PickupRequest.status.in_(ACTIVE_STATUSES),
+            PickupRequest.requested_pickup_time >= start,
+            PickupRequest.requested_pickup_time < end
+        ).all()
+
+        booked = {}
+        for (requested_time,) in times:
+            slot = requested_time.replace(
+                minute=requested_time.minute - requested_time.minute % SLOT_MINUTES, second=0, microsecond=0
+            )
+            booked[slot] = booked.get(slot, 0) + 1
+        return booked
+
+    @classmethod
+    def available_slots(cls, store_id, start, end):
+        """
+        List open slots with their remaining capacity.
+
+        Args:
+            store_id: ID of the store
+            start: datetime to list from
+            end: datetime to list until
+
+        Returns:
+            list: Dicts with 'start' and 'remaining' for every open slot with room left
+        """
+        bitmap = StoreHoursService.get_bitmaps([store_id]).get(store_id, 0)
+        booked = cls._booked(store_id, start, end)
+
+        slots = []
+        slot = cls._slot_start(start)
+        while slot < end:
+            if bitmap >> StoreHoursService.slot_for(slot) & 1:
+                remaining = cls.SLOT_CAPACITY - booked.get(slot, 0)
+                if remaining > 0:
+                    slots.append({'start': slot, 'remaining': remaining})
+            slot += timedelta(minutes=SLOT_MINUTES)
+        return slots
+
+    @classmethod
+    def assign_slot(cls, store_id, requested_time):
+        """
+        Find the first open slot with capacity at or after a requested time.
+
+        Raises:
+            PickupQueueError: If nothing is free within SEARCH_DAYS
+        """
+        slots = cls.available_slots(store_id, requested_time, requested_time + timedelta(days=cls.SEARCH_DAYS))
+        if not slots:
+            raise PickupQueueError('No pickup slot available at this store in the next week')
+        return slots[0]['start']
+
+    @classmethod
+    def create_request(cls, user_id, merchant_id, store_id, requested_time, items, notes=None):
+        """
+        Create a pickup request in the first free slot at or after the requested time.
+
+        Capacity is checked rather than locked, so two simultaneous requests can
+        share the last place in a slot; the merchant queue absorbs that overflow.
+
+        Args:
+            user_id: ID of the user
+            merchant_id: ID of the merchant
+            store_id: ID of the store
+            requested_time: datetime the user asked for, or None for as soon as possible
+            items: Item dicts with 'product_id' or 'custom_item_name', and 'quantity'
+            notes: Optional notes
+
+        Returns:
+            PickupRequest: The new request, not yet committed
+        """
+        pickup_time = cls.assign_slot(store_id, requested_time or datetime.now())
+
+        pickup_request = PickupRequest(
+            user_id=user_id,
+            merchant_id=merchant_id,
+            store_id=store_id,
+            status='pending',
+            requested_pickup_time=pickup_time,
+            notes=notes
+        )
+        db.session.add(pickup_request)
+        db.session.flush()
+
+        db.session.add_all([
+            PickupRequestItem(
+                pickup_request_id=pickup_request.id,
+                product_id=item.get('product_id'),
+                custom_item_name=item.get('custom_item_name'),
+                quantity=item.get('quantity', 1),
+                notes=item.get('notes')
+            )
+            for item in items
+        ])
+
+        return pickup_request
+
+    @staticmethod
+    def transition(pickup_request, status):
+        """
+        Move a pickup request to a new status and notify the user.
+
+        Raises:
+            PickupQueueError: If the transition is not allowed
+        """
+        if status not in STATUS_TRANSITIONS.get(pickup_request.status, ()):
+            raise PickupQueueError(f'Cannot move a {pickup_request.status} pickup request to {status}')
+
+        pickup_request.status = status
+        if status == 'completed':
+            pickup_request.actual_pickup_time = datetime.utcnow()
+        elif status == 'cancelled':
+            PickupAvailabilityService.release(pickup_request)
+
+        notification = Notification(
+            user_id=pickup_request.user_id,
+            type='pickup',
+            title=f'Pickup request #{pickup_request.id} {status}',
+            message=STATUS_MESSAGES[status],
+            related_entity_type='pickup',
+            related_entity_id=pickup_request.id
+        )
+        db.session.add(notification)
+
+        return notification
+
+
+class PickupAvailabilityService:
+    """
+    Service for checking pickup request items against store inventory in bulk.
+
+    All items of any number of requests are resolved with one joined query
+    against ``MerchantInventory``. Stock is allocated to requests in pickup time
+    order, so two requests for the last unit do not both come back available.
+
+    Every check writes the outcome to the items with one UPDATE per status.
+    Reserving also takes the stock for available items and records it in
+    ``pickup_reservations``; reserved items are not checked again, and their
+    stock goes back when the request is cancelled.
+    """
+
+    MAX_REQUESTS = 100
+
+    @staticmethod
+    def _load(pickup_request_ids, lock=False):
+        query = db.session.query(
+            PickupRequestItem.id,
+            PickupRequestItem.pickup_request_id,
+            PickupRequestItem.product_id,
+            PickupRequestItem.quantity,
+            PickupRequestItem.status,
+            PickupRequest.merchant_id,
+            PickupRequest.store_id,
+            MerchantInventory.stock_quantity,
+            MerchantInventory.is_available
+        ).join(
+            PickupRequest, PickupRequest.id == PickupRequestItem.pickup_request_id
+        ).outerjoin(
+            MerchantInventory, and_(
+                MerchantInventory.merchant_id == PickupRequest.merchant_id,
+                MerchantInventory.store_id.is_not_distinct_from(PickupRequest.store_id),
+                MerchantInventory.product_id == PickupRequestItem.product_id
+            )
+        ).filter(
+            PickupRequestItem.pickup_request_id.in_(pickup_request_ids),
+            PickupRequestItem.product_id.isnot(None),
+            PickupRequest.status.in_(ACTIVE_STATUSES)
+        ).order_by(
+            PickupRequest.requested_pickup_time, PickupRequest.id, PickupRequestItem.id
+        )
+        if lock:
+            # A concurrent reservation of the same items waits here, then sees its reservations below
+            query = query.with_for_update(of=PickupRequestItem)
+        rows = query.all()
+
+        # Read after the lock is held, so it includes reservations committed while waiting
+        reserved = set(db.session.execute(
+            select(PickupReservation.pickup_request_item_id).where(
+                PickupReservation.pickup_request_item_id.in_([row.id for row in rows])
+            )
+        ).scalars()) if rows else set()
+        return rows, reserved
+
+    @classmethod
+    def evaluate(cls, pickup_request_ids, reserve=False):
+        """
+        Mark the catalogue items of the given requests available or unavailable.
+
+        Custom items without a product_id, and substituted items, are left for
+        the merchant to judge. Items whose stock is already reserved are
+        reported available without being checked again.
+
+        Args:
+            pickup_request_ids: IDs of the pickup requests
+            reserve: Also take the stock for available items
+
+        Returns:
+            dict: Mapping of pickup request ID to {'available': [...], 'unavailable': [...]} item IDs
+        """
+        rows, held = cls._load(pickup_request_ids, lock=reserve)
+
+        remaining = {}
+        allocated = []
+        unavailable = []
+        for row in rows:
+            if row.id in held or row.status == 'substituted':
+                continue
+            key = (row.merchant_id, row.store_id, row.product_id)
+            if key not in remaining:
+                remaining[key] = row.stock_quantity if row.is_available and row.stock_quantity else 0
+
+            if remaining[key] >= row.quantity:
+                remaining[key] -= row.quantity
+                allocated.append(row)
+            else:
+                unavailable.append(row)
+
+        if reserve and allocated:
+            groups = {}
+            for row in allocated:
+                quantities = groups.setdefault((row.merchant_id, row.store_id), {})
+                quantities[row.product_id] = quantities.get(row.product_id, 0) + row.quantity
+
+            reserved = set()
+            for (merchant_id, store_id), quantities in groups.items():
+                reserved |= {
+                    (merchant_id, store_id, product_id)
+                    for product_id in InventoryService.reserve(db.session, merchant_id, store_id, quantities)
+                }
+
+            # Stock that moved since the read is treated as unavailable
+            lost = [row for row in allocated if (row.merchant_id, row.store_id, row.product_id) not in reserved]
+            allocated = [row for row in allocated if (row.merchant_id, row.store_id, row.product_id) in reserved]
+            unavailable += lost
+
+            if allocated:
+                reserved_at = datetime.utcnow()
+                db.session.execute(PickupReservation.__table__.insert(), [
+                    {'pickup_request_item_id': row.id, 'quantity': row.quantity, 'reserved_at': reserved_at}
+                    for row in allocated
+                ])
+
+        now = datetime.utcnow()
+        for status, group in (('available', allocated), ('unavailable', unavailable)):
+            if group:
+                db.session.execute(
+                    PickupRequestItem.__table__.update().where(
+                        PickupRequestItem.__table__.c.id.in_([row.id for row in group])
+                    ).values(status=status, updated_at=now)
+                )
+
+        allocated += [row for row in rows if row.id in held]
+
+        result = {pickup_request_id: {'available': [], 'unavailable': []} for pickup_request_id in pickup_request_ids}
+        for status, group in (('available', allocated), ('unavailable', unavailable)):
+            for row in group:
+                result.setdefault(row.pickup_request_id, {'available': [], 'unavailable': []})[status].append(row.id)
+        return result
+
+    @staticmethod
+    def release(pickup_request):
+        """
+        Put back the stock reserved for a request's items and drop the reservations.
+
+        Args:
+            pickup_request: The PickupRequest being cancelled
+
+        Returns:
+            list: IDs of the items whose stock was released
+        """
+        rows = db.session.execute(
+            select(PickupReservation.pickup_request_item_id, PickupReservation.quantity, PickupRequestItem.product_id)
+            .join(PickupRequestItem, PickupRequestItem.id == PickupReservation.pickup_request_item_id)
+            .where(PickupRequestItem.pickup_request_id == pickup_request.id)
+            .with_for_update(of=PickupReservation)
+        ).all()
+        if not rows:
+            return []
+
+        quantities = {}
+        for row in rows:
+            quantities[row.product_id] = quantities.get(row.product_id, 0) + row.quantity
+        InventoryService.release(db.session, pickup_request.merchant_id, pickup_request.store_id, quantities)
+
+        item_ids = [row.pickup_request_item_id for row in rows]
+        db.session.execute(
+            PickupReservation.__table__.delete().where(PickupReservation.pickup_request_item_id.in_(item_ids))
+        )
+        return item_ids
@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect
 from datetime import datetime
+from src.extensions import db
 
-db = SQLAlchemy()
 
 class Product(db.Model):
     __tablename__ = 'products'
@@ -9,15 +9,19 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    category_id = db.Column(db.Integer, db.ForeignKey('product_categories.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('product_categories.id'), index=True)
     base_price = db.Column(db.Numeric(10, 2), nullable=False)
     tax_rate = db.Column(db.Numeric(5, 2), default=0)
-    sku = db.Column(db.String(50))
-    barcode = db.Column(db.String(50))
+    sku = db.Column(db.String(50), index=True)
+    barcode = db.Column(db.String(50), index=True)
     image_url = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_products_name', 'name'),
+    )
+    
     # Relationships
     category = db.relationship('ProductCategory', backref='products')
     inventory_items = db.relationship('MerchantInventory', backref='product', lazy=True)
@@ -71,6 +75,95 @@ class ProductCategory(db.Model):
         }
 
 
+class ProductCategoryClosure(db.Model):
+    __tablename__ = 'product_category_closure'
+    
+    # One row per (ancestor, descendant) pair, including each category with itself at depth 0
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('product_categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('product_categories.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_product_category_closure_descendant', 'descendant_id', 'depth'),
+    )
+    
+    def __repr__(self):
+        return f'<ProductCategoryClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>'
+
+
+def _attach_subtree(connection, subtree, parent_id):
+    """Link every (descendant, depth) in a subtree under parent_id and all of its ancestors."""
+    closure = ProductCategoryClosure.__table__
+    
+    if parent_id is None:
+        return
+    
+    ancestors = connection.execute(
+        db.select(closure.c.ancestor_id, closure.c.depth).where(closure.c.descendant_id == parent_id)
+    ).all()
+    
+    rows = [
+        {'ancestor_id': ancestor_id, 'descendant_id': descendant_id, 'depth': ancestor_depth + depth + 1}
+        for ancestor_id, ancestor_depth in ancestors
+        for descendant_id, depth in subtree
+    ]
+    if rows:
+        connection.execute(closure.insert(), rows)
+
+
+def _detach_subtree(connection, category_id):
+    """Remove the paths from a category's ancestors into its subtree; returns the subtree."""
+    closure = ProductCategoryClosure.__table__
+    
+    subtree = connection.execute(
+        db.select(closure.c.descendant_id, closure.c.depth).where(closure.c.ancestor_id == category_id)
+    ).all()
+    ancestor_ids = connection.execute(
+        db.select(closure.c.ancestor_id).where(
+            closure.c.descendant_id == category_id,
+            closure.c.ancestor_id != category_id
+        )
+    ).scalars().all()
+    
+    # Ids are fetched first because MySQL cannot delete from a table it sub-selects
+    if ancestor_ids and subtree:
+        connection.execute(closure.delete().where(
+            closure.c.ancestor_id.in_(ancestor_ids),
+            closure.c.descendant_id.in_([descendant_id for descendant_id, _ in subtree])
+        ))
+    
+    return subtree
+
+
+@event.listens_for(ProductCategory, 'after_insert')
+def _closure_after_insert(mapper, connection, target):
+    closure = ProductCategoryClosure.__table__
+    connection.execute(closure.insert(), [{'ancestor_id': target.id, 'descendant_id': target.id, 'depth': 0}])
+    _attach_subtree(connection, [(target.id, 0)], target.parent_category_id)
+
+
+@event.listens_for(ProductCategory, 'after_update')
+def _closure_after_update(mapper, connection, target):
+    if not inspect(target).attrs.parent_category_id.history.has_changes():
+        return
+    
+    subtree = _detach_subtree(connection, target.id)
+    if target.parent_category_id in {descendant_id for descendant_id, _ in subtree}:
+        raise ValueError(f'Cannot move category {target.id} under its own subcategory {target.parent_category_id}')
+    
+    _attach_subtree(connection, subtree, target.parent_category_id)
+
+
+@event.listens_for(ProductCategory, 'after_delete')
+def _closure_after_delete(mapper, connection, target):
+    # Remaining subcategories become roots of their own subtrees
+    _detach_subtree(connection, target.id)
+    closure = ProductCategoryClosure.__table__
+    connection.execute(closure.delete().where(
+        db.or_(closure.c.ancestor_id == target.id, closure.c.descendant_id == target.id)
+    ))
+
+
 class MerchantInventory(db.Model):
     __tablename__ = 'merchant_inventory'
     
@@ -87,6 +180,9 @@ class MerchantInventory(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('merchant_id', 'store_id', 'product_id', name='uix_merchant_store_product'),
+        db.Index('idx_merchant_inventory_merchant_updated', 'merchant_id', 'updated_at'),
+        db.Index('idx_merchant_inventory_product_id', 'product_id'),
+        db.Index('idx_merchant_inventory_store_id', 'store_id'),
     )
     
     def __repr__(self):
@@ -0,0 +1,12 @@
+from src.extensions import db
+
+
+class ReplicationHeartbeat(db.Model):
+    """Single-row heartbeat written on the primary and read back from replicas to measure lag."""
+    __tablename__ = 'replication_heartbeat'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<ReplicationHeartbeat {self.beat_at}>'
@@ -0,0 +1,190 @@
+from sqlalchemy import or_
+import os
+import threading
+import time
+
+from src.extensions import db
+from src.models.product import Product, MerchantInventory
+from src.metrics import record_cache
+
+
+class MerchantScanTable:
+    """In-memory scan lookup for one merchant: code -> product, (product, store) -> price/stock."""
+
+    __slots__ = ('codes', 'products', 'stock', 'watermark', 'loaded_at', 'refreshed_at', 'lock')
+
+    def __init__(self):
+        self.codes = {}     # barcode or SKU -> product_id
+        self.products = {}  # product_id -> (name, tax_rate, barcode, sku)
+        self.stock = {}     # (product_id, store_id) -> (price, stock_quantity, is_available)
+        self.watermark = None
+        self.loaded_at = 0.0
+        self.refreshed_at = 0.0
+        self.lock = threading.Lock()
+
+    def apply(self, rows):
+        """Merge (inventory, product) column rows into the table, advancing the watermark."""
+        for row in rows:
+            previous = self.products.get(row.product_id)
+            if previous:
+                # Drop codes the product no longer carries
+                for code in previous[2:]:
+                    if code and self.codes.get(code) == row.product_id:
+                        del self.codes[code]
+
+            self.products[row.product_id] = (row.name, row.tax_rate, row.barcode, row.sku)
+            if row.barcode:
+                self.codes[row.barcode] = row.product_id
+            if row.sku:
+                self.codes.setdefault(row.sku, row.product_id)
+
+            self.stock[(row.product_id, row.store_id)] = (row.price, row.stock_quantity, row.is_available)
+
+            for updated_at in (row.inventory_updated_at, row.product_updated_at):
+                if updated_at and (self.watermark is None or updated_at > self.watermark):
+                    self.watermark = updated_at
+
+    def lookup(self, code, store_id):
+        """
+        Resolve a scanned code for a store.
+
+        Store-specific inventory wins over the merchant-wide row (store_id NULL).
+
+        Returns:
+            dict: Lookup result, with 'found' False when the code is unknown
+        """
+        product_id = self.codes.get(code)
+        product = self.products.get(product_id)
+        if product is None:
+            return {'code': code, 'found': False}
+
+        name, tax_rate, _, _ = product
+        entry = self.stock.get((product_id, store_id)) or self.stock.get((product_id, None))
+        price, stock_quantity, is_available = entry if entry else (None, 0, False)
+
+        return {
+            'code': code,
+            'found': True,
+            'product_id': product_id,
+            'product_name': name,
+            'tax_rate': float(tax_rate) if tax_rate is not None else 0.0,
+            'price': float(price) if price is not None else None,
+            'stock_quantity': stock_quantity,
+            'is_available': bool(is_available) and stock_quantity > 0
+        }
+
+
+class ScanService:
+    """
+    Service for POS barcode/SKU scanning backed by per-merchant hash tables.
+
+    A merchant's table is built on its first scan from one joined query over
+    ``MerchantInventory`` and ``Product``. After that, lookups are dict hits and
+    the table is topped up from rows whose ``updated_at`` moved past the last
+    seen value, at most once every ``REFRESH_SECONDS``. A full reload every
+    ``MAX_AGE_SECONDS`` picks up deleted inventory rows.
+    """
+
+    REFRESH_SECONDS = float(os.environ.get('SCAN_REFRESH_SECONDS', '5'))
+    MAX_AGE_SECONDS = float(os.environ.get('SCAN_MAX_AGE_SECONDS', '3600'))
+    MAX_BATCH = 500
+
+    _tables = {}  # merchant_id -> MerchantScanTable
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _rows_query(merchant_id):
+        return db.session.query(
+            MerchantInventory.product_id,
+            MerchantInventory.store_id,
+            MerchantInventory.price,
+            MerchantInventory.stock_quantity,
+            MerchantInventory.is_available,
+            MerchantInventory.updated_at.label('inventory_updated_at'),
+            Product.name,
+            Product.tax_rate,
+            Product.barcode,
+            Product.sku,
+            Product.updated_at.label('product_updated_at')
+        ).join(
+            Product, Product.id == MerchantInventory.product_id
+        ).filter(
+            MerchantInventory.merchant_id == merchant_id
+        )
+
+    @classmethod
+    def get_table(cls, merchant_id):
+        """
+        Get the scan table for a merchant, loading or refreshing it if needed.
+
+        Args:
+            merchant_id: ID of the merchant
+
+        Returns:
+            MerchantScanTable: The merchant's lookup table
+        """
+        with cls._lock:
+            table = cls._tables.get(merchant_id)
+            if table is None:
+                table = cls._tables[merchant_id] = MerchantScanTable()
+
+        now = time.monotonic()
+        if now - table.refreshed_at < cls.REFRESH_SECONDS:
+            record_cache('scan_table', 'hit')
+            return table
+
+        with table.lock:
+            # Another thread may have refreshed while we waited
+            if now - table.refreshed_at < cls.REFRESH_SECONDS:
+                record_cache('scan_table', 'hit')
+                return table
+
+            if table.watermark is None or now - table.loaded_at >= cls.MAX_AGE_SECONDS:
+                record_cache('scan_table', 'miss')
+                fresh = MerchantScanTable()
+                fresh.apply(cls._rows_query(merchant_id).all())
+                table.codes, table.products, table.stock = fresh.codes, fresh.products, fresh.stock
+                table.watermark = fresh.watermark
+                table.loaded_at = now
+            else:
+                record_cache('scan_table', 'refresh')
+                # Rows stamped with the watermark itself are re-read so same-tick writes are not missed
+                rows = cls._rows_query(merchant_id).filter(or_(
+                    MerchantInventory.updated_at >= table.watermark,
+                    Product.updated_at >= table.watermark
+                )).all()
+                table.apply(rows)
+
+            table.refreshed_at = now
+
+        return table
+
+    @classmethod
+    def scan(cls, merchant_id, store_id, codes):
+        """
+        Look up a batch of scanned barcodes or SKUs.
+
+        Args:
+            merchant_id: ID of the merchant
+            store_id: ID of the store the scan happens in
+            codes: List of scanned codes
+
+        Returns:
+            list: One lookup result per code, in the order given
+        """
+        table = cls.get_table(merchant_id)
+        return [table.lookup(str(code).strip(), store_id) for code in codes]
+
+    @classmethod
+    def invalidate(cls, merchant_id=None):
+        """
+        Drop cached scan tables so they are reloaded on next use.
+
+        Args:
+            merchant_id: ID of the merchant, or None to clear everything
+        """
+        with cls._lock:
+            if merchant_id is None:
+                cls._tables.clear()
+            else:
+                cls._tables.pop(merchant_id, None)
@@ -0,0 +1,225 @@
+from sqlalchemy import text
+import re
+
+from src.extensions import db
+
+# Searchable tables: FTS index columns plus the columns returned with each hit
+SEARCH_INDEXES = {
+    'products': {
+        'table': 'products',
+        'columns': ('name', 'sku', 'barcode'),
+        'result_columns': ('id', 'name', 'sku', 'barcode', 'base_price', 'image_url'),
+        'label_column': 'name',
+        'filter': None,
+    },
+    'merchants': {
+        'table': 'merchants',
+        'columns': ('business_name',),
+        'result_columns': ('id', 'business_name', 'business_type', 'logo_url'),
+        'label_column': 'business_name',
+        'filter': 'is_active = 1',
+    },
+}
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchService:
+    """
+    Service for ranked full-text and prefix search over products and merchants.
+
+    SQLite uses an external-content FTS5 table per entity, kept current by
+    insert/update/delete triggers on the base table. MySQL uses a FULLTEXT index
+    queried in boolean mode. Any other dialect falls back to a prefix LIKE.
+    """
+
+    MAX_LIMIT = 100
+
+    @staticmethod
+    def _dialect():
+        return db.engine.dialect.name
+
+    @staticmethod
+    def _tokens(query):
+        """Split user input into search tokens, dropping FTS operators and punctuation."""
+        return TOKEN_PATTERN.findall(query or '')[:10]
+
+    @classmethod
+    def ensure_indexes(cls):
+        """
+        Create the search indexes and their sync triggers if they are missing.
+
+        Safe to call on every start-up; a newly created SQLite index is populated
+        from the existing rows in one pass.
+        """
+        dialect = cls._dialect()
+
+        for spec in SEARCH_INDEXES.values():
+            if dialect == 'sqlite':
+                cls._ensure_sqlite_index(spec)
+            elif dialect == 'mysql':
+                cls._ensure_mysql_index(spec)
+
+        db.session.commit()
+
+    @staticmethod
+    def _ensure_sqlite_index(spec):
+        fts_table = f"{spec['table']}_fts"
+        columns = ', '.join(spec['columns'])
+        new_values = ', '.join(f'new.{column}' for column in spec['columns'])
+        old_values = ', '.join(f'old.{column}' for column in spec['columns'])
+
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': fts_table}
+        ).first()
+
+        if not exists:
+            # Prefix indexes on 2 and 3 characters keep autocomplete cheap
+            db.session.execute(text(
+                f"CREATE VIRTUAL TABLE {fts_table} USING fts5("
+                f"{columns}, content='{spec['table']}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            db.session.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+
+        db.session.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {spec['table']} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+        db.session.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {spec['table']} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+        ))
+        db.session.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {columns} ON {spec['table']} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+        ))
+
+    @staticmethod
+    def _ensure_mysql_index(spec):
+        index_name = f"ft_{spec['table']}_search"
+
+        exists = db.session.execute(
+            text(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index"
+            ),
+            {'table': spec['table'], 'index': index_name}
+        ).first()
+
+        # InnoDB maintains FULLTEXT indexes itself, so no triggers are needed
+        if not exists:
+            db.session.execute(text(
+                f"ALTER TABLE {spec['table']} ADD FULLTEXT INDEX {index_name} ({', '.join(spec['columns'])})"
+            ))
+
+    @classmethod
+    def rebuild_indexes(cls):
+        """Rebuild the SQLite FTS tables from their base tables, e.g. after a bulk load with triggers off."""
+        if cls._dialect() != 'sqlite':
+            return
+
+        for spec in SEARCH_INDEXES.values():
+            fts_table = f"{spec['table']}_fts"
+            db.session.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+        db.session.commit()
+
+    @classmethod
+    def search(cls, index, query, limit=20, prefix=True):
+        """
+        Run a ranked search.
+
+        Args:
+            index: Name of the index ('products' or 'merchants')
+            query: Free-text query from the user
+            limit: Maximum number of results
+            prefix: Whether the last token should match as a prefix
+
+        Returns:
+            list: Result rows as dicts, best match first
+        """
+        spec = SEARCH_INDEXES[index]
+        tokens = cls._tokens(query)
+        if not tokens:
+            return []
+
+        limit = max(1, min(int(limit), cls.MAX_LIMIT))
+        dialect = cls._dialect()
+
+        if dialect == 'sqlite':
+            statement, params = cls._sqlite_query(spec, tokens, limit, prefix)
+        elif dialect == 'mysql':
+            statement, params = cls._mysql_query(spec, tokens, limit, prefix)
+        else:
+            statement, params = cls._fallback_query(spec, tokens, limit)
+
+        rows = db.session.execute(text(statement), params).mappings().all()
+        return [dict(row) for row in rows]
+
+    @classmethod
+    def autocomplete(cls, index, query, limit=10):
+        """
+        Get labels for an autocomplete dropdown.
+
+        Args:
+            index: Name of the index ('products' or 'merchants')
+            query: Text typed so far
+            limit: Maximum number of suggestions
+
+        Returns:
+            list: Dicts with 'id' and 'label', best match first
+        """
+        label_column = SEARCH_INDEXES[index]['label_column']
+        return [
+            {'id': row['id'], 'label': row[label_column]}
+            for row in cls.search(index, query, limit=limit, prefix=True)
+        ]
+
+    @staticmethod
+    def _sqlite_query(spec, tokens, limit, prefix):
+        fts_table = f"{spec['table']}_fts"
+        terms = [f'"{token}"' for token in tokens]
+        if prefix:
+            terms[-1] += '*'
+
+        columns = ', '.join(f't.{column}' for column in spec['result_columns'])
+        where = f" AND t.{spec['filter']}" if spec['filter'] else ''
+
+        statement = (
+            f"SELECT {columns} FROM {fts_table} "
+            f"JOIN {spec['table']} t ON t.id = {fts_table}.rowid "
+            f"WHERE {fts_table} MATCH :match{where} "
+            f"ORDER BY {fts_table}.rank LIMIT :limit"
+        )
+        return statement, {'match': ' '.join(terms), 'limit': limit}
+
+    @staticmethod
+    def _mysql_query(spec, tokens, limit, prefix):
+        terms = [f'+{token}' for token in tokens]
+        if prefix:
+            terms[-1] += '*'
+
+        match = f"MATCH ({', '.join(spec['columns'])}) AGAINST (:match IN BOOLEAN MODE)"
+        columns = ', '.join(spec['result_columns'])
+        where = f" AND {spec['filter']}" if spec['filter'] else ''
+
+        statement = (
+            f"SELECT {columns}, {match} AS score FROM {spec['table']} "
+            f"WHERE {match}{where} ORDER BY score DESC LIMIT :limit"
+        )
+        return statement, {'match': ' '.join(terms), 'limit': limit}
+
+    @staticmethod
+    def _fallback_query(spec, tokens, limit):
+        # Prefix LIKE can still use a plain index on the label column
+        label_column = spec['label_column']
+        columns = ', '.join(spec['result_columns'])
+        where = f" AND {spec['filter']}" if spec['filter'] else ''
+
+        statement = (
+            f"SELECT {columns} FROM {spec['table']} "
+            f"WHERE {label_column} LIKE :match{where} ORDER BY {label_column} LIMIT :limit"
+        )
+        return statement, {'match': ' '.join(tokens) + '%', 'limit': limit}
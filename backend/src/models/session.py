@@ -0,0 +1,60 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class Session(db.Model):
+    __tablename__ = 'sessions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'))
+    merchant_id = db.Column(db.Integer, db.ForeignKey('merchants.id', ondelete='CASCADE'))
+    session_token = db.Column(db.String(255), unique=True, nullable=False)
+    refresh_token = db.Column(db.String(255), unique=True)
+    ip_address = db.Column(db.String(45))
+    user_agent = db.Column(db.Text)
+    device_info = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    last_activity = db.Column(db.DateTime)
+    is_active = db.Column(db.Boolean, default=True)
+    
+    __table_args__ = (
+        db.Index('idx_sessions_user_id', 'user_id'),
+        db.Index('idx_sessions_merchant_id', 'merchant_id'),
+    )
+    
+    def __repr__(self):
+        return f'<Session {self.id} for {"user " + str(self.user_id) if self.user_id else "merchant " + str(self.merchant_id)}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'merchant_id': self.merchant_id,
+            'ip_address': self.ip_address,
+            'user_agent': self.user_agent,
+            'device_info': self.device_info,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'last_activity': self.last_activity.isoformat() if self.last_activity else None,
+            'is_active': self.is_active
+        }
+
+
+class TokenRevocation(db.Model):
+    """A session whose access tokens are no longer accepted, kept until they have all expired."""
+    __tablename__ = 'token_revocations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_token = db.Column(db.String(255), nullable=False)  # The revoked session's sid claim
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)  # When its last access token expires
+    
+    __table_args__ = (
+        db.Index('idx_token_revocations_session_token', 'session_token'),
+        db.Index('idx_token_revocations_revoked_at', 'revoked_at'),
+        db.Index('idx_token_revocations_expires_at', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f'<TokenRevocation {self.session_token}>'
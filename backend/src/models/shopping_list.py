@@ -1,7 +1,7 @@
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
+from src.extensions import db
 
-db = SQLAlchemy()
 
 class ShoppingList(db.Model):
     __tablename__ = 'shopping_lists'
@@ -14,6 +14,10 @@ class ShoppingList(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_shopping_lists_user_updated', 'user_id', 'updated_at', 'id'),
+    )
+    
     # Relationships
     items = db.relationship('ShoppingListItem', backref='shopping_list', lazy=True, cascade="all, delete-orphan")
     shared_with = db.relationship('ListSharing', 
@@ -50,6 +54,10 @@ class ShoppingListItem(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_shopping_list_items_list_updated', 'list_id', 'updated_at', 'id'),
+    )
+    
     def __repr__(self):
         item_name = self.custom_item_name if self.custom_item_name else f"product_id: {self.product_id}"
         return f'<ShoppingListItem {item_name} for list {self.list_id}>'
@@ -79,9 +87,12 @@ class ListSharing(db.Model):
     access_level = db.Column(db.String(20), default='view')  # 'view', 'edit'
     status = db.Column(db.String(20), default='pending')  # 'pending', 'accepted', 'declined'
     last_accessed = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     __table_args__ = (
         db.UniqueConstraint('list_id', 'shared_with', name='uix_list_shared_with'),
+        db.Index('idx_list_sharing_list_updated', 'list_id', 'updated_at', 'id'),
+        db.Index('idx_list_sharing_shared_with_updated', 'shared_with', 'updated_at', 'id'),
     )
     
     # Relationships
@@ -100,5 +111,62 @@ class ListSharing(db.Model):
             'shared_at': self.shared_at.isoformat() if self.shared_at else None,
             'access_level': self.access_level,
             'status': self.status,
-            'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None
+            'last_accessed': self.last_accessed.isoformat() if self.last_accessed else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # 'list', 'item', 'share'
+    entity_id = db.Column(db.Integer, nullable=False)
+    list_id = db.Column(db.Integer)  # Members of this list see the deletion
+    user_id = db.Column(db.Integer)  # Set when the deletion is addressed to one user (e.g. lost access)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_sync_tombstones_list', 'list_id', 'id'),
+        db.Index('idx_sync_tombstones_user', 'user_id', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<SyncTombstone {self.entity_type} {self.entity_id}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'list_id': self.list_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+
+def _write_tombstones(connection, rows):
+    now = datetime.utcnow()
+    connection.execute(SyncTombstone.__table__.insert(), [{**row, 'deleted_at': now} for row in rows])
+
+
+@event.listens_for(ShoppingList, 'after_delete')
+def _tombstone_list(mapper, connection, target):
+    _write_tombstones(connection, [
+        {'entity_type': 'list', 'entity_id': target.id, 'list_id': target.id, 'user_id': target.user_id}
+    ])
+
+
+@event.listens_for(ShoppingListItem, 'after_delete')
+def _tombstone_item(mapper, connection, target):
+    _write_tombstones(connection, [
+        {'entity_type': 'item', 'entity_id': target.id, 'list_id': target.list_id, 'user_id': None}
+    ])
+
+
+@event.listens_for(ListSharing, 'after_delete')
+def _tombstone_share(mapper, connection, target):
+    # The other members see the share go; the former recipient sees the whole list go
+    _write_tombstones(connection, [
+        {'entity_type': 'share', 'entity_id': target.id, 'list_id': target.list_id, 'user_id': None},
+        {'entity_type': 'list', 'entity_id': target.list_id, 'list_id': None, 'user_id': target.shared_with}
+    ])
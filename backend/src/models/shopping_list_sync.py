@@ -0,0 +1,374 @@
+from sqlalchemy import Boolean, Integer, String, Text, and_, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import base64
+import json
+import os
+
+from src.extensions import db
+from src.models.shopping_list import ShoppingList, ShoppingListItem, ListSharing, SyncTombstone
+
+# Fields a client may set through a sync mutation, per entity type
+MUTABLE_FIELDS = {
+    'list': ('name', 'description', 'is_active'),
+    'item': ('product_id', 'custom_item_name', 'quantity', 'is_purchased', 'notes'),
+    'share': ('access_level', 'status'),
+}
+# Allowed values for fields that hold one of a fixed set
+FIELD_CHOICES = {
+    ('share', 'access_level'): ('view', 'edit'),
+    ('share', 'status'): ('pending', 'accepted', 'declined'),
+}
+BOOLEAN_STRINGS = {'true': True, '1': True, 'false': False, '0': False}
+ENTITY_MODELS = {
+    'list': ShoppingList,
+    'item': ShoppingListItem,
+    'share': ListSharing,
+}
+
+
+class SyncError(Exception):
+    """A single sync mutation could not be applied."""
+
+
+class ShoppingListSyncService:
+    """
+    Service for delta sync of shopping lists, their items and share records.
+
+    Clients hold an opaque cursor with one (updated_at, id) position per entity
+    type plus the last tombstone id they have seen. Each sync returns only rows
+    that moved past those positions, so the cost follows the number of changes
+    rather than the size of the lists. Rows written in the last
+    ``SETTLE_SECONDS`` are held back until the next sync so a transaction that
+    commits late with an older timestamp cannot slip behind a cursor.
+    """
+
+    SETTLE_SECONDS = float(os.environ.get('SYNC_SETTLE_SECONDS', '2'))
+    PAGE_SIZE = 500
+    MAX_MUTATIONS = 200
+
+    @staticmethod
+    def encode_cursor(cursor):
+        raw = json.dumps(cursor, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(token):
+        """
+        Decode a client cursor; an empty token means "from the beginning".
+
+        Raises:
+            ValueError: If the token is malformed
+        """
+        if not token:
+            return {}
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            cursor = json.loads(raw)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid sync cursor')
+        if not isinstance(cursor, dict):
+            raise ValueError('Invalid sync cursor')
+
+        for key in ('l', 'i', 's', 'r'):
+            position = cursor.get(key)
+            if position is None:
+                continue
+            if not (isinstance(position, list) and len(position) == 2 and isinstance(position[1], int)):
+                raise ValueError('Invalid sync cursor')
+            try:
+                datetime.fromisoformat(position[0])
+            except (ValueError, TypeError):
+                raise ValueError('Invalid sync cursor')
+        if not isinstance(cursor.get('t', 0), int):
+            raise ValueError('Invalid sync cursor')
+
+        return cursor
+
+    @staticmethod
+    def _after(model, position):
+        """Filter rows strictly after an (updated_at, id) position."""
+        if not position:
+            return True
+        updated_at, row_id = datetime.fromisoformat(position[0]), position[1]
+        return or_(
+            model.updated_at > updated_at,
+            and_(model.updated_at == updated_at, model.id > row_id)
+        )
+
+    @staticmethod
+    def _position(row):
+        return [row.updated_at.isoformat(), row.id]
+
+    @staticmethod
+    def visible_list_ids(user_id):
+        """Get the IDs of lists a user owns or has a live share for."""
+        owned = db.session.query(ShoppingList.id).filter(ShoppingList.user_id == user_id)
+        shared = db.session.query(ListSharing.list_id).filter(
+            ListSharing.shared_with == user_id,
+            ListSharing.status != 'declined'
+        )
+        return {row[0] for row in owned.union(shared)}
+
+    @classmethod
+    def _page(cls, model, filters, position, horizon):
+        rows = model.query.filter(
+            *filters,
+            cls._after(model, position),
+            model.updated_at < horizon
+        ).order_by(model.updated_at, model.id).limit(cls.PAGE_SIZE + 1).all()
+        return rows[:cls.PAGE_SIZE], len(rows) > cls.PAGE_SIZE
+
+    @classmethod
+    def changes_since(cls, user_id, cursor):
+        """
+        Collect everything that changed for a user since a cursor.
+
+        Args:
+            user_id: ID of the syncing user
+            cursor: Decoded cursor dict
+
+        Returns:
+            dict: Changed lists, items, shares and tombstones, the next cursor and has_more
+        """
+        horizon = datetime.utcnow() - timedelta(seconds=cls.SETTLE_SECONDS)
+        visible = cls.visible_list_ids(user_id)
+        next_cursor = dict(cursor)
+        has_more = False
+
+        # Shares addressed to this user decide which lists newly appear or disappear
+        received, more = cls._page(ListSharing, [ListSharing.shared_with == user_id], cursor.get('r'), horizon)
+        has_more |= more
+        if received:
+            next_cursor['r'] = cls._position(received[-1])
+        newly_visible = {share.list_id for share in received if share.status != 'declined'} & visible
+        lost = [
+            {'entity_type': 'list', 'entity_id': share.list_id, 'list_id': share.list_id, 'deleted_at': None}
+            for share in received if share.status == 'declined'
+        ]
+
+        lists, items, shares = [], [], []
+        if visible:
+            lists, more = cls._page(ShoppingList, [ShoppingList.id.in_(visible)], cursor.get('l'), horizon)
+            has_more |= more
+            if lists:
+                next_cursor['l'] = cls._position(lists[-1])
+
+            items, more = cls._page(ShoppingListItem, [ShoppingListItem.list_id.in_(visible)], cursor.get('i'), horizon)
+            has_more |= more
+            if items:
+                next_cursor['i'] = cls._position(items[-1])
+
+            shares, more = cls._page(ListSharing, [ListSharing.list_id.in_(visible)], cursor.get('s'), horizon)
+            has_more |= more
+            if shares:
+                next_cursor['s'] = cls._position(shares[-1])
+
+        # A list that was just shared with the user is sent whole, whatever its timestamps
+        if newly_visible:
+            seen_lists = {shopping_list.id for shopping_list in lists}
+            lists += ShoppingList.query.filter(
+                ShoppingList.id.in_(newly_visible - seen_lists)
+            ).all()
+            seen_items = {item.id for item in items}
+            items += [
+                item for item in ShoppingListItem.query.filter(ShoppingListItem.list_id.in_(newly_visible))
+                if item.id not in seen_items
+            ]
+
+        audience = [SyncTombstone.user_id == user_id]
+        if visible:
+            audience.append(SyncTombstone.list_id.in_(visible))
+        tombstones = SyncTombstone.query.filter(
+            SyncTombstone.id > cursor.get('t', 0),
+            SyncTombstone.deleted_at < horizon,
+            or_(*audience)
+        ).order_by(SyncTombstone.id).limit(cls.PAGE_SIZE + 1).all()
+        has_more |= len(tombstones) > cls.PAGE_SIZE
+        tombstones = tombstones[:cls.PAGE_SIZE]
+        if tombstones:
+            next_cursor['t'] = tombstones[-1].id
+
+        return {
+            'lists': [shopping_list.to_dict() for shopping_list in lists],
+            'items': [item.to_dict() for item in items],
+            'shares': [share.to_dict() for share in shares],
+            'deleted': [tombstone.to_dict() for tombstone in tombstones] + lost,
+            'cursor': cls.encode_cursor(next_cursor),
+            'has_more': has_more
+        }
+
+    @staticmethod
+    def _can_edit(user_id, shopping_list):
+        if shopping_list.user_id == user_id:
+            return True
+        return db.session.query(ListSharing.id).filter(
+            ListSharing.list_id == shopping_list.id,
+            ListSharing.shared_with == user_id,
+            ListSharing.status == 'accepted',
+            ListSharing.access_level == 'edit'
+        ).first() is not None
+
+    @staticmethod
+    def _field_value(entity_type, field, value):
+        """
+        Check a client value against its column, converting where it is unambiguous.
+
+        Raises:
+            SyncError: If the value does not fit the column
+        """
+        column = ENTITY_MODELS[entity_type].__table__.c[field]
+        if value is None:
+            if not column.nullable:
+                raise SyncError(f'{field} must not be null')
+            return None
+
+        if isinstance(column.type, Boolean):
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, int) and value in (0, 1):
+                return bool(value)
+            if isinstance(value, str) and value.strip().lower() in BOOLEAN_STRINGS:
+                return BOOLEAN_STRINGS[value.strip().lower()]
+            raise SyncError(f'{field} must be true or false')
+
+        if isinstance(column.type, Integer):
+            if isinstance(value, int) and not isinstance(value, bool):
+                number = value
+            elif isinstance(value, str) and value.strip().isdigit():
+                number = int(value)
+            else:
+                raise SyncError(f'{field} must be an integer')
+            if field == 'quantity' and number < 1:
+                raise SyncError('quantity must be at least 1')
+            return number
+
+        if isinstance(column.type, (String, Text)):
+            if not isinstance(value, str):
+                raise SyncError(f'{field} must be a string')
+            if getattr(column.type, 'length', None) and len(value) > column.type.length:
+                raise SyncError(f'{field} must be at most {column.type.length} characters')
+            choices = FIELD_CHOICES.get((entity_type, field))
+            if choices and value not in choices:
+                raise SyncError(f"{field} must be one of: {', '.join(choices)}")
+            return value
+
+        return value
+
+    @classmethod
+    def _resolve_list(cls, user_id, mutation, client_ids, require_owner=False):
+        list_id = mutation.get('list_id') or client_ids.get(('list', mutation.get('list_client_id')))
+        shopping_list = ShoppingList.query.get(list_id) if list_id else None
+        if not shopping_list:
+            raise SyncError('List not found')
+        if require_owner and shopping_list.user_id != user_id:
+            raise SyncError('Only the list owner can do this')
+        if not require_owner and not cls._can_edit(user_id, shopping_list):
+            raise SyncError('No edit access to this list')
+        return shopping_list
+
+    @classmethod
+    def _apply(cls, user_id, mutation, client_ids):
+        entity_type = mutation.get('type')
+        op = mutation.get('op')
+        data = mutation.get('data') or {}
+        if entity_type not in ENTITY_MODELS or op not in ('upsert', 'delete'):
+            raise SyncError('Mutation needs type list/item/share and op upsert/delete')
+        if not isinstance(data, dict):
+            raise SyncError('data must be an object')
+
+        model = ENTITY_MODELS[entity_type]
+        row = model.query.get(mutation['id']) if mutation.get('id') else None
+        if mutation.get('id') and not row:
+            if op == 'delete':
+                return {'status': 'deleted'}  # Already gone, deletes are idempotent
+            raise SyncError(f'{entity_type} {mutation["id"]} not found')
+
+        # Permission checks
+        if entity_type == 'list':
+            if row and row.user_id != user_id and (op == 'delete' or not cls._can_edit(user_id, row)):
+                raise SyncError('No access to this list')
+        elif entity_type == 'item':
+            if row:
+                mutation = {**mutation, 'list_id': row.list_id}
+            cls._resolve_list(user_id, mutation, client_ids)
+        else:
+            if row:
+                is_recipient = row.shared_with == user_id
+                owns_list = row.shared_list.user_id == user_id
+                # Recipients may answer or leave a share; everything else is the owner's call
+                if not owns_list and not (is_recipient and (op == 'delete' or set(data) <= {'status'})):
+                    raise SyncError('No access to this share')
+            else:
+                cls._resolve_list(user_id, mutation, client_ids, require_owner=True)
+
+        # Optimistic concurrency: refuse to overwrite a newer server row
+        base = mutation.get('base_updated_at')
+        if base is not None and not isinstance(base, str):
+            raise SyncError('base_updated_at must be an ISO 8601 string')
+        if row and base and row.updated_at and row.updated_at > datetime.fromisoformat(base):
+            return {'status': 'conflict', 'server': row.to_dict()}
+
+        if op == 'delete':
+            db.session.delete(row)
+            return {'status': 'deleted'}
+
+        if row is None:
+            if entity_type == 'list':
+                row = ShoppingList(user_id=user_id, name=data.get('name') or 'Untitled list')
+            elif entity_type == 'item':
+                row = ShoppingListItem(list_id=cls._resolve_list(user_id, mutation, client_ids).id)
+            else:
+                if not data.get('shared_with'):
+                    raise SyncError('shared_with is required')
+                row = ListSharing(
+                    list_id=cls._resolve_list(user_id, mutation, client_ids, require_owner=True).id,
+                    shared_by=user_id,
+                    shared_with=cls._field_value('share', 'shared_with', data['shared_with'])
+                )
+            db.session.add(row)
+
+        for field in MUTABLE_FIELDS[entity_type]:
+            if field in data:
+                setattr(row, field, cls._field_value(entity_type, field, data[field]))
+
+        db.session.flush()
+        if mutation.get('client_id') is not None:
+            client_ids[(entity_type, mutation['client_id'])] = row.id
+
+        return {'status': 'applied', 'id': row.id, 'updated_at': row.updated_at.isoformat() if row.updated_at else None}
+
+    @classmethod
+    def apply_mutations(cls, user_id, mutations):
+        """
+        Apply a batch of client mutations in one transaction.
+
+        Each mutation runs in its own savepoint, so one bad mutation is reported
+        without undoing the others. Items may point at a list created earlier in
+        the same batch through 'list_client_id'.
+
+        Args:
+            user_id: ID of the syncing user
+            mutations: List of mutation dicts with 'type', 'op' and optional 'id', 'client_id', 'data'
+
+        Returns:
+            list: One result dict per mutation, in order
+        """
+        client_ids = {}
+        results = []
+
+        for index, mutation in enumerate(mutations):
+            result = {'index': index, 'client_id': mutation.get('client_id') if isinstance(mutation, dict) else None}
+            savepoint = db.session.begin_nested()
+            try:
+                if not isinstance(mutation, dict):
+                    raise SyncError('Mutation must be an object')
+                result.update(cls._apply(user_id, mutation, client_ids))
+                savepoint.commit()
+            except (SyncError, ValueError, TypeError, KeyError, IntegrityError) as e:
+                savepoint.rollback()
+                result.update({'status': 'error', 'error': str(e)})
+            results.append(result)
+
+        db.session.commit()
+        return results
@@ -1,16 +1,16 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask import current_app
 from datetime import datetime, timedelta
 import jwt
 import os
 import secrets
 import string
+from src.extensions import db
+from src.models.notification import Notification, SMSNotification, TemporaryLink
 
-db = SQLAlchemy()
 
 class SMSService:
     """Service for handling SMS notifications with temporary links."""
     
-    SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'development_secret_key')
     BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5000')
     
     @classmethod
@@ -36,7 +36,7 @@ class SMSService:
         }
         
         # Generate JWT token
-        token = jwt.encode(payload, cls.SECRET_KEY, algorithm='HS256')
+        token = jwt.encode(payload, current_app.config['BILL_LINK_SECRET_KEY'], algorithm='HS256')
         
         # Create link with token
         link = f"{cls.BASE_URL}/bills/view/{token}"
@@ -98,7 +98,7 @@ class SMSService:
                 }
             
             # Decode and validate token
-            payload = jwt.decode(token, cls.SECRET_KEY, algorithms=['HS256'])
+            payload = jwt.decode(token, current_app.config['BILL_LINK_SECRET_KEY'], algorithms=['HS256'])
             
             # Record access
             temp_link.record_access()
@@ -0,0 +1,239 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from datetime import timedelta
+import os
+import threading
+import time
+
+from src.models.merchant import StoreLocation, StoreOperatingHours
+from src.metrics import record_cache
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+FULL_WEEK = (1 << SLOTS_PER_WEEK) - 1
+
+
+class StoreHoursService:
+    """
+    Service for answering "is this store open?" questions from precomputed weekly bitmaps.
+
+    Each store's week is split into 15-minute slots (672 in total) and packed into a
+    single integer, bit N being set when the store is open for the whole of slot N.
+    Slot 0 starts at Sunday 00:00 to match ``StoreOperatingHours.day_of_week``.
+    Bitmaps are built lazily, kept in process memory and dropped whenever a store's
+    hours are committed, so filtering thousands of stores is a loop of bit tests.
+    Every drop bumps the store's generation, and a bitmap read from the database
+    is only cached if its store's generation did not change during the read.
+    """
+
+    MAX_AGE_SECONDS = int(os.environ.get('STORE_HOURS_CACHE_SECONDS', '300'))
+
+    _bitmaps = {}  # store_id -> (bitmap, loaded_at)
+    _generations = {}  # store_id -> times its bitmap was dropped
+    _epoch = 0  # times every bitmap was dropped
+    _lock = threading.Lock()
+
+    @staticmethod
+    def slot_for(when):
+        """
+        Get the weekly slot index for a datetime.
+
+        Args:
+            when: datetime in the store's local time
+
+        Returns:
+            int: Slot index between 0 and SLOTS_PER_WEEK - 1
+        """
+        day_of_week = (when.weekday() + 1) % 7  # Python weeks start on Monday
+        return day_of_week * SLOTS_PER_DAY + (when.hour * 60 + when.minute) // SLOT_MINUTES
+
+    @staticmethod
+    def mask_for(start, end):
+        """
+        Build a mask covering every slot touched by the range [start, end).
+
+        Args:
+            start: datetime the range starts at
+            end: datetime the range ends at
+
+        Returns:
+            int: Bit mask of the covered slots
+        """
+        if end - start >= timedelta(days=7):
+            return FULL_WEEK
+
+        # Count to the slot holding the range's last instant, not by its length,
+        # so a range starting mid-slot still covers the slot it ends in
+        first = StoreHoursService.slot_for(start)
+        last = StoreHoursService.slot_for(max(end - timedelta(microseconds=1), start))
+        span = (last - first) % SLOTS_PER_WEEK + 1
+
+        mask = 0
+        for offset in range(span):
+            mask |= 1 << ((first + offset) % SLOTS_PER_WEEK)
+        return mask
+
+    @staticmethod
+    def _day_bits(day_of_week, opening_time, closing_time):
+        """Set the slots between opening and closing time on one day, wrapping past midnight."""
+        open_minutes = opening_time.hour * 60 + opening_time.minute
+        close_minutes = closing_time.hour * 60 + closing_time.minute
+
+        # Only slots the store is open for in full are marked
+        first = -(-open_minutes // SLOT_MINUTES)
+        last = close_minutes // SLOT_MINUTES
+        if close_minutes <= open_minutes:
+            last += SLOTS_PER_DAY
+
+        bits = 0
+        base = day_of_week * SLOTS_PER_DAY
+        for slot in range(first, last):
+            bits |= 1 << ((base + slot) % SLOTS_PER_WEEK)
+        return bits
+
+    @classmethod
+    def build_bitmap(cls, store, operating_hours):
+        """
+        Build the weekly bitmap for a store.
+
+        Per-day ``StoreOperatingHours`` rows win; days without a row are closed.
+        Stores without any rows fall back to ``opening_time``/``closing_time`` on
+        every day, and stores with no hours at all are treated as always open.
+
+        Args:
+            store: StoreLocation object
+            operating_hours: StoreOperatingHours objects for the store
+
+        Returns:
+            int: Weekly bitmap
+        """
+        if not store.is_active:
+            return 0
+
+        if operating_hours:
+            bitmap = 0
+            for hours in operating_hours:
+                if hours.is_closed:
+                    continue
+                bitmap |= cls._day_bits(hours.day_of_week % 7, hours.opening_time, hours.closing_time)
+            return bitmap
+
+        if store.opening_time and store.closing_time:
+            bitmap = 0
+            for day_of_week in range(7):
+                bitmap |= cls._day_bits(day_of_week, store.opening_time, store.closing_time)
+            return bitmap
+
+        return FULL_WEEK
+
+    @classmethod
+    def get_bitmaps(cls, store_ids):
+        """
+        Get weekly bitmaps for a set of stores, loading missing ones in two queries.
+
+        Args:
+            store_ids: Iterable of store IDs
+
+        Returns:
+            dict: Mapping of store ID to bitmap; unknown stores are left out
+        """
+        store_ids = set(store_ids)
+        now = time.monotonic()
+        result = {}
+        missing = []
+
+        with cls._lock:
+            for store_id in store_ids:
+                cached = cls._bitmaps.get(store_id)
+                if cached and now - cached[1] < cls.MAX_AGE_SECONDS:
+                    result[store_id] = cached[0]
+                else:
+                    missing.append(store_id)
+            # Generations before the read; a bump during it means the rows read may be stale
+            seen = {store_id: (cls._epoch, cls._generations.get(store_id, 0)) for store_id in missing}
+
+        record_cache('store_hours', 'hit', len(result))
+        record_cache('store_hours', 'miss', len(missing))
+        if not missing:
+            return result
+
+        stores = StoreLocation.query.filter(StoreLocation.id.in_(missing)).all()
+        hours_by_store = {}
+        for hours in StoreOperatingHours.query.filter(StoreOperatingHours.store_id.in_(missing)).all():
+            hours_by_store.setdefault(hours.store_id, []).append(hours)
+
+        with cls._lock:
+            for store in stores:
+                bitmap = cls.build_bitmap(store, hours_by_store.get(store.id, []))
+                if seen[store.id] == (cls._epoch, cls._generations.get(store.id, 0)):
+                    cls._bitmaps[store.id] = (bitmap, now)
+                result[store.id] = bitmap
+
+        return result
+
+    @classmethod
+    def filter_open(cls, store_ids, start, end=None):
+        """
+        Filter stores down to those open at a time, or for the whole of a time range.
+
+        Args:
+            store_ids: Iterable of store IDs
+            start: datetime to check
+            end: Optional datetime; when given the store must be open until then
+
+        Returns:
+            list: IDs of the open stores, in the order given
+        """
+        store_ids = list(store_ids)
+        mask = cls.mask_for(start, end) if end else 1 << cls.slot_for(start)
+        bitmaps = cls.get_bitmaps(store_ids)
+
+        return [store_id for store_id in store_ids if bitmaps.get(store_id, 0) & mask == mask]
+
+    @classmethod
+    def is_open(cls, store_id, when):
+        """Check whether a single store is open at a given time."""
+        return bool(cls.filter_open([store_id], when))
+
+    @classmethod
+    def invalidate(cls, store_ids=None):
+        """
+        Drop cached bitmaps so they are rebuilt on next use.
+
+        Args:
+            store_ids: Iterable of store IDs, or None to clear everything
+        """
+        with cls._lock:
+            if store_ids is None:
+                cls._bitmaps.clear()
+                cls._epoch += 1
+                return
+            for store_id in store_ids:
+                cls._bitmaps.pop(store_id, None)
+                cls._generations[store_id] = cls._generations.get(store_id, 0) + 1
+
+
+def _mark_store_dirty(mapper, connection, target):
+    """Remember which stores changed in this session so their bitmaps are dropped on commit."""
+    store_id = target.id if isinstance(target, StoreLocation) else target.store_id
+    session = inspect(target).session
+    if session is not None and store_id is not None:
+        session.info.setdefault('store_hours_dirty', set()).add(store_id)
+
+
+for _model in (StoreLocation, StoreOperatingHours):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _mark_store_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dirty_stores(session):
+    dirty = session.info.pop('store_hours_dirty', None)
+    if dirty:
+        StoreHoursService.invalidate(dirty)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_dirty_stores(session):
+    session.info.pop('store_hours_dirty', None)
@@ -1,7 +1,6 @@
-from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.extensions import db
 
-db = SQLAlchemy()
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -59,6 +58,10 @@ class UserAuthentication(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('idx_user_authentication_user_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<UserAuthentication {self.auth_type} for user {self.user_id}>'
 
@@ -80,6 +83,10 @@ class UserAddress(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('idx_user_addresses_user_id', 'user_id'),
+    )
+    
     def __repr__(self):
         return f'<UserAddress {self.id} for user {self.user_id}>'
     
@@ -0,0 +1,281 @@
+"""
+Password hashing on a bounded worker pool.
+
+Key derivation is deliberately slow, so a burst of logins hashing on the
+request threads would leave none for other endpoints. ``hash_password`` and
+``verify_password`` instead run the work on a small thread pool (the KDFs
+release the GIL) of PASSWORD_HASH_WORKERS threads, with at most
+PASSWORD_HASH_QUEUE more jobs waiting. When the queue is full, or a job is
+not done within PASSWORD_HASH_TIMEOUT seconds, they raise ``HashPoolBusy``
+and the endpoint answers 503 instead of piling up requests.
+
+New hashes use PASSWORD_SCHEME with its cost settings:
+
+    scrypt  (default) hashlib.scrypt; SCRYPT_N, SCRYPT_R, SCRYPT_P
+    bcrypt  needs the bcrypt package; BCRYPT_ROUNDS
+    argon2  needs argon2-cffi; ARGON2_TIME_COST, ARGON2_MEMORY_KIB, ARGON2_PARALLELISM
+
+Stored hashes of any of these schemes verify, and ``verify_password`` tells
+the caller when one should be rehashed because the scheme or its costs have
+changed since it was made. Time spent hashing and waiting for the pool is
+recorded in the ``password_hash_seconds`` and ``password_hash_queue_seconds``
+histograms, and rejected jobs in ``password_hash_rejected_total``.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+
+from src.metrics import increment_counter, observe_duration
+
+try:
+    import bcrypt
+except ImportError:  # pragma: no cover - optional scheme
+    bcrypt = None
+
+try:
+    import argon2
+except ImportError:  # pragma: no cover - optional scheme
+    argon2 = None
+
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', str(4 * PASSWORD_HASH_WORKERS)))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))
+
+
+class HashPoolBusy(Exception):
+    """The hashing pool has too much work queued to take a job in time."""
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class ScryptHasher:
+    """scrypt from hashlib, stored as ``scrypt$n$r$p$salt$hash``."""
+
+    name = 'scrypt'
+    PREFIX = 'scrypt$'
+
+    def __init__(self):
+        self.n = int(os.environ.get('SCRYPT_N', '16384'))
+        self.r = int(os.environ.get('SCRYPT_R', '8'))
+        self.p = int(os.environ.get('SCRYPT_P', '1'))
+
+    @staticmethod
+    def _derive(password, salt, n, r, p, length):
+        # scrypt needs 128 * n * r * p bytes; OpenSSL's default cap is 32 MiB
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=length,
+                              maxmem=128 * n * r * p + 1024 * 1024)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(16)
+        derived = self._derive(password, salt, self.n, self.r, self.p, 32)
+        return f'scrypt${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(derived)}'
+
+    @staticmethod
+    def _parse(encoded):
+        _, n, r, p, salt, derived = encoded.split('$')
+        return int(n), int(r), int(p), _b64decode(salt), _b64decode(derived)
+
+    def verify(self, password, encoded):
+        try:
+            n, r, p, salt, derived = self._parse(encoded)
+        except (ValueError, binascii.Error):
+            return False
+        return hmac.compare_digest(self._derive(password, salt, n, r, p, len(derived)), derived)
+
+    def needs_rehash(self, encoded):
+        try:
+            n, r, p, _, _ = self._parse(encoded)
+        except (ValueError, binascii.Error):
+            return True
+        return (n, r, p) != (self.n, self.r, self.p)
+
+
+class BcryptHasher:
+    """bcrypt, in its own ``$2b$rounds$...`` format. Only the first 72 bytes of a password count."""
+
+    name = 'bcrypt'
+    PREFIX = '$2'
+
+    def __init__(self):
+        self.rounds = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+
+    def hash(self, password):
+        return bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(self.rounds)).decode()
+
+    def verify(self, password, encoded):
+        try:
+            return bcrypt.checkpw(password.encode()[:72], encoded.encode())
+        except ValueError:
+            return False
+
+    def needs_rehash(self, encoded):
+        try:
+            return int(encoded.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+class Argon2Hasher:
+    """Argon2id from argon2-cffi, in the standard ``$argon2id$...`` format."""
+
+    name = 'argon2'
+    PREFIX = '$argon2'
+
+    def __init__(self):
+        self._hasher = argon2.PasswordHasher(
+            time_cost=int(os.environ.get('ARGON2_TIME_COST', '3')),
+            memory_cost=int(os.environ.get('ARGON2_MEMORY_KIB', '65536')),
+            parallelism=int(os.environ.get('ARGON2_PARALLELISM', '4'))
+        )
+
+    def hash(self, password):
+        return self._hasher.hash(password)
+
+    def verify(self, password, encoded):
+        try:
+            return self._hasher.verify(encoded, password)
+        except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+            return False
+
+    def needs_rehash(self, encoded):
+        try:
+            return self._hasher.check_needs_rehash(encoded)
+        except argon2.exceptions.InvalidHashError:
+            return True
+
+
+HASHERS = {'scrypt': ScryptHasher, 'bcrypt': BcryptHasher, 'argon2': Argon2Hasher}
+AVAILABLE = {'scrypt': True, 'bcrypt': bcrypt is not None, 'argon2': argon2 is not None}
+
+
+class HashPool:
+    """Runs hashing jobs on a fixed number of threads, refusing work beyond a queue limit."""
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, max_queue))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, operation, scheme, function, *args):
+        """
+        Run a hashing function on the pool and wait for its result.
+
+        Raises:
+            HashPoolBusy: If the queue is full or the job did not finish within the timeout
+        """
+        if not self._slots.acquire(blocking=False):
+            increment_counter('password_hash_rejected_total', 'Password hashing jobs refused by the pool.',
+                              operation=operation, reason='queue_full')
+            raise HashPoolBusy('Too many sign-ins in progress, please retry shortly')
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            observe_duration('password_hash_queue_seconds', 'Time password hashing jobs waited for a worker.',
+                             started - submitted, operation=operation)
+            try:
+                return function(*args)
+            finally:
+                observe_duration('password_hash_seconds', 'Time spent hashing passwords.',
+                                 time.perf_counter() - started, operation=operation, scheme=scheme)
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(job)
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The job keeps its slot until it finishes, so a stalled pool keeps refusing work
+            increment_counter('password_hash_rejected_total', 'Password hashing jobs refused by the pool.',
+                              operation=operation, reason='timeout')
+            raise HashPoolBusy('Sign-in is taking too long, please retry shortly')
+
+
+_pool = HashPool()
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def _hasher(name):
+    with _hashers_lock:
+        if name not in _hashers:
+            if not AVAILABLE.get(name):
+                raise ValueError(f'Password scheme {name!r} is not available; install its package or use scrypt')
+            _hashers[name] = HASHERS[name]()
+        return _hashers[name]
+
+
+def current_hasher():
+    """The hasher new passwords are stored with (PASSWORD_SCHEME)."""
+    return _hasher(os.environ.get('PASSWORD_SCHEME', 'scrypt'))
+
+
+def _identify(encoded):
+    for name, hasher_class in HASHERS.items():
+        if AVAILABLE[name] and (encoded or '').startswith(hasher_class.PREFIX):
+            return _hasher(name)
+    return None
+
+
+def hash_password(password):
+    """
+    Hash a password with the current scheme, on the pool.
+
+    Raises:
+        HashPoolBusy: If the pool cannot take the job
+    """
+    hasher = current_hasher()
+    return _pool.run('hash', hasher.name, hasher.hash, password)
+
+
+def verify_password(password, encoded):
+    """
+    Check a password against a stored hash, on the pool.
+
+    A hash in an unknown format never matches; the current scheme still runs
+    so the response takes as long as for a real account.
+
+    Returns:
+        tuple: (matches, whether the stored hash should be replaced with a new one)
+
+    Raises:
+        HashPoolBusy: If the pool cannot take the job
+    """
+    hasher = _identify(encoded)
+    if hasher is None:
+        current = current_hasher()
+        _pool.run('verify', current.name, current.hash, password)
+        return False, False
+
+    matches = _pool.run('verify', hasher.name, hasher.verify, password, encoded)
+    if not matches:
+        return False, False
+    current = current_hasher()
+    return True, hasher is not current or current.needs_rehash(encoded)
@@ -0,0 +1,271 @@
+"""
+Token-bucket rate limiting for the hot endpoints.
+
+Endpoints are put in groups (RATE_LIMIT_GROUPS), and each group limits one or
+more principals: the user or merchant the request's access token was issued
+to (``g.principal``, so the limiter runs after authentication) and the client
+IP. Requests without a principal, such as those to public endpoints or with
+AUTH_ENABLED=0, only take from their IP buckets. Every (group, principal, value)
+has its own bucket of ``burst`` tokens refilled at ``rate`` per second; a
+request takes one token from each of its buckets and is answered with 429 and
+a ``Retry-After`` header when one is empty. One tenant or address therefore
+only drains its own buckets. Endpoints outside the groups are not limited.
+
+Buckets live in a backend chosen with RATE_LIMIT_BACKEND:
+
+    shared  (default) A fixed-size table in anonymous shared memory, created
+            with the app. Workers forked from the launcher's master share it,
+            so limits hold across all workers on a host.
+    memory  A dict in each process; limits are per worker.
+
+Both check a bucket in O(1). Settings:
+
+    RATE_LIMIT_ENABLED      set to 0 to turn limiting off
+    RATE_LIMITS             comma-separated overrides, ``group.principal=rate/burst``,
+                            e.g. ``bill_reads.user=5/10,bill_links.ip=2/5``;
+                            a rate of 0 turns that limit off
+    RATE_LIMIT_SHARED_SLOTS buckets the shared table holds (default 65536)
+
+Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so the client IP
+is the real one.
+"""
+from flask import current_app, jsonify, request
+from collections import OrderedDict
+import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+
+from src.auth import current_principal
+
+# group -> endpoints and {principal: (tokens per second, burst)}
+RATE_LIMIT_GROUPS = {
+    'bill_reads': {
+        'endpoints': ('bill.get_bills', 'bill.get_bill', 'bill.get_bills_batch'),
+        'limits': {'user': (10, 20), 'ip': (50, 100)},
+    },
+    'bill_writes': {
+        'endpoints': ('bill.create_bill', 'bill.record_payment'),
+        'limits': {'merchant': (20, 40), 'ip': (20, 40)},
+    },
+    'bill_links': {
+        'endpoints': ('bill.view_bill_by_token', 'sms.validate_link'),
+        'limits': {'ip': (5, 20)},
+    },
+    'sms': {
+        'endpoints': ('sms.send_bill_notification',),
+        'limits': {'user': (1, 5), 'ip': (5, 10)},
+    },
+    'sign_in': {
+        'endpoints': ('auth.login', 'auth.register'),
+        'limits': {'ip': (1, 10)},
+    },
+}
+PRINCIPALS = ('user', 'merchant', 'ip')
+
+
+def parse_limits(value):
+    """
+    Parse RATE_LIMITS overrides.
+
+    Returns:
+        dict: {(group, principal): (rate, burst)}
+
+    Raises:
+        ValueError: If an entry is malformed or names an unknown group or principal
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in (value or '').split(','))):
+        try:
+            name, spec = entry.split('=')
+            group, principal = name.strip().split('.')
+            rate, burst = (float(number) for number in spec.split('/'))
+        except ValueError:
+            raise ValueError(f'Invalid RATE_LIMITS entry {entry!r}, expected group.principal=rate/burst')
+        if group not in RATE_LIMIT_GROUPS or principal not in PRINCIPALS:
+            raise ValueError(f'Unknown rate limit {group}.{principal}')
+        limits[(group, principal)] = (rate, burst)
+    return limits
+
+
+def _refill(tokens, updated, now, rate, burst):
+    """Take one token from a bucket; returns (allowed, tokens left, seconds until one is available)."""
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0.0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    """Buckets in this process's memory, least recently used dropped beyond max_buckets."""
+
+    def __init__(self, max_buckets=65536):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from a bucket.
+
+        Returns:
+            tuple: (allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            allowed, tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class SharedMemoryBackend:
+    """
+    Buckets in an anonymous shared mmap, shared by processes forked after it is created.
+
+    The table is split into groups of WAYS slots; a key hashes to one group and
+    takes a free slot there, or the least recently updated one, so a lookup
+    reads at most WAYS slots. Each group is guarded by one of a fixed set of
+    process-shared locks. A lock that cannot be had within LOCK_TIMEOUT (its
+    holder was killed mid-update) lets the request through rather than stall.
+    """
+
+    WAYS = 4
+    LOCKS = 64
+    LOCK_TIMEOUT = 0.05
+    SLOT = struct.Struct('=Qdd')  # key hash (0 = free), tokens, updated
+
+    def __init__(self, slots=65536):
+        self.groups = max(1, slots // self.WAYS)
+        self._memory = mmap.mmap(-1, self.groups * self.WAYS * self.SLOT.size)
+        self._locks = [multiprocessing.Lock() for _ in range(self.LOCKS)]
+
+    @staticmethod
+    def _hash(key):
+        # Not hash(): it is salted per interpreter
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big') or 1
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from a bucket.
+
+        Returns:
+            tuple: (allowed, seconds until a token is available)
+        """
+        key_hash = self._hash(key)
+        group = key_hash % self.groups
+        lock = self._locks[group % self.LOCKS]
+        if not lock.acquire(timeout=self.LOCK_TIMEOUT):
+            return True, 0.0
+
+        try:
+            now = time.monotonic()
+            base = group * self.WAYS * self.SLOT.size
+            slot, tokens, updated = None, burst, now
+            oldest = None
+            for way in range(self.WAYS):
+                offset = base + way * self.SLOT.size
+                stored_hash, stored_tokens, stored_updated = self.SLOT.unpack_from(self._memory, offset)
+                if stored_hash == key_hash:
+                    slot, tokens, updated = offset, stored_tokens, stored_updated
+                    break
+                age = -1.0 if stored_hash == 0 else stored_updated
+                if oldest is None or age < oldest:
+                    slot, oldest = offset, age
+
+            allowed, tokens, retry_after = _refill(tokens, updated, now, rate, burst)
+            self.SLOT.pack_into(self._memory, slot, key_hash, tokens, now)
+        finally:
+            lock.release()
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """Maps endpoints to their buckets and checks requests against a backend."""
+
+    def __init__(self, backend, overrides=None):
+        self.backend = backend
+        overrides = overrides or {}
+        self.endpoints = {}  # endpoint -> [(group, principal, rate, burst)]
+        for group, spec in RATE_LIMIT_GROUPS.items():
+            limits = []
+            for principal, (rate, burst) in spec['limits'].items():
+                rate, burst = overrides.get((group, principal), (rate, burst))
+                if rate > 0:
+                    limits.append((group, principal, rate, max(burst, 1)))
+            for endpoint in spec['endpoints']:
+                self.endpoints[endpoint] = limits
+
+    @staticmethod
+    def _principal(principal):
+        if principal == 'ip':
+            return request.remote_addr
+        subject = current_principal()
+        return subject.id if subject is not None and subject.kind == principal else None
+
+    def check(self):
+        """
+        Take a token from each bucket the current request falls in.
+
+        Returns:
+            float: Seconds the client should wait, or None if the request may go ahead
+        """
+        limits = self.endpoints.get(request.endpoint)
+        if not limits:
+            return None
+
+        wait = None
+        for group, principal, rate, burst in limits:
+            value = self._principal(principal)
+            if value is None:
+                continue
+            allowed, retry_after = self.backend.take(f'{group}:{principal}:{value}', rate, burst)
+            if not allowed:
+                wait = max(wait or 0.0, retry_after)
+        return wait
+
+
+def _before_request():
+    wait = current_app.extensions['rate_limit'].check()
+    if wait is None:
+        return None
+    response = jsonify({
+        'success': False,
+        'message': 'Too many requests, please retry later'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def init_rate_limit(app):
+    """
+    Install rate limiting on an app.
+
+    Reads RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMITS and
+    RATE_LIMIT_SHARED_SLOTS. With the launcher the app, and so the shared
+    table, is created in the master before the workers are forked.
+
+    Args:
+        app: Flask application
+    """
+    if os.environ.get('RATE_LIMIT_ENABLED', '1') == '0':
+        return
+
+    backend_name = os.environ.get('RATE_LIMIT_BACKEND', 'shared')
+    if backend_name == 'shared':
+        backend = SharedMemoryBackend(int(os.environ.get('RATE_LIMIT_SHARED_SLOTS', '65536')))
+    elif backend_name == 'memory':
+        backend = MemoryBackend()
+    else:
+        raise ValueError(f"RATE_LIMIT_BACKEND must be 'shared' or 'memory', not {backend_name!r}")
+
+    app.extensions['rate_limit'] = RateLimiter(backend, parse_limits(os.environ.get('RATE_LIMITS')))
+    app.before_request(_before_request)
@@ -0,0 +1,216 @@
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy.exc import IntegrityError
+from src.auth import AuthError, current_principal
+from src.extensions import db
+from src.models.auth_service import AuthService, ACCOUNT_KINDS
+from src.passwords import HashPoolBusy
+
+auth_bp = Blueprint('auth', __name__)
+
+MIN_PASSWORD_LENGTH = 8
+MAX_PASSWORD_LENGTH = 128
+
+# Fields a registration must include, besides the password
+REQUIRED_FIELDS = {
+    'user': ('username', 'email', 'phone_number'),
+    'merchant': ('business_name', 'gst_number', 'email', 'phone_number'),
+}
+
+def _busy(e):
+    response = jsonify({
+        'success': False,
+        'message': str(e)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def _json_body():
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+def _account_type(data):
+    account_type = data.get('account_type', 'user')
+    return account_type if account_type in ACCOUNT_KINDS else None
+
+@auth_bp.route('/register', methods=['POST'])
+def register():
+    """
+    Create a user or merchant account and sign it in.
+    
+    Request body:
+    {
+        "account_type": "user",  # or "merchant" (optional, defaults to "user")
+        "username": "asha",  # users
+        "business_name": "Fresh Mart",  # merchants
+        "gst_number": "29ABCDE1234F1Z5",  # merchants
+        "email": "asha@example.com",
+        "phone_number": "9876543210",
+        "password": "...",  # 8 to 128 characters
+        "first_name": "Asha",  # users (optional)
+        "last_name": "Rao",  # users (optional)
+        "contact_person": "...",  # merchants (optional)
+        "business_type": "grocery"  # merchants (optional)
+    }
+    
+    Responds like /login, with 201.
+    """
+    data = _json_body()
+    account_type = _account_type(data)
+    if account_type is None:
+        return jsonify({
+            'success': False,
+            'message': f"account_type must be one of: {', '.join(ACCOUNT_KINDS)}"
+        }), 400
+    
+    for field in REQUIRED_FIELDS[account_type] + ('password',):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            return jsonify({
+                'success': False,
+                'message': f'Missing required field: {field}'
+            }), 400
+    
+    password = data['password']
+    if not MIN_PASSWORD_LENGTH <= len(password) <= MAX_PASSWORD_LENGTH:
+        return jsonify({
+            'success': False,
+            'message': f'Password must be {MIN_PASSWORD_LENGTH} to {MAX_PASSWORD_LENGTH} characters'
+        }), 400
+    
+    fields = {name: value for name, value in data.items() if name not in ('account_type', 'password')}
+    try:
+        account = AuthService.register(account_type, fields, password)
+    except HashPoolBusy as e:
+        return _busy(e)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'An account with these details already exists'
+        }), 409
+    
+    tokens = AuthService.start_session(
+        account_type, account.id, ip_address=request.remote_addr, user_agent=request.headers.get('User-Agent')
+    )
+    return jsonify({
+        'success': True,
+        'account_type': account_type,
+        account_type: account.to_dict(),
+        **tokens
+    }), 201
+
+@auth_bp.route('/login', methods=['POST'])
+def login():
+    """
+    Sign in with a password.
+    
+    Request body:
+    {
+        "account_type": "user",  # or "merchant" (optional, defaults to "user")
+        "login": "asha@example.com",  # username, email or phone number; merchants also GST number
+        "password": "..."
+    }
+    
+    Returns the account and an access token with its refresh token. Answers
+    503 with Retry-After when too many passwords are being checked at once.
+    """
+    data = _json_body()
+    account_type = _account_type(data)
+    login_name, password = data.get('login'), data.get('password')
+    if account_type is None or not isinstance(login_name, str) or not isinstance(password, str) or not login_name or not password:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required fields: login and password'
+        }), 400
+    
+    if len(password) > MAX_PASSWORD_LENGTH:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid login or password'
+        }), 401
+    
+    try:
+        account = AuthService.check_password(account_type, login_name.strip(), password)
+    except HashPoolBusy as e:
+        return _busy(e)
+    
+    if account is None:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid login or password'
+        }), 401
+    
+    if not account.is_active:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'This account has been deactivated'
+        }), 403
+    
+    # Commits last_login (and a new hash) with the session
+    tokens = AuthService.start_session(
+        account_type, account.id, ip_address=request.remote_addr, user_agent=request.headers.get('User-Agent')
+    )
+    return jsonify({
+        'success': True,
+        'account_type': account_type,
+        account_type: account.to_dict(),
+        **tokens
+    }), 200
+
+@auth_bp.route('/refresh', methods=['POST'])
+def refresh():
+    """
+    Exchange a refresh token for a new access token and refresh token.
+
+    Request body:
+    {
+        "refresh_token": "..."
+    }
+
+    The old refresh token stops working.
+    """
+    data = _json_body()
+    refresh_token = data.get('refresh_token')
+    if not isinstance(refresh_token, str) or not refresh_token:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required field: refresh_token'
+        }), 400
+
+    tokens = AuthService.refresh(refresh_token)
+    if tokens is None:
+        return jsonify({
+            'success': False,
+            'message': 'Refresh token is invalid, expired or already used'
+        }), 401
+
+    return jsonify({
+        'success': True,
+        **tokens
+    }), 200
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """
+    Sign out the session of the request's access token.
+
+    Its refresh token stops working and its access tokens are rejected from
+    now on by every worker, within REVOCATION_SYNC_SECONDS on the others.
+    """
+    principal = current_principal()
+    if principal is None:
+        # Authentication is turned off, so the middleware did not check the token
+        try:
+            principal = current_app.extensions['auth'].authenticate(request.headers.get('Authorization'))
+        except AuthError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 401
+
+    AuthService.end_session(principal.sid)
+    return jsonify({
+        'success': True,
+        'message': 'Signed out'
+    }), 200
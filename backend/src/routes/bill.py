@@ -2,12 +2,40 @@ from flask import Blueprint, request, jsonify, render_template
 from src.models.bill import Bill, BillItem, Payment
 from src.models.user import User
 from src.models.merchant import Merchant, StoreLocation
-from flask_sqlalchemy import SQLAlchemy
+from src.models.inventory_service import InventoryService, OVERSELL_POLICIES
+from src.models.ledger_service import LedgerService
 from datetime import datetime
+from decimal import Decimal
+import secrets
+from src.auth import current_principal
+from src.extensions import db
+from src.idempotency import idempotent
+from src.serialization import FieldSet, parse_format, serializer_for
 
-db = SQLAlchemy()
 bill_bp = Blueprint('bill', __name__)
 
+# Most bills GET /api/bills/batch returns in one call
+MAX_BATCH_BILLS = 50
+
+# Fields the bill list can return: every serialized Bill column plus the joined names
+BILL_LIST_FIELDS = FieldSet(Bill, {
+    'merchant_name': Merchant.business_name,
+    'store_name': StoreLocation.store_name
+})
+
+def _caller_bills():
+    """
+    Conditions limiting Bill to the caller's own bills.
+    
+    A user sees the bills issued to it and a merchant the bills it issued,
+    whatever ids the request names. Empty when authentication is off.
+    """
+    principal = current_principal()
+    if principal is None:
+        return []
+    owner = Bill.user_id if principal.kind == 'user' else Bill.merchant_id
+    return [owner == principal.id]
+
 @bill_bp.route('/', methods=['GET'])
 def get_bills():
     """
@@ -18,6 +46,10 @@ def get_bills():
     - status: Filter by status (optional)
     - from_date: Filter by date from (optional)
     - to_date: Filter by date to (optional)
+    - fields: Comma-separated fields to return (optional, defaults to all),
+      e.g. id,bill_number,bill_date,total_amount,status,merchant_name
+    - format: 'objects' (default) or 'columnar', which returns the field names
+      once in 'fields' and one value list per bill in 'rows'
     """
     user_id = request.args.get('user_id')
     status = request.args.get('status')
@@ -30,17 +62,30 @@ def get_bills():
             'message': 'Missing required parameter: user_id'
         }), 400
     
-    # Build query
-    query = Bill.query.filter_by(user_id=user_id)
+    try:
+        bills = BILL_LIST_FIELDS.project(request.args.get('fields'))
+        response_format = parse_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    # Select only the requested columns, joining merchants and stores only for their names
+    query = db.select(*bills.columns).select_from(Bill).where(Bill.user_id == user_id, *_caller_bills())
+    if 'merchant_name' in bills.fields:
+        query = query.outerjoin(Merchant, Merchant.id == Bill.merchant_id)
+    if 'store_name' in bills.fields:
+        query = query.outerjoin(StoreLocation, StoreLocation.id == Bill.store_id)
     
     # Apply filters
     if status:
-        query = query.filter_by(status=status)
+        query = query.where(Bill.status == status)
     
     if from_date:
         try:
             from_date_obj = datetime.fromisoformat(from_date)
-            query = query.filter(Bill.bill_date >= from_date_obj)
+            query = query.where(Bill.bill_date >= from_date_obj)
         except ValueError:
             return jsonify({
                 'success': False,
@@ -50,28 +95,26 @@ def get_bills():
     if to_date:
         try:
             to_date_obj = datetime.fromisoformat(to_date)
-            query = query.filter(Bill.bill_date <= to_date_obj)
+            query = query.where(Bill.bill_date <= to_date_obj)
         except ValueError:
             return jsonify({
                 'success': False,
                 'message': 'Invalid to_date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
             }), 400
     
-    # Execute query
-    bills = query.order_by(Bill.bill_date.desc()).all()
+    # Execute query and format response
+    rows = db.session.execute(query.order_by(Bill.bill_date.desc()))
     
-    # Format response
-    result = []
-    for bill in bills:
-        merchant = Merchant.query.get(bill.merchant_id)
-        store = StoreLocation.query.get(bill.store_id) if bill.store_id else None
-        
-        bill_data = bill.to_dict()
-        bill_data['merchant_name'] = merchant.business_name if merchant else None
-        bill_data['store_name'] = store.store_name if store else None
-        
-        result.append(bill_data)
+    if response_format == 'columnar':
+        result = [bills.values(row) for row in rows]
+        return jsonify({
+            'success': True,
+            'count': len(result),
+            'fields': list(bills.fields),
+            'rows': result
+        }), 200
     
+    result = bills.many(rows)
     return jsonify({
         'success': True,
         'count': len(result),
@@ -82,50 +125,172 @@ def get_bills():
 def get_bill(bill_id):
     """
     Get a specific bill by ID.
-    """
-    bill = Bill.query.get(bill_id)
     
-    if not bill:
+    Bills of other users or merchants are answered with 404.
+    """
+    bills = serializer_for(Bill)
+    merchants = serializer_for(Merchant)
+    stores = serializer_for(StoreLocation)
+    items = serializer_for(BillItem)
+    payments = serializer_for(Payment)
+    
+    # Bill, merchant and store in one row
+    row = db.session.execute(
+        db.select(*bills.columns, *merchants.columns, *stores.columns)
+        .outerjoin(Merchant, Merchant.id == Bill.merchant_id)
+        .outerjoin(StoreLocation, StoreLocation.id == Bill.store_id)
+        .where(Bill.id == bill_id, *_caller_bills())
+    ).first()
+    
+    if not row:
         return jsonify({
             'success': False,
             'message': f'Bill with ID {bill_id} not found'
         }), 404
     
-    # Get merchant and store
-    merchant = Merchant.query.get(bill.merchant_id)
-    store = StoreLocation.query.get(bill.store_id) if bill.store_id else None
+    merchant_start = len(bills.fields)
+    store_start = merchant_start + len(merchants.fields)
+    merchant_row = row[merchant_start:store_start]
+    store_row = row[store_start:]
     
     # Get bill items
-    items = BillItem.query.filter_by(bill_id=bill_id).all()
-    items_data = [item.to_dict() for item in items]
+    item_rows = db.session.execute(db.select(*items.columns).where(BillItem.bill_id == bill_id)).all()
     
     # Get payments
-    payments = Payment.query.filter_by(bill_id=bill_id).all()
-    payments_data = [payment.to_dict() for payment in payments]
+    payment_rows = db.session.execute(db.select(*payments.columns).where(Payment.bill_id == bill_id)).all()
     
-    # Calculate payment summary
-    total_paid = sum(payment.amount for payment in payments)
-    remaining_amount = bill.total_amount - total_paid
+    merchant = merchants.from_row(merchant_row) if merchant_row[0] is not None else None
+    store = stores.from_row(store_row) if store_row[0] is not None else None
+    result = _bill_detail(row, merchant, store, item_rows, payment_rows)
     
-    # Format response
-    result = bill.to_dict()
-    result['merchant'] = merchant.to_dict() if merchant else None
-    result['store'] = store.to_dict() if store else None
-    result['items'] = items_data
-    result['payments'] = payments_data
+    return jsonify({
+        'success': True,
+        'bill': result
+    }), 200
+
+def _bill_detail(bill_row, merchant, store, item_rows, payment_rows):
+    """
+    Assemble the get_bill shape from already loaded rows.
+    
+    Args:
+        bill_row: Row starting with the Bill serialized fields
+        merchant: Serialized merchant dict or None
+        store: Serialized store dict or None
+        item_rows: BillItem rows of the bill
+        payment_rows: Payment rows of the bill
+    """
+    total_amount = bill_row.total_amount
+    total_paid = sum(payment.amount for payment in payment_rows)
+    remaining_amount = total_amount - total_paid
+    
+    result = serializer_for(Bill).from_row(bill_row)
+    result['merchant'] = merchant
+    result['store'] = store
+    result['items'] = serializer_for(BillItem).many(item_rows)
+    result['payments'] = serializer_for(Payment).many(payment_rows)
     result['payment_summary'] = {
-        'total_amount': float(bill.total_amount),
+        'total_amount': float(total_amount),
         'total_paid': float(total_paid),
         'remaining_amount': float(remaining_amount),
         'is_fully_paid': remaining_amount <= 0
     }
+    return result
+
+@bill_bp.route('/batch', methods=['GET'])
+def get_bills_batch():
+    """
+    Get several bills by ID for one user, in the same shape as get_bill.
+    
+    Query parameters:
+    - user_id: ID of the user the bills must belong to
+    - ids: Comma-separated bill IDs (at most MAX_BATCH_BILLS)
+    
+    Bills, merchants, stores, items and payments are each loaded with one
+    IN query, whatever the number of bills. Bills that do not exist, belong
+    to another user or (for a merchant) were issued by another merchant are
+    all listed in 'not_found', so the response does not reveal their IDs.
+    """
+    user_id = request.args.get('user_id', type=int)
+    bill_ids = request.args.get('ids')
+    
+    if not user_id or not bill_ids:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameters: user_id, ids'
+        }), 400
+    
+    try:
+        bill_ids = list(dict.fromkeys(int(bill_id) for bill_id in bill_ids.split(',') if bill_id))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'ids must be a comma-separated list of integers'
+        }), 400
+    
+    if len(bill_ids) > MAX_BATCH_BILLS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {MAX_BATCH_BILLS} bills can be fetched at once'
+        }), 400
+    
+    bills = serializer_for(Bill)
+    merchants = serializer_for(Merchant)
+    stores = serializer_for(StoreLocation)
+    items = serializer_for(BillItem)
+    payments = serializer_for(Payment)
+    
+    bill_rows = db.session.execute(
+        db.select(*bills.columns).where(Bill.id.in_(bill_ids), Bill.user_id == user_id, *_caller_bills())
+    ).all()
+    found_ids = [row.id for row in bill_rows]
+    
+    merchants_by_id = {}
+    stores_by_id = {}
+    items_by_bill = {}
+    payments_by_bill = {}
+    
+    if bill_rows:
+        merchant_ids = {row.merchant_id for row in bill_rows}
+        for row in db.session.execute(db.select(*merchants.columns).where(Merchant.id.in_(merchant_ids))):
+            merchants_by_id[row.id] = merchants.from_row(row)
+        
+        store_ids = {row.store_id for row in bill_rows if row.store_id is not None}
+        if store_ids:
+            for row in db.session.execute(db.select(*stores.columns).where(StoreLocation.id.in_(store_ids))):
+                stores_by_id[row.id] = stores.from_row(row)
+        
+        for row in db.session.execute(
+            db.select(*items.columns).where(BillItem.bill_id.in_(found_ids)).order_by(BillItem.id)
+        ):
+            items_by_bill.setdefault(row.bill_id, []).append(row)
+        
+        for row in db.session.execute(
+            db.select(*payments.columns).where(Payment.bill_id.in_(found_ids)).order_by(Payment.id)
+        ):
+            payments_by_bill.setdefault(row.bill_id, []).append(row)
+    
+    # Assemble in the requested order
+    rows_by_id = {row.id: row for row in bill_rows}
+    result = [
+        _bill_detail(
+            rows_by_id[bill_id],
+            merchants_by_id.get(rows_by_id[bill_id].merchant_id),
+            stores_by_id.get(rows_by_id[bill_id].store_id),
+            items_by_bill.get(bill_id, []),
+            payments_by_bill.get(bill_id, [])
+        )
+        for bill_id in bill_ids if bill_id in rows_by_id
+    ]
     
     return jsonify({
         'success': True,
-        'bill': result
+        'count': len(result),
+        'bills': result,
+        'not_found': [bill_id for bill_id in bill_ids if bill_id not in rows_by_id]
     }), 200
 
 @bill_bp.route('/', methods=['POST'])
+@idempotent
 def create_bill():
     """
     Create a new bill.
@@ -147,8 +312,16 @@ def create_bill():
                 "discount_amount": 0.00
             }
         ],
-        "notes": "Optional notes"
+        "notes": "Optional notes",
+        "oversell_policy": "skip"  // Optional: 'reject', 'skip' or 'allow'
     }
+    
+    Stock for every line with a product_id is taken from the store's inventory
+    in one batched UPDATE. With the 'reject' policy the bill is not created if
+    any line is short; otherwise short lines are reported in 'stock.failed'.
+    
+    Send an Idempotency-Key header to make retries safe: a retry with the same
+    key and body gets the first response back instead of a second bill.
     """
     data = request.json
     
@@ -176,6 +349,21 @@ def create_bill():
                     'success': False,
                     'message': f'Missing required field in item: {field}'
                 }), 400
+        
+        # A zero or negative line would put stock back instead of taking it
+        quantity = item['quantity']
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            return jsonify({
+                'success': False,
+                'message': 'Item quantity must be a whole number of at least 1'
+            }), 400
+    
+    oversell_policy = data.get('oversell_policy', InventoryService.DEFAULT_OVERSELL_POLICY)
+    if oversell_policy not in OVERSELL_POLICIES:
+        return jsonify({
+            'success': False,
+            'message': f"oversell_policy must be one of: {', '.join(OVERSELL_POLICIES)}"
+        }), 400
     
     # Generate bill number
     bill_number = f"BILL-{datetime.utcnow().strftime('%Y%m%d')}-{secrets.randbelow(10000):04d}"
@@ -235,6 +423,29 @@ def create_bill():
         )
         db.session.add(item)
     
+    # Take stock for all lines in one statement
+    stock_result = InventoryService.decrement_for_bill(
+        db.session,
+        bill.merchant_id,
+        bill.store_id,
+        data['items'],
+        policy=oversell_policy
+    )
+    
+    if not stock_result['ok']:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Insufficient stock for one or more items',
+            'stock': stock_result
+        }), 409
+    
+    # Add the bill to the customer's ledger in the same transaction
+    LedgerService.record_change(
+        db.session, bill.merchant_id, bill.user_id,
+        after=(bill.status, bill.total_amount, 0)
+    )
+    
     # Commit transaction
     db.session.commit()
     
@@ -242,10 +453,12 @@ def create_bill():
         'success': True,
         'message': 'Bill created successfully',
         'bill_id': bill.id,
-        'bill_number': bill.bill_number
+        'bill_number': bill.bill_number,
+        'stock': stock_result
     }), 201
 
 @bill_bp.route('/<int:bill_id>/payment', methods=['POST'])
+@idempotent
 def record_payment(bill_id):
     """
     Record a payment for a bill.
@@ -259,6 +472,9 @@ def record_payment(bill_id):
         "notes": "Optional notes",
         "updated_by": 123  // User or merchant ID
     }
+    
+    Honours an Idempotency-Key header like create_bill, so a retried payment
+    is recorded once. Bills of other merchants are answered with 404.
     """
     data = request.json
     
@@ -271,8 +487,8 @@ def record_payment(bill_id):
                 'message': f'Missing required field: {field}'
             }), 400
     
-    # Get bill
-    bill = Bill.query.get(bill_id)
+    # Lock the bill so concurrent payments read its status and paid amount one at a time
+    bill = Bill.query.filter(Bill.id == bill_id, *_caller_bills()).populate_existing().with_for_update().first()
     
     if not bill:
         return jsonify({
@@ -280,6 +496,10 @@ def record_payment(bill_id):
             'message': f'Bill with ID {bill_id} not found'
         }), 404
     
+    # Completed payments so far, summed before the new one is added to the session
+    paid_before = LedgerService.paid_amount(db.session, bill_id)
+    previous_status = bill.status
+    
     # Create payment
     payment = Payment(
         bill_id=bill_id,
@@ -295,8 +515,7 @@ def record_payment(bill_id):
     db.session.add(payment)
     
     # Update bill status
-    payments = Payment.query.filter_by(bill_id=bill_id).all()
-    total_paid = sum(p.amount for p in payments) + payment.amount
+    total_paid = paid_before + Decimal(str(payment.amount))
     
     if total_paid >= bill.total_amount:
         bill.status = 'paid'
@@ -305,6 +524,12 @@ def record_payment(bill_id):
     
     bill.updated_at = datetime.utcnow()
     
+    LedgerService.record_change(
+        db.session, bill.merchant_id, bill.user_id,
+        before=(previous_status, bill.total_amount, paid_before),
+        after=(bill.status, bill.total_amount, total_paid)
+    )
+    
     # Commit transaction
     db.session.commit()
     
@@ -0,0 +1,60 @@
+from flask import Blueprint, request, jsonify
+from src.models.product import ProductCategory
+from src.models.category_service import CategoryService
+
+category_bp = Blueprint('category', __name__)
+
+@category_bp.route('/<int:category_id>/products', methods=['GET'])
+def get_category_products(category_id):
+    """
+    Get all products under a category, including its subcategories.
+    
+    Query parameters:
+    - limit: Maximum number of products (optional, default 50, max 200)
+    - offset: Number of products to skip (optional)
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 200))
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'limit and offset must be integers'
+        }), 400
+    
+    category = ProductCategory.query.get(category_id)
+    
+    if not category:
+        return jsonify({
+            'success': False,
+            'message': f'Category with ID {category_id} not found'
+        }), 404
+    
+    products, total = CategoryService.subtree_products(category_id, limit=limit, offset=offset)
+    
+    return jsonify({
+        'success': True,
+        'category': category.to_dict(),
+        'total': total,
+        'count': len(products),
+        'products': [product.to_dict() for product in products]
+    }), 200
+
+@category_bp.route('/<int:category_id>/facets', methods=['GET'])
+def get_category_facets(category_id):
+    """
+    Get product counts for each direct subcategory of a category.
+    """
+    category = ProductCategory.query.get(category_id)
+    
+    if not category:
+        return jsonify({
+            'success': False,
+            'message': f'Category with ID {category_id} not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'category': category.to_dict(),
+        'facets': CategoryService.facet_counts(category_id)
+    }), 200
@@ -0,0 +1,98 @@
+from flask import Blueprint, request, jsonify
+from src.models.scan_service import ScanService
+from src.models.import_service import InventoryImportService, IMPORT_FORMATS
+import io
+
+inventory_bp = Blueprint('inventory', __name__)
+
+@inventory_bp.route('/scan', methods=['POST'])
+def scan_items():
+    """
+    Look up scanned barcodes or SKUs with the store's price and stock.
+    
+    Request body:
+    {
+        "merchant_id": 123,
+        "store_id": 456,
+        "codes": ["8901234567890", "SKU-001"]
+    }
+    """
+    data = request.json
+    
+    if not data or 'merchant_id' not in data or 'codes' not in data:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required fields: merchant_id, codes'
+        }), 400
+    
+    codes = data['codes']
+    
+    if not isinstance(codes, list) or not codes:
+        return jsonify({
+            'success': False,
+            'message': 'codes must be a non-empty list'
+        }), 400
+    
+    if len(codes) > ScanService.MAX_BATCH:
+        return jsonify({
+            'success': False,
+            'message': f'At most {ScanService.MAX_BATCH} codes can be scanned per request'
+        }), 400
+    
+    # Prices and stock are keyed by integer ids, so '7' and 7 must be the same store
+    try:
+        merchant_id = int(data['merchant_id'])
+        store_id = int(data['store_id']) if data.get('store_id') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'merchant_id and store_id must be integers'
+        }), 400
+
+    results = ScanService.scan(merchant_id, store_id, codes)
+    
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'items': results
+    }), 200
+
+@inventory_bp.route('/import', methods=['POST'])
+def import_inventory():
+    """
+    Bulk upsert a merchant's inventory from a CSV or NDJSON upload.
+    
+    The request body is the file itself and is read as a stream.
+    
+    Query parameters:
+    - merchant_id: ID of the merchant
+    - format: 'csv' or 'ndjson' (optional, guessed from Content-Type)
+    
+    Each record needs product_id, sku or barcode, plus price; store_id,
+    stock_quantity and is_available are optional.
+    """
+    merchant_id = request.args.get('merchant_id', type=int)
+    fmt = request.args.get('format')
+    
+    if not merchant_id:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: merchant_id'
+        }), 400
+    
+    if not fmt:
+        fmt = 'ndjson' if 'json' in (request.content_type or '') else 'csv'
+    
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': f"format must be one of: {', '.join(IMPORT_FORMATS)}"
+        }), 400
+    
+    stream = io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8-sig', newline='')
+    report = InventoryImportService.import_stream(merchant_id, stream, fmt)
+    
+    return jsonify({
+        'success': report['failed'] == 0,
+        **report
+    }), 200
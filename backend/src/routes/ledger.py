@@ -0,0 +1,175 @@
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func
+from src.models.ledger import CustomerLedger
+from src.models.ledger_service import COUNTER_COLUMNS
+from src.models.merchant import Merchant
+from src.models.user import User
+from src.extensions import db
+from src.serialization import FieldSet, parse_format
+
+ledger_bp = Blueprint('ledger', __name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+MAX_TOP_DEBTORS = 100
+
+# Fields the ledger list can return: every serialized ledger column plus the joined names
+LEDGER_FIELDS = FieldSet(CustomerLedger, {
+    'merchant_name': Merchant.business_name,
+    'username': User.username
+})
+
+def _int_arg(name, default=None, maximum=None):
+    """Read a non-negative integer query parameter; raises ValueError with a message for the client."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if number < 0:
+        raise ValueError(f'{name} must not be negative')
+    return min(number, maximum) if maximum is not None else number
+
+@ledger_bp.route('/', methods=['GET'])
+def get_ledger():
+    """
+    Get customer ledger rows with their balances and bill counts by status.
+
+    Query parameters:
+    - merchant_id: A merchant's customers (Customer Management)
+    - user_id: A user's balances with each merchant (bill overview)
+      At least one of merchant_id and user_id is required.
+    - fields: Comma-separated fields to return (optional, defaults to all),
+      e.g. user_id,username,balance,overdue_count
+    - format: 'objects' (default) or 'columnar'
+    - limit: Rows to return, highest balance first (default 100, at most 500)
+    - offset: Rows to skip (optional)
+
+    'totals' sums every matching row, not just the returned page.
+    """
+    try:
+        merchant_id = _int_arg('merchant_id')
+        user_id = _int_arg('user_id')
+        limit = _int_arg('limit', DEFAULT_LIMIT, MAX_LIMIT)
+        offset = _int_arg('offset', 0)
+        ledger = LEDGER_FIELDS.project(request.args.get('fields'))
+        response_format = parse_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    if merchant_id is None and user_id is None:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: merchant_id or user_id'
+        }), 400
+
+    conditions = []
+    if merchant_id is not None:
+        conditions.append(CustomerLedger.merchant_id == merchant_id)
+    if user_id is not None:
+        conditions.append(CustomerLedger.user_id == user_id)
+
+    query = db.select(*ledger.columns).select_from(CustomerLedger).where(*conditions)
+    if 'merchant_name' in ledger.fields:
+        query = query.outerjoin(Merchant, Merchant.id == CustomerLedger.merchant_id)
+    if 'username' in ledger.fields:
+        query = query.outerjoin(User, User.id == CustomerLedger.user_id)
+
+    rows = db.session.execute(
+        query.order_by(CustomerLedger.balance.desc(), CustomerLedger.id).limit(limit).offset(offset)
+    )
+
+    totals_row = db.session.execute(
+        db.select(
+            func.count().label('customers'),
+            *[func.coalesce(func.sum(getattr(CustomerLedger, column)), 0).label(column) for column in COUNTER_COLUMNS]
+        ).where(*conditions)
+    ).one()
+    totals = {
+        column: float(value) if column.endswith(('amount', 'balance')) else int(value)
+        for column, value in totals_row._mapping.items()
+    }
+
+    if response_format == 'columnar':
+        result = [ledger.values(row) for row in rows]
+        return jsonify({
+            'success': True,
+            'count': len(result),
+            'totals': totals,
+            'fields': list(ledger.fields),
+            'rows': result
+        }), 200
+
+    result = ledger.many(rows)
+    return jsonify({
+        'success': True,
+        'count': len(result),
+        'totals': totals,
+        'ledger': result
+    }), 200
+
+@ledger_bp.route('/top-debtors', methods=['GET'])
+def get_top_debtors():
+    """
+    Get a merchant's customers with the highest outstanding balances.
+
+    Query parameters:
+    - merchant_id: ID of the merchant
+    - limit: Number of customers (default 10, at most 100)
+    """
+    try:
+        merchant_id = _int_arg('merchant_id')
+        limit = _int_arg('limit', 10, MAX_TOP_DEBTORS)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+
+    if merchant_id is None:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: merchant_id'
+        }), 400
+
+    rows = db.session.execute(
+        db.select(
+            CustomerLedger.user_id,
+            User.username,
+            User.first_name,
+            User.last_name,
+            User.phone_number,
+            CustomerLedger.balance,
+            CustomerLedger.overdue_count,
+            CustomerLedger.bill_count
+        ).join(
+            User, User.id == CustomerLedger.user_id
+        ).where(
+            CustomerLedger.merchant_id == merchant_id,
+            CustomerLedger.balance > 0
+        ).order_by(CustomerLedger.balance.desc()).limit(limit)
+    )
+
+    debtors = [
+        {
+            'user_id': row.user_id,
+            'username': row.username,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'phone_number': row.phone_number,
+            'balance': float(row.balance),
+            'overdue_count': row.overdue_count,
+            'bill_count': row.bill_count
+        }
+        for row in rows
+    ]
+    return jsonify({
+        'success': True,
+        'count': len(debtors),
+        'debtors': debtors
+    }), 200
@@ -0,0 +1,335 @@
+from flask import Blueprint, request, jsonify
+from src.auth import current_principal
+from src.extensions import db
+from src.models.pickup_request import PickupRequest, PickupRequestItem
+from src.models.pickup_service import (
+    PickupQueueService, PickupQueueError, PickupAvailabilityService, ACTIVE_STATUSES, STATUS_TRANSITIONS
+)
+from src.serialization import FieldSet, parse_format, serializer_for
+from datetime import datetime, timedelta
+
+pickup_bp = Blueprint('pickup', __name__)
+
+PICKUP_QUEUE_FIELDS = FieldSet(PickupRequest)
+
+def _caller_merchant_id():
+    """The merchant making the request, or None when authentication is off."""
+    principal = current_principal()
+    return principal.id if principal is not None and principal.kind == 'merchant' else None
+
+@pickup_bp.route('/queue', methods=['GET'])
+def get_queue():
+    """
+    Get the next pickups a store should prepare.
+    
+    Query parameters:
+    - store_id: ID of the store
+    - status: Comma-separated statuses (optional, defaults to pending,accepted,ready)
+    - limit: Maximum number of pickups (optional, default 20, max 100)
+    - include_items: Also return the items of each pickup (optional)
+    - fields: Comma-separated pickup fields to return (optional, defaults to all)
+    - format: 'objects' (default) or 'columnar', which returns the field names
+      once in 'fields' and one value list per pickup in 'rows' (with the items
+      as a trailing 'items' value when requested)
+    """
+    store_id = request.args.get('store_id', type=int)
+    statuses = request.args.get('status')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    include_items = request.args.get('include_items', '').lower() in ('1', 'true', 'yes')
+    
+    if not store_id:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: store_id'
+        }), 400
+    
+    statuses = tuple(statuses.split(',')) if statuses else ACTIVE_STATUSES
+    unknown = [status for status in statuses if status not in STATUS_TRANSITIONS]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'message': f"Unknown status: {', '.join(unknown)}"
+        }), 400
+    
+    try:
+        pickup_fields = PICKUP_QUEUE_FIELDS.project(request.args.get('fields'))
+        response_format = parse_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    pickups = PickupQueueService.queue(
+        store_id, statuses=statuses, limit=limit, columns=pickup_fields.columns, merchant_id=_caller_merchant_id()
+    )
+    
+    items_by_request = {}
+    if include_items and pickups:
+        items = serializer_for(PickupRequestItem)
+        for row in db.session.execute(
+            db.select(*items.columns).where(
+                PickupRequestItem.pickup_request_id.in_([pickup.id for pickup in pickups])
+            )
+        ):
+            items_by_request.setdefault(row.pickup_request_id, []).append(items.from_row(row))
+    
+    if response_format == 'columnar':
+        fields = list(pickup_fields.fields)
+        result = []
+        for pickup in pickups:
+            values = pickup_fields.values_from_object(pickup)
+            if include_items:
+                values.append(items_by_request.get(pickup.id, []))
+            result.append(values)
+        return jsonify({
+            'success': True,
+            'count': len(result),
+            'fields': fields + ['items'] if include_items else fields,
+            'rows': result
+        }), 200
+    
+    result = []
+    for pickup in pickups:
+        pickup_data = pickup_fields.from_object(pickup)
+        if include_items:
+            pickup_data['items'] = items_by_request.get(pickup.id, [])
+        result.append(pickup_data)
+    
+    return jsonify({
+        'success': True,
+        'count': len(result),
+        'pickups': result
+    }), 200
+
+@pickup_bp.route('/slots', methods=['GET'])
+def get_slots():
+    """
+    Get open pickup slots with remaining capacity for a store.
+    
+    Query parameters:
+    - store_id: ID of the store
+    - from: Start time in ISO format (optional, defaults to now)
+    - hours: How far ahead to look (optional, default 24, max 168)
+    """
+    store_id = request.args.get('store_id', type=int)
+    hours = min(request.args.get('hours', 24, type=int), 168)
+    
+    if not store_id:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: store_id'
+        }), 400
+    
+    try:
+        start = datetime.fromisoformat(request.args['from']) if 'from' in request.args else datetime.now()
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid from format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
+        }), 400
+    
+    slots = PickupQueueService.available_slots(store_id, start, start + timedelta(hours=hours))
+    
+    return jsonify({
+        'success': True,
+        'slots': [{'start': slot['start'].isoformat(), 'remaining': slot['remaining']} for slot in slots]
+    }), 200
+
+@pickup_bp.route('/', methods=['POST'])
+def create_pickup_request():
+    """
+    Create a pickup request in the first free slot at or after the requested time.
+    
+    Request body:
+    {
+        "user_id": 789,
+        "merchant_id": 123,
+        "store_id": 456,
+        "requested_pickup_time": "2025-06-03T17:00:00",
+        "items": [
+            {"product_id": 1, "quantity": 2},
+            {"custom_item_name": "Fresh coriander", "quantity": 1}
+        ],
+        "notes": "Optional notes"
+    }
+    """
+    data = request.json
+    
+    required_fields = ['user_id', 'merchant_id', 'store_id', 'items']
+    for field in required_fields:
+        if not data or field not in data:
+            return jsonify({
+                'success': False,
+                'message': f'Missing required field: {field}'
+            }), 400
+    
+    if not data['items'] or not isinstance(data['items'], list):
+        return jsonify({
+            'success': False,
+            'message': 'Items must be a non-empty list'
+        }), 400
+    
+    try:
+        requested_time = datetime.fromisoformat(data['requested_pickup_time']) if data.get('requested_pickup_time') else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid requested_pickup_time format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
+        }), 400
+    
+    try:
+        pickup_request = PickupQueueService.create_request(
+            data['user_id'],
+            data['merchant_id'],
+            data['store_id'],
+            requested_time,
+            data['items'],
+            notes=data.get('notes')
+        )
+    except PickupQueueError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 409
+    
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Pickup request created successfully',
+        'pickup_request_id': pickup_request.id,
+        'requested_pickup_time': pickup_request.requested_pickup_time.isoformat()
+    }), 201
+
+@pickup_bp.route('/<int:pickup_request_id>/status', methods=['POST'])
+def update_pickup_status(pickup_request_id):
+    """
+    Move a pickup request along the queue and notify the user.
+    
+    Request body:
+    {
+        "status": "accepted"  // 'accepted', 'ready', 'completed' or 'cancelled'
+    }
+    """
+    data = request.json
+    
+    if not data or 'status' not in data:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required field: status'
+        }), 400
+    
+    pickup_request = PickupRequest.query.get(pickup_request_id)
+    merchant_id = _caller_merchant_id()
+    
+    if not pickup_request or (merchant_id is not None and pickup_request.merchant_id != merchant_id):
+        return jsonify({
+            'success': False,
+            'message': f'Pickup request with ID {pickup_request_id} not found'
+        }), 404
+    
+    try:
+        notification = PickupQueueService.transition(pickup_request, data['status'])
+    except PickupQueueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 409
+    
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Pickup request updated successfully',
+        'status': pickup_request.status,
+        'notification_id': notification.id
+    }), 200
+
+@pickup_bp.route('/availability', methods=['POST'])
+def check_availability():
+    """
+    Check the items of one or many pickup requests against store inventory.
+    
+    Request body:
+    {
+        "pickup_request_ids": [1, 2, 3],
+        "reserve": false,  // Optional: take the stock for available items
+        "accept": false    // Optional: reserve, then accept pending requests whose items are all available
+    }
+    
+    Every check marks the items available or unavailable; only reserve (or
+    accept) takes stock, which goes back if the request is cancelled.
+    Requests that do not exist or belong to another merchant are listed in
+    'not_found' and left alone.
+    """
+    data = request.json
+    
+    if not data or not isinstance(data.get('pickup_request_ids'), list) or not data['pickup_request_ids']:
+        return jsonify({
+            'success': False,
+            'message': 'pickup_request_ids must be a non-empty list'
+        }), 400
+    
+    try:
+        pickup_request_ids = list(dict.fromkeys(int(pickup_request_id) for pickup_request_id in data['pickup_request_ids']))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'pickup_request_ids must be integers'
+        }), 400
+    
+    if len(pickup_request_ids) > PickupAvailabilityService.MAX_REQUESTS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {PickupAvailabilityService.MAX_REQUESTS} pickup requests can be checked at once'
+        }), 400
+    
+    merchant_id = _caller_merchant_id()
+    if merchant_id is not None:
+        owned = set(db.session.execute(
+            db.select(PickupRequest.id).where(
+                PickupRequest.id.in_(pickup_request_ids),
+                PickupRequest.merchant_id == merchant_id
+            )
+        ).scalars())
+    else:
+        owned = set(pickup_request_ids)
+    not_found = [pickup_request_id for pickup_request_id in pickup_request_ids if pickup_request_id not in owned]
+    pickup_request_ids = [pickup_request_id for pickup_request_id in pickup_request_ids if pickup_request_id in owned]
+    
+    accept = bool(data.get('accept'))
+    availability = PickupAvailabilityService.evaluate(pickup_request_ids, reserve=accept or bool(data.get('reserve')))
+    
+    accepted = []
+    if accept:
+        candidates = [
+            pickup_request_id for pickup_request_id, items in availability.items()
+            if items['available'] and not items['unavailable']
+        ]
+        # Custom items stay pending for the merchant, so their requests are not accepted here
+        not_ready = set(db.session.execute(
+            db.select(PickupRequestItem.pickup_request_id).where(
+                PickupRequestItem.pickup_request_id.in_(candidates),
+                PickupRequestItem.status != 'available'
+            ).distinct()
+        ).scalars())
+        for pickup_request in PickupRequest.query.filter(
+            PickupRequest.id.in_([pickup_request_id for pickup_request_id in candidates if pickup_request_id not in not_ready]),
+            PickupRequest.status == 'pending'
+        ).with_for_update():
+            PickupQueueService.transition(pickup_request, 'accepted')
+            accepted.append(pickup_request.id)
+    
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'pickup_requests': [
+            {'pickup_request_id': pickup_request_id, **items}
+            for pickup_request_id, items in availability.items()
+        ],
+        'accepted': accepted,
+        'not_found': not_found
+    }), 200
@@ -0,0 +1,83 @@
+from flask import Blueprint, request, jsonify
+from src.models.search_service import SearchService, SEARCH_INDEXES
+
+search_bp = Blueprint('search', __name__)
+
+def _parse_limit(default):
+    try:
+        return int(request.args.get('limit', default))
+    except ValueError:
+        return None
+
+@search_bp.route('/<index>', methods=['GET'])
+def search(index):
+    """
+    Ranked full-text search over products or merchants.
+    
+    Query parameters:
+    - q: Search text
+    - limit: Maximum number of results (optional, default 20)
+    """
+    if index not in SEARCH_INDEXES:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown search index: {index}'
+        }), 404
+    
+    query = request.args.get('q', '').strip()
+    limit = _parse_limit(20)
+    
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: q'
+        }), 400
+    
+    if limit is None:
+        return jsonify({
+            'success': False,
+            'message': 'limit must be an integer'
+        }), 400
+    
+    results = SearchService.search(index, query, limit=limit)
+    
+    # Match the float formatting used by the models' to_dict
+    for result in results:
+        if result.get('base_price') is not None:
+            result['base_price'] = float(result['base_price'])
+    
+    return jsonify({
+        'success': True,
+        'count': len(results),
+        'results': results
+    }), 200
+
+@search_bp.route('/<index>/autocomplete', methods=['GET'])
+def autocomplete(index):
+    """
+    Prefix suggestions for a search box.
+    
+    Query parameters:
+    - q: Text typed so far
+    - limit: Maximum number of suggestions (optional, default 10)
+    """
+    if index not in SEARCH_INDEXES:
+        return jsonify({
+            'success': False,
+            'message': f'Unknown search index: {index}'
+        }), 404
+    
+    limit = _parse_limit(10)
+    
+    if limit is None:
+        return jsonify({
+            'success': False,
+            'message': 'limit must be an integer'
+        }), 400
+    
+    suggestions = SearchService.autocomplete(index, request.args.get('q', ''), limit=limit)
+    
+    return jsonify({
+        'success': True,
+        'suggestions': suggestions
+    }), 200
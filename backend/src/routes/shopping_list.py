@@ -0,0 +1,90 @@
+from flask import Blueprint, request, jsonify
+from src.models.shopping_list_sync import ShoppingListSyncService
+
+shopping_list_bp = Blueprint('shopping_list', __name__)
+
+@shopping_list_bp.route('/sync', methods=['GET'])
+def get_changes():
+    """
+    Get shopping list changes since a sync cursor.
+    
+    Query parameters:
+    - user_id: ID of the user
+    - cursor: Cursor returned by the previous sync (optional, omit for a full sync)
+    """
+    user_id = request.args.get('user_id', type=int)
+    
+    if not user_id:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: user_id'
+        }), 400
+    
+    try:
+        cursor = ShoppingListSyncService.decode_cursor(request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        **ShoppingListSyncService.changes_since(user_id, cursor)
+    }), 200
+
+@shopping_list_bp.route('/sync', methods=['POST'])
+def sync():
+    """
+    Apply a batch of client mutations and return changes since the cursor.
+    
+    Request body:
+    {
+        "user_id": 123,
+        "cursor": "opaque cursor from the last sync",
+        "mutations": [
+            {"op": "upsert", "type": "list", "client_id": "tmp-1", "data": {"name": "Groceries"}},
+            {"op": "upsert", "type": "item", "list_client_id": "tmp-1", "data": {"custom_item_name": "Milk", "quantity": 2}},
+            {"op": "upsert", "type": "item", "id": 42, "base_updated_at": "2025-06-03T12:00:00", "data": {"is_purchased": true}},
+            {"op": "upsert", "type": "share", "list_id": 7, "data": {"shared_with": 456, "access_level": "edit"}},
+            {"op": "delete", "type": "item", "id": 43}
+        ]
+    }
+    """
+    data = request.json
+    
+    if not data or 'user_id' not in data:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required field: user_id'
+        }), 400
+    
+    mutations = data.get('mutations') or []
+    
+    if not isinstance(mutations, list):
+        return jsonify({
+            'success': False,
+            'message': 'mutations must be a list'
+        }), 400
+    
+    if len(mutations) > ShoppingListSyncService.MAX_MUTATIONS:
+        return jsonify({
+            'success': False,
+            'message': f'At most {ShoppingListSyncService.MAX_MUTATIONS} mutations can be sent per sync'
+        }), 400
+    
+    try:
+        cursor = ShoppingListSyncService.decode_cursor(data.get('cursor'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    results = ShoppingListSyncService.apply_mutations(data['user_id'], mutations)
+    
+    return jsonify({
+        'success': True,
+        'results': results,
+        **ShoppingListSyncService.changes_since(data['user_id'], cursor)
+    }), 200
@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify
+from src.auth import current_principal
 from src.models.sms_service import SMSService
 from src.models.bill import Bill
 from src.models.user import User
 from src.models.merchant import Merchant
 from src.models.notification import TemporaryLink
-from flask_sqlalchemy import SQLAlchemy
+from src.extensions import db
 
-db = SQLAlchemy()
 sms_bp = Blueprint('sms', __name__)
 
 @sms_bp.route('/send-bill-notification', methods=['POST'])
@@ -54,6 +54,13 @@ def send_bill_notification():
             'message': 'Bill does not belong to this user'
         }), 403
     
+    principal = current_principal()
+    if principal is not None and bill.merchant_id != principal.id:
+        return jsonify({
+            'success': False,
+            'message': 'Bill does not belong to this merchant'
+        }), 403
+    
     # Send notification
     result = SMSService.send_bill_notification(bill, user)
     
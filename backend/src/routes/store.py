@@ -0,0 +1,56 @@
+from flask import Blueprint, request, jsonify
+from src.models.store_hours_service import StoreHoursService
+from datetime import datetime
+
+store_bp = Blueprint('store', __name__)
+
+@store_bp.route('/open', methods=['GET'])
+def get_open_stores():
+    """
+    Filter stores down to those that are open.
+    
+    Query parameters:
+    - store_ids: Comma-separated store IDs
+    - at: Time to check in ISO format (optional, defaults to now)
+    - until: End of the time range the store must stay open for (optional)
+    """
+    store_ids = request.args.get('store_ids')
+    at = request.args.get('at')
+    until = request.args.get('until')
+    
+    if not store_ids:
+        return jsonify({
+            'success': False,
+            'message': 'Missing required parameter: store_ids'
+        }), 400
+    
+    try:
+        store_ids = [int(store_id) for store_id in store_ids.split(',') if store_id]
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'store_ids must be a comma-separated list of integers'
+        }), 400
+    
+    try:
+        start = datetime.fromisoformat(at) if at else datetime.now()
+        end = datetime.fromisoformat(until) if until else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM:SS)'
+        }), 400
+    
+    if end and end <= start:
+        return jsonify({
+            'success': False,
+            'message': 'until must be later than at'
+        }), 400
+    
+    open_store_ids = StoreHoursService.filter_open(store_ids, start, end)
+    
+    return jsonify({
+        'success': True,
+        'count': len(open_store_ids),
+        'store_ids': open_store_ids
+    }), 200
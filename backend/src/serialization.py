@@ -0,0 +1,228 @@
+"""
+Fast serialization of model rows and JSON responses.
+
+``serializer_for(Model)`` compiles a serializer for a model's
+``SERIALIZED_FIELDS`` once: the field names, the columns to select, and an
+encoder for each field that needs one (Numeric to float, dates and times to
+ISO strings). It turns plain column tuples and Row objects, or ORM instances,
+into the same dicts ``to_dict`` used to build attribute by attribute, so list
+endpoints can select just the columns they need and skip the ORM entirely.
+``FieldSet`` projects that down to the fields a client asks for with
+``fields=``, and ``values`` encodes rows for the compact columnar format.
+
+``init_serialization`` installs a JSON provider that encodes responses and
+parses request bodies with orjson when it is installed and falls back to
+Flask's standard-library provider otherwise. Output matches the default
+provider, including its RFC 822 dates and Decimal strings.
+"""
+from flask.json.provider import DefaultJSONProvider
+from operator import attrgetter
+from sqlalchemy import Date, DateTime, Numeric, Time
+import threading
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# 'objects' is a list of dicts; 'columnar' sends the field names once, then one value list per row
+RESPONSE_FORMATS = ('objects', 'columnar')
+
+
+def _to_float(value):
+    return float(value)
+
+
+def _to_iso(value):
+    return value.isoformat()
+
+
+def _encoder(column_type):
+    if isinstance(column_type, Numeric):
+        return _to_float
+    if isinstance(column_type, (DateTime, Date, Time)):
+        return _to_iso
+    return None
+
+
+class ModelSerializer:
+    """Precompiled field list and encoders for one model."""
+
+    def __init__(self, model, fields, extra_columns=None):
+        extra_columns = extra_columns or {}
+        table_columns = model.__table__.c
+        self.model = model
+        self.fields = tuple(fields)
+        self.columns = [
+            extra_columns[name] if name in extra_columns else getattr(model, name) for name in self.fields
+        ]
+        self.encoded = tuple(
+            (name, index, encoder) for index, (name, encoder) in enumerate(
+                (name, _encoder(extra_columns[name].type if name in extra_columns else table_columns[name].type))
+                for name in self.fields
+            )
+            if encoder is not None
+        )
+        getter = attrgetter(*self.fields)
+        self._values = getter if len(self.fields) > 1 else (lambda instance: (getter(instance),))
+
+    def from_row(self, row):
+        """
+        Serialize a tuple or Row whose leading values are this serializer's fields, in order.
+
+        Extra trailing values (e.g. joined columns) are ignored.
+        """
+        data = dict(zip(self.fields, row))
+        for name, _, encode in self.encoded:
+            value = data[name]
+            if value is not None:
+                data[name] = encode(value)
+        return data
+
+    def from_object(self, instance):
+        """Serialize an ORM instance."""
+        return self.from_row(self._values(instance))
+
+    def many(self, rows):
+        """Serialize an iterable of tuples or Rows."""
+        from_row = self.from_row
+        return [from_row(row) for row in rows]
+
+    def values(self, row):
+        """Encode a tuple or Row to a list of values in field order, for the columnar format."""
+        values = list(row[:len(self.fields)])
+        for _, index, encode in self.encoded:
+            value = values[index]
+            if value is not None:
+                values[index] = encode(value)
+        return values
+
+    def values_from_object(self, instance):
+        """Encode an ORM instance to a list of values in field order."""
+        return self.values(self._values(instance))
+
+
+class FieldSet:
+    """
+    Fields a list endpoint can return: a model's SERIALIZED_FIELDS plus named extra columns.
+
+    ``project`` turns a ``fields=`` parameter into a serializer for just those
+    fields, whose ``columns`` are what the endpoint should select. Projections
+    are compiled once per distinct field list.
+    """
+
+    MAX_PROJECTIONS = 256
+
+    def __init__(self, model, extra_columns=None):
+        self.model = model
+        self.extra_columns = extra_columns or {}
+        self._projections = {}
+
+    @property
+    def names(self):
+        return tuple(self.model.SERIALIZED_FIELDS) + tuple(self.extra_columns)
+
+    def project(self, fields=None):
+        """
+        Get the serializer for a comma-separated field list, or all fields when empty.
+
+        Raises:
+            ValueError: If a field is not one of this set's names
+        """
+        requested = tuple(dict.fromkeys(name.strip() for name in (fields or '').split(',') if name.strip()))
+        requested = requested or self.names
+
+        serializer = self._projections.get(requested)
+        if serializer is None:
+            unknown = [name for name in requested if name not in self.names]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.names)}")
+            serializer = ModelSerializer(self.model, requested, self.extra_columns)
+            if len(self._projections) < self.MAX_PROJECTIONS:
+                self._projections[requested] = serializer
+        return serializer
+
+
+_serializers = {}
+_serializers_lock = threading.Lock()
+
+
+def serializer_for(model):
+    """
+    Get the compiled serializer for a model with SERIALIZED_FIELDS.
+
+    Compiled on first use, after the mappers are configured, and shared afterwards.
+    """
+    serializer = _serializers.get(model)
+    if serializer is None:
+        with _serializers_lock:
+            serializer = _serializers.get(model)
+            if serializer is None:
+                serializer = _serializers[model] = ModelSerializer(model, model.SERIALIZED_FIELDS)
+    return serializer
+
+
+def parse_format(value):
+    """
+    Check a ``format=`` parameter.
+
+    Raises:
+        ValueError: If it is not one of RESPONSE_FORMATS
+    """
+    value = value or 'objects'
+    if value not in RESPONSE_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(RESPONSE_FORMATS)}")
+    return value
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson when it is installed.
+
+    Types orjson does not handle the way Flask does (datetimes, Decimal, and
+    anything else unknown) go through the default provider's ``default``, so
+    responses are unchanged. Calls with json.dumps keyword arguments, and
+    values orjson rejects such as integers beyond 64 bits, use the standard
+    library path.
+    """
+
+    def _options(self, pretty=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, pretty=False):
+        """Encode to bytes with orjson, or return None to use the standard library."""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        encoded = self._encode(self._prepare_response_obj(args, kwargs), pretty)
+        if encoded is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
+
+
+def init_serialization(app):
+    """Use the fast JSON provider for an app's jsonify, request.json and friends."""
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,311 @@
+"""
+Production launcher: a pre-forking HTTP server for the app.
+
+The master process builds the app once (``create_app``), binds the listening
+socket and forks the workers, so the imported code and app state are shared
+copy-on-write. Each worker re-initialises its database engines after the fork
+and serves requests from a fixed pool of threads; a worker only accepts a new
+connection when one of its threads is free, which leaves the connection to an
+idle worker. Workers that die are replaced.
+
+Signals to the master:
+    TERM / INT  stop: workers finish in-flight requests (up to GRACEFUL_TIMEOUT)
+    HUP         graceful restart: replace the workers one at a time
+    TTIN / TTOU add / remove a worker
+
+Settings (command-line options override the environment):
+    BIND              host:port to listen on (default 0.0.0.0:8080)
+    WEB_CONCURRENCY   worker processes (default: one per CPU)
+    SERVER_THREADS    request threads per worker (default 4)
+    GRACEFUL_TIMEOUT  seconds a stopping worker may take (default 30)
+    KEEPALIVE         seconds an idle keep-alive connection is held (default 5)
+    SERVER_ACCESS_LOG set to 1 to log every request
+
+Usage:
+    python -m src.serve [--bind 0.0.0.0:8080] [--workers 8] [--threads 4]
+
+On platforms without fork the app is served by a single process.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import configure_mappers
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is restarted after a pause
+MIN_WORKER_LIFETIME = 1.0
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug WSGI server that handles connections on a fixed-size thread pool."""
+
+    multithread = True
+
+    def __init__(self, app, sock, threads, keepalive):
+        handler = type('PooledRequestHandler', (WSGIRequestHandler,), {
+            'protocol_version': 'HTTP/1.1',
+            'timeout': keepalive,
+        })
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=handler, fd=sock.fileno())
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+    def verify_request(self, request, client_address):
+        # Called right after accept; wait for a free thread before taking more connections
+        self._slots.acquire()
+        return True
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self):
+        """Wait for in-flight requests after serve_forever has returned."""
+        self._pool.shutdown(wait=True)
+
+
+def reinit_after_fork(app):
+    """
+    Give a forked worker its own database connections.
+
+    Pooled connections inherited from the master are dropped without being
+    closed, so the master's sockets are left alone.
+    """
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose(close=False)
+
+
+def _listen(bind):
+    host, _, port = bind.rpartition(':')
+    host = host.strip('[]') or '0.0.0.0'
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, int(port)))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """Master process: forks, watches and restarts the workers."""
+
+    def __init__(self, app, bind, workers, threads, graceful_timeout, keepalive):
+        self.app = app
+        self.bind = bind
+        self.worker_count = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.keepalive = keepalive
+        self.workers = {}  # {pid: started_at}
+        self.retiring = set()
+        self.signals = []
+        self.stopping = False
+
+    def _signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def run(self):
+        self.socket = _listen(self.bind)
+
+        # Configure the mappers once here rather than on each worker's first request
+        started = time.perf_counter()
+        configure_mappers()
+        boot = self.app.extensions.get('boot')
+        if boot is not None:
+            boot.add('configure_mappers', time.perf_counter() - started)
+            logger.info('App ready in %.0f ms (%s)', boot.total * 1000, ', '.join(
+                f'{name} {seconds * 1000:.0f} ms'
+                for name, seconds in sorted(boot.phases, key=lambda phase: phase[1], reverse=True)[:3]
+            ))
+
+        # Nothing the workers inherit should hold a connection; keep the preloaded
+        # objects out of the collector so refcount-only pages stay shared
+        with self.app.app_context():
+            for engine in self.app.extensions['sqlalchemy'].engines.values():
+                engine.dispose()
+        gc.collect()
+        gc.freeze()
+
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(signum, self._signal)
+
+        logger.info('Listening on %s with %d workers x %d threads (master %d)',
+                    self.bind, self.worker_count, self.threads, os.getpid())
+        while len(self.workers) < self.worker_count:
+            self.spawn()
+
+        while not self.stopping:
+            self.reap()
+            while self.signals:
+                self.handle(self.signals.pop(0))
+            if not self.stopping:
+                while len(self.workers) < self.worker_count:
+                    self.spawn()
+                time.sleep(0.2)
+
+        self.stop()
+
+    def handle(self, signum):
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        elif signum == signal.SIGHUP:
+            self.restart()
+        elif signum == signal.SIGTTIN:
+            self.worker_count += 1
+        elif signum == signal.SIGTTOU and self.worker_count > 1:
+            self.worker_count -= 1
+            self.retire(min(self.workers, key=self.workers.get))
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+
+        # Worker process
+        try:
+            for signum in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                signal.signal(signum, signal.SIG_IGN)
+            self.serve_worker()
+        except Exception:
+            logger.exception('Worker %d failed', os.getpid())
+            os._exit(1)
+        os._exit(0)
+
+    def serve_worker(self):
+        reinit_after_fork(self.app)
+        server = PooledWSGIServer(self.app, self.socket, self.threads, self.keepalive)
+
+        def stop(signum, frame):
+            # shutdown() waits for serve_forever, which runs in this thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        server.serve_forever()
+        server.drain()
+
+    def reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if not pid:
+                return
+            started_at = self.workers.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif started_at is not None and not self.stopping:
+                logger.warning('Worker %d exited with status %d', pid, os.waitstatus_to_exitcode(status))
+                if time.monotonic() - started_at < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+
+    def retire(self, pid):
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def wait(self, pids, timeout):
+        """Wait for workers to exit, killing those still running after timeout."""
+        deadline = time.monotonic() + timeout
+        pending = set(pids)
+        while pending:
+            for pid in list(pending):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pending.discard(pid)
+                    self.workers.pop(pid, None)
+                    self.retiring.discard(pid)
+            if pending and time.monotonic() > deadline:
+                for pid in pending:
+                    logger.warning('Worker %d did not stop in %ss, killing it', pid, timeout)
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float('inf')
+            time.sleep(0.05)
+
+    def restart(self):
+        """Replace every worker, starting each replacement before stopping the old one."""
+        for pid in list(self.workers):
+            self.spawn()
+            self.retire(pid)
+            self.wait([pid], self.graceful_timeout)
+
+    def stop(self):
+        pids = list(self.workers)
+        for pid in pids:
+            self.retire(pid)
+        self.wait(pids, self.graceful_timeout)
+        self.socket.close()
+        logger.info('Stopped')
+
+
+def serve(app, bind='0.0.0.0:8080', workers=None, threads=4, graceful_timeout=30, keepalive=5):
+    """
+    Serve an already created app with pre-forked workers.
+
+    Args:
+        app: Flask application, created once in this (master) process
+        bind: host:port to listen on
+        workers: Worker processes, defaults to the number of CPUs
+        threads: Request threads per worker
+        graceful_timeout: Seconds stopping workers get to finish their requests
+        keepalive: Seconds an idle keep-alive connection is kept open
+    """
+    workers = workers or os.cpu_count() or 1
+    if not hasattr(os, 'fork'):
+        logger.warning('fork() is not available, serving from a single process')
+        sock = _listen(bind)
+        PooledWSGIServer(app, sock, threads, keepalive).serve_forever()
+        return
+    Arbiter(app, bind, workers, threads, graceful_timeout, keepalive).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:8080'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '0')) or None)
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('SERVER_THREADS', '4')))
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('GRACEFUL_TIMEOUT', '30')))
+    parser.add_argument('--keepalive', type=float, default=float(os.environ.get('KEEPALIVE', '5')))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    if os.environ.get('SERVER_ACCESS_LOG', '0') != '1':
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    from src.main import create_app
+    serve(create_app(), args.bind, args.workers, args.threads, args.graceful_timeout, args.keepalive)
+
+
+if __name__ == '__main__':
+    main()
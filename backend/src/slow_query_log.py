@@ -0,0 +1,183 @@
+"""
+Slow-query log for the SQLAlchemy engines.
+
+Statements that take longer than SLOW_QUERY_MS are written to a rotating
+JSON-lines file (SLOW_QUERY_LOG_PATH, default ``slow_queries.jsonl`` in the
+instance folder) with the shape of their bound parameters, the endpoint that
+ran them and the innermost application frame that issued them. The first time
+a statement fingerprint is seen slow, its plan is captured with the dialect's
+EXPLAIN on the same connection and logged with it.
+
+Parameter values are never written, only their types.
+"""
+from flask import has_request_context, request
+from sqlalchemy import event
+from collections import Counter
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+    'postgresql': 'EXPLAIN ',
+}
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+MAX_LISTED_PARAMETERS = 20
+
+_PLACEHOLDER_LISTS = re.compile(r'(\?|%s|%\(\w+\)s|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|:\w+))+')
+
+
+def fingerprint(statement):
+    """
+    Fingerprint a statement so that the same query with different IN-list lengths matches.
+
+    Returns:
+        tuple: (normalised statement, short hash)
+    """
+    normalised = _PLACEHOLDER_LISTS.sub('?+', ' '.join(statement.split()))
+    return normalised, hashlib.sha1(normalised.encode()).hexdigest()[:16]
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters by type only."""
+    if executemany:
+        rows = list(parameters)
+        return {'rows': len(rows), 'row': parameter_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if len(parameters) > MAX_LISTED_PARAMETERS:
+            return {'count': len(parameters), 'types': dict(Counter(type(value).__name__ for value in parameters))}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _origin():
+    """Find the innermost application frame on the stack."""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(SRC_DIR) and frame.filename != __file__:
+            return f'{os.path.relpath(frame.filename, os.path.dirname(SRC_DIR))}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class SlowQueryLog:
+    """Times statements on an engine and logs the slow ones."""
+
+    MAX_PLANNED_FINGERPRINTS = 1000
+
+    def __init__(self, path, threshold_ms, max_bytes, backup_count):
+        self.threshold = threshold_ms / 1000.0
+        self._planned = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.logger = logging.getLogger(f'{__name__}.{path}')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def _handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('slow_query_start'):
+            connection.info['slow_query_start'].pop()
+
+    def _first_slow(self, key):
+        with self._lock:
+            if key in self._planned:
+                return False
+            if len(self._planned) >= self.MAX_PLANNED_FINGERPRINTS:
+                self._planned.clear()
+            self._planned.add(key)
+            return True
+
+    @staticmethod
+    def _explain(conn, statement, parameters, executemany):
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+
+        # A raw DBAPI cursor keeps EXPLAIN out of the engine events and the metrics
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            columns = [column[0] for column in cursor.description or ()]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slow_query_start'].pop()
+        if elapsed < self.threshold:
+            return
+
+        normalised, key = fingerprint(statement)
+        entry = {
+            'ts': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 3),
+            'fingerprint': key,
+            'statement': normalised,
+            'parameters': parameter_shape(parameters, executemany),
+            'bind': conn.engine.url.render_as_string(hide_password=True),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'path': f'{request.method} {request.path}' if has_request_context() else None,
+            'origin': _origin(),
+        }
+
+        if self._first_slow((str(conn.engine.url), key)):
+            try:
+                plan = self._explain(conn, statement, parameters, executemany)
+                if plan is not None:
+                    entry['plan'] = plan
+            except Exception as e:
+                entry['plan_error'] = f'{e.__class__.__name__}: {e}'
+
+        self.logger.info(json.dumps(entry, default=str))
+
+
+def init_slow_query_log(app):
+    """
+    Attach the slow-query log to every engine of an app.
+
+    Reads SLOW_QUERY_LOG (set to 0 to disable), SLOW_QUERY_MS (default 500),
+    SLOW_QUERY_LOG_PATH, SLOW_QUERY_LOG_MAX_BYTES (default 10 MB) and
+    SLOW_QUERY_LOG_BACKUPS (default 5).
+
+    Returns:
+        SlowQueryLog: The log, or None when disabled
+    """
+    if os.environ.get('SLOW_QUERY_LOG', '1') == '0':
+        return None
+
+    slow_log = SlowQueryLog(
+        os.environ.get('SLOW_QUERY_LOG_PATH', os.path.join(app.instance_path, 'slow_queries.jsonl')),
+        float(os.environ.get('SLOW_QUERY_MS', '500')),
+        int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '5'))
+    )
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            slow_log.attach(engine)
+    app.extensions['slow_query_log'] = slow_log
+    return slow_log
@@ -0,0 +1,196 @@
+"""403 cases of the ids a token may name (src/auth.py, Authenticator.forbidden)."""
+import pytest
+
+from src.extensions import init_schema
+from src.main import create_app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'auth.db'}")
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough-for-hs256')
+    monkeypatch.setenv('BILL_LINK_SECRET_KEY', 'test-bill-link-key-that-is-long-enough-too')
+    monkeypatch.setenv('AUTH_ENABLED', '1')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+    client = app.test_client()
+    client.codec = app.extensions['auth'].codec
+    return client
+
+
+def _headers(client, kind, subject_id):
+    token, _ = client.codec.issue(kind, subject_id, f'{kind}-{subject_id}')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _forbidden(response):
+    return response.status_code == 403 and response.get_json()['success'] is False
+
+
+def test_user_cannot_read_a_merchant_ledger(client):
+    response = client.get('/api/ledger/?merchant_id=1', headers=_headers(client, 'user', 1))
+    assert _forbidden(response)
+
+
+def test_user_may_read_its_own_ledger(client):
+    response = client.get('/api/ledger/?user_id=1', headers=_headers(client, 'user', 1))
+    assert response.status_code == 200
+
+
+def test_user_cannot_check_pickup_availability(client):
+    response = client.post('/api/pickups/availability', json={'pickup_request_ids': [1]},
+                           headers=_headers(client, 'user', 1))
+    assert _forbidden(response)
+
+
+@pytest.mark.parametrize('merchant_id', [1, 2])
+def test_user_cannot_send_a_merchant_id(client, merchant_id):
+    response = client.post('/api/inventory/scan', json={'merchant_id': merchant_id, 'codes': ['x']},
+                           headers=_headers(client, 'user', 1))
+    assert _forbidden(response)
+
+
+def test_user_may_name_the_merchant_it_orders_from(client):
+    response = client.post('/api/pickups/', json={'user_id': 1, 'merchant_id': 2},
+                           headers=_headers(client, 'user', 1))
+    assert response.status_code == 400  # Past the scope check, missing store_id and items
+
+
+def test_user_cannot_act_for_another_user(client):
+    response = client.get('/api/bills/?user_id=2', headers=_headers(client, 'user', 1))
+    assert _forbidden(response)
+
+
+def test_merchant_cannot_read_a_users_bills(client):
+    response = client.get('/api/bills/?user_id=1', headers=_headers(client, 'merchant', 1))
+    assert _forbidden(response)
+
+
+def test_merchant_cannot_sync_a_users_lists(client):
+    response = client.post('/api/shopping-lists/sync', json={'user_id': 1, 'mutations': []},
+                           headers=_headers(client, 'merchant', 1))
+    assert _forbidden(response)
+
+
+def test_merchant_cannot_act_for_another_merchant(client):
+    response = client.get('/api/ledger/?merchant_id=2&user_id=1', headers=_headers(client, 'merchant', 1))
+    assert _forbidden(response)
+
+
+def test_merchant_may_name_a_customer_with_its_own_merchant_id(client):
+    response = client.get('/api/ledger/?merchant_id=1&user_id=1', headers=_headers(client, 'merchant', 1))
+    assert response.status_code == 200
+
+
+def test_missing_token_is_unauthorized(client):
+    response = client.get('/api/ledger/?user_id=1')
+    assert response.status_code == 401
+
+
+def test_merchant_cannot_hide_another_merchant_id_in_the_body(client):
+    response = client.post('/api/bills/?merchant_id=1', json={'merchant_id': 2, 'user_id': 5, 'items': []},
+                           headers=_headers(client, 'merchant', 1))
+    assert _forbidden(response)
+
+
+def test_user_cannot_hide_another_user_id_in_the_body(client):
+    response = client.post('/api/shopping-lists/sync?user_id=9', json={'user_id': 5, 'mutations': []},
+                           headers=_headers(client, 'user', 9))
+    assert _forbidden(response)
+
+
+def test_user_cannot_repeat_user_id_in_the_query(client):
+    response = client.get('/api/bills/?user_id=1&user_id=2', headers=_headers(client, 'user', 1))
+    assert _forbidden(response)
+
+
+
+@pytest.fixture
+def bill(client):
+    """Bill 1, issued by merchant 2 to user 1 (users 1-2, merchants 1-2 exist)."""
+    from src.extensions import db
+    from src.models.bill import Bill
+    from src.models.merchant import Merchant
+    from src.models.user import User
+
+    with client.application.app_context():
+        db.session.add_all([
+            User(username=f'u{i}', email=f'u{i}@x', phone_number=f'1{i}', password_hash='x') for i in (1, 2)
+        ] + [
+            Merchant(business_name=f'm{i}', gst_number=f'g{i}', email=f'm{i}@x', phone_number=f'9{i}', password_hash='x')
+            for i in (1, 2)
+        ])
+        db.session.flush()
+        db.session.add(Bill(bill_number='B1', merchant_id=2, user_id=1, total_amount=10, status='pending'))
+        db.session.commit()
+    return 1
+
+
+def test_merchant_only_lists_the_customer_bills_it_issued(client, bill):
+    response = client.get('/api/bills/?merchant_id=1&user_id=1', headers=_headers(client, 'merchant', 1))
+    assert response.status_code == 200 and response.get_json()['bills'] == []
+    response = client.get('/api/bills/?merchant_id=2&user_id=1', headers=_headers(client, 'merchant', 2))
+    assert [row['id'] for row in response.get_json()['bills']] == [bill]
+
+
+def test_merchant_only_batches_the_customer_bills_it_issued(client, bill):
+    response = client.get(f'/api/bills/batch?merchant_id=1&user_id=1&ids={bill}', headers=_headers(client, 'merchant', 1))
+    assert response.get_json()['not_found'] == [bill]
+    response = client.get(f'/api/bills/batch?merchant_id=2&user_id=1&ids={bill}', headers=_headers(client, 'merchant', 2))
+    assert [row['id'] for row in response.get_json()['bills']] == [bill]
+
+
+@pytest.fixture
+def pickup(client, bill):
+    """Pickup request 1, made by user 1 with merchant 2."""
+    from src.extensions import db
+    from src.models.pickup_request import PickupRequest
+
+    with client.application.app_context():
+        db.session.add(PickupRequest(user_id=1, merchant_id=2, status='pending'))
+        db.session.commit()
+    return 1
+
+
+def test_user_cannot_fetch_another_users_bill(client, bill):
+    assert client.get(f'/api/bills/{bill}', headers=_headers(client, 'user', 2)).status_code == 404
+    assert client.get(f'/api/bills/{bill}', headers=_headers(client, 'user', 1)).status_code == 200
+
+
+def test_merchant_cannot_fetch_another_merchants_bill(client, bill):
+    assert client.get(f'/api/bills/{bill}', headers=_headers(client, 'merchant', 1)).status_code == 404
+    assert client.get(f'/api/bills/{bill}', headers=_headers(client, 'merchant', 2)).status_code == 200
+
+
+def test_merchant_cannot_record_a_payment_on_another_merchants_bill(client, bill):
+    payment = {'payment_method': 'cash', 'amount': 5}
+    response = client.post(f'/api/bills/{bill}/payment', json=payment, headers=_headers(client, 'merchant', 1))
+    assert response.status_code == 404
+    response = client.post(f'/api/bills/{bill}/payment', json=payment, headers=_headers(client, 'merchant', 2))
+    assert response.status_code == 201
+
+
+def test_merchant_cannot_move_another_merchants_pickup(client, pickup):
+    response = client.post(f'/api/pickups/{pickup}/status', json={'status': 'cancelled'},
+                           headers=_headers(client, 'merchant', 1))
+    assert response.status_code == 404
+    response = client.post(f'/api/pickups/{pickup}/status', json={'status': 'cancelled'},
+                           headers=_headers(client, 'merchant', 2))
+    assert response.status_code == 200
+
+
+def test_merchant_cannot_check_another_merchants_pickup(client, pickup):
+    response = client.post('/api/pickups/availability', json={'pickup_request_ids': [pickup], 'accept': True},
+                           headers=_headers(client, 'merchant', 1))
+    body = response.get_json()
+    assert body['not_found'] == [pickup] and body['pickup_requests'] == [] and body['accepted'] == []
+
+
+@pytest.mark.parametrize('name', ['JWT_SECRET_KEY', 'BILL_LINK_SECRET_KEY'])
+def test_app_refuses_to_start_without_a_signing_key(client, monkeypatch, name):
+    monkeypatch.delenv(name)
+    with pytest.raises(RuntimeError, match=name):
+        create_app()
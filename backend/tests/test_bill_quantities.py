@@ -0,0 +1,60 @@
+"""Line quantities accepted by POST /api/bills/ before any stock is taken."""
+import pytest
+
+from src.extensions import db, init_schema
+from src.main import create_app
+from src.models.inventory_service import InventoryService
+from src.models.merchant import Merchant
+from src.models.product import MerchantInventory, Product
+from src.models.user import User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'bill.db'}")
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        db.session.add(User(username='u', email='u@example.com', phone_number='1', password_hash='x'))
+        db.session.add(Merchant(business_name='m', gst_number='g', email='m@example.com', phone_number='2',
+                                password_hash='x'))
+        db.session.add(Product(name='p', base_price=1, sku='S1'))
+        db.session.flush()
+        db.session.add(MerchantInventory(merchant_id=1, product_id=1, stock_quantity=5, price=1))
+        db.session.commit()
+    return app
+
+
+def _create_bill(app, quantity):
+    return app.test_client().post('/api/bills/', json={
+        'merchant_id': 1,
+        'user_id': 1,
+        'items': [{'product_id': 1, 'product_name': 'p', 'quantity': quantity, 'unit_price': 1}]
+    })
+
+
+def _stock(app):
+    with app.app_context():
+        return db.session.execute(db.select(MerchantInventory.stock_quantity)).scalar()
+
+
+@pytest.mark.parametrize('quantity', [0, -3, 1.5, '2', True])
+def test_invalid_quantity_is_rejected_before_stock_moves(app, quantity):
+    response = _create_bill(app, quantity)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert _stock(app) == 5
+
+
+def test_valid_quantity_takes_stock(app):
+    assert _create_bill(app, 2).status_code == 201
+    assert _stock(app) == 3
+
+
+@pytest.mark.parametrize('quantity', [0, -1, 2.5])
+def test_aggregate_lines_rejects_invalid_quantity(quantity):
+    with pytest.raises(ValueError):
+        InventoryService.aggregate_lines([{'product_id': 1, 'quantity': quantity}])
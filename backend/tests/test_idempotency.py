@@ -0,0 +1,51 @@
+"""Idempotency keys are scoped to the caller (src/idempotency.py)."""
+import pytest
+
+from src.extensions import db, init_schema
+from src.main import create_app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'idempotency.db'}")
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough-for-hs256')
+    monkeypatch.setenv('BILL_LINK_SECRET_KEY', 'test-bill-link-key-that-is-long-enough-too')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        from src.models.bill import Bill
+        from src.models.merchant import Merchant
+        from src.models.user import User
+
+        init_schema()
+        db.session.add(User(username='u', email='u@x', phone_number='1', password_hash='x'))
+        db.session.add_all([
+            Merchant(business_name=f'm{i}', gst_number=f'g{i}', email=f'm{i}@x', phone_number=f'9{i}', password_hash='x')
+            for i in (1, 2)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            Bill(bill_number=f'B{i}', merchant_id=i, user_id=1, total_amount=10, status='pending') for i in (1, 2)
+        ])
+        db.session.commit()
+    return app.test_client()
+
+
+def _pay(client, merchant_id, key):
+    token, _ = client.application.extensions['auth'].codec.issue('merchant', merchant_id, f'merchant-{merchant_id}')
+    return client.post(f'/api/bills/{merchant_id}/payment', json={'payment_method': 'cash', 'amount': 5},
+                       headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': key})
+
+
+def test_same_key_from_two_merchants_is_two_requests(client):
+    first, second = _pay(client, 1, 'counter-1'), _pay(client, 2, 'counter-1')
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert first.get_json()['payment_id'] != second.get_json()['payment_id']
+    assert 'Idempotent-Replayed' not in second.headers
+
+
+def test_same_key_from_one_merchant_is_replayed(client):
+    first, second = _pay(client, 1, 'counter-1'), _pay(client, 1, 'counter-1')
+    assert second.headers.get('Idempotent-Replayed') == 'true'
+    assert second.get_json() == first.get_json()
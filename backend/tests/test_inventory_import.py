@@ -0,0 +1,76 @@
+"""Per-row errors of the bulk inventory import (InventoryImportService)."""
+import io
+
+import pytest
+
+from src.extensions import db, init_schema
+from src.main import create_app
+from src.models.import_service import InventoryImportService
+from src.models.merchant import Merchant, StoreLocation
+from src.models.product import MerchantInventory, Product
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'import.db'}")
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        db.session.add(Merchant(business_name='m', gst_number='g', email='m@example.com', phone_number='1',
+                                password_hash='x'))
+        db.session.flush()
+        db.session.add(StoreLocation(merchant_id=1, store_name='s', address_line1='a', location='0,0', state='s',
+                                     city='c', postal_code='1'))
+        db.session.add(Product(name='p', base_price=1, sku='S1'))
+        db.session.commit()
+    return app
+
+
+def _import(app, *lines):
+    with app.app_context():
+        return InventoryImportService.import_stream(1, io.StringIO('\n'.join(lines)), 'ndjson')
+
+
+def _stock(app):
+    with app.app_context():
+        return dict(db.session.execute(db.select(MerchantInventory.store_id, MerchantInventory.stock_quantity)).all())
+
+
+def test_unknown_product_fails_only_its_row(app):
+    report = _import(
+        app,
+        '{"product_id": 999, "store_id": 1, "price": 5, "stock_quantity": 1}',
+        '{"product_id": 1, "store_id": 1, "price": 5, "stock_quantity": 2}',
+    )
+    assert report['upserted'] == 1
+    assert report['errors'] == [{'line': 1, 'error': 'Unknown product 999'}]
+    assert _stock(app) == {1: 2}
+
+
+@pytest.mark.parametrize('stock_quantity', ['3.7', '"3.7"', '"abc"', 'true'])
+def test_fractional_stock_is_rejected(app, stock_quantity):
+    report = _import(app, f'{{"product_id": 1, "store_id": 1, "price": 5, "stock_quantity": {stock_quantity}}}')
+    assert report['upserted'] == 0
+    assert report['errors'][0]['error'].startswith('Invalid stock_quantity')
+
+
+def test_database_error_fails_only_its_row(app, monkeypatch):
+    write = InventoryImportService._write.__func__
+
+    def failing_write(cls, merchant_id, rows, now):
+        if any(row['store_id'] is None for row in rows):
+            raise RuntimeError('constraint failed')
+        return write(cls, merchant_id, rows, now)
+
+    monkeypatch.setattr(InventoryImportService, '_write', classmethod(failing_write))
+    report = _import(
+        app,
+        '{"product_id": 1, "store_id": 1, "price": 5, "stock_quantity": 2}',
+        '{"product_id": 1, "price": 5, "stock_quantity": 3}',
+    )
+    assert report['upserted'] == 1
+    assert report['errors'] == [{'line': 2, 'error': 'RuntimeError: constraint failed'}]
+    assert _stock(app) == {1: 2}
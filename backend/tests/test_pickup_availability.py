@@ -0,0 +1,79 @@
+"""Item statuses and stock reservations of POST /api/pickups/availability (PickupAvailabilityService)."""
+from datetime import datetime
+
+import pytest
+
+from src.extensions import db, init_schema
+from src.main import create_app
+from src.models.merchant import Merchant, StoreLocation
+from src.models.pickup_request import PickupRequest, PickupRequestItem
+from src.models.product import MerchantInventory, Product
+from src.models.user import User
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'pickup.db'}")
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        db.session.add(User(username='u', email='u@example.com', phone_number='1', password_hash='x'))
+        db.session.add(Merchant(business_name='m', gst_number='g', email='m@example.com', phone_number='2',
+                                password_hash='x'))
+        db.session.flush()
+        db.session.add(StoreLocation(merchant_id=1, store_name='s', address_line1='a', location='0,0', state='s',
+                                     city='c', postal_code='1'))
+        db.session.add(Product(name='p', base_price=1, sku='S1'))
+        db.session.flush()
+        db.session.add(MerchantInventory(merchant_id=1, store_id=1, product_id=1, stock_quantity=3, price=1))
+        for minute in (1, 2):
+            pickup_request = PickupRequest(user_id=1, merchant_id=1, store_id=1, status='pending',
+                                           requested_pickup_time=datetime(2030, 1, 1, 10, minute))
+            db.session.add(pickup_request)
+            db.session.flush()
+            db.session.add(PickupRequestItem(pickup_request_id=pickup_request.id, product_id=1, quantity=2))
+        db.session.commit()
+    return app
+
+
+def _state(app):
+    with app.app_context():
+        stock = db.session.execute(db.select(MerchantInventory.stock_quantity)).scalar()
+        statuses = dict(db.session.execute(
+            db.select(PickupRequestItem.id, PickupRequestItem.status).order_by(PickupRequestItem.id)
+        ).all())
+        return stock, statuses
+
+
+def _check(app, **options):
+    response = app.test_client().post('/api/pickups/availability', json={'pickup_request_ids': [1, 2], **options})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_check_writes_statuses_without_taking_stock(app):
+    _check(app)
+    assert _state(app) == (3, {1: 'available', 2: 'unavailable'})
+
+    _check(app)
+    assert _state(app) == (3, {1: 'available', 2: 'unavailable'})
+
+
+def test_reserve_takes_stock_once_and_cancel_returns_it(app):
+    _check(app)
+    _check(app, reserve=True)
+    assert _state(app) == (1, {1: 'available', 2: 'unavailable'})
+
+    # A reserved item is not checked or reserved again
+    _check(app, reserve=True)
+    assert _state(app) == (1, {1: 'available', 2: 'unavailable'})
+
+    response = app.test_client().post('/api/pickups/1/status', json={'status': 'cancelled'})
+    assert response.status_code == 200
+    assert _state(app)[0] == 3
+
+    _check(app, reserve=True)
+    assert _state(app) == (1, {1: 'available', 2: 'available'})
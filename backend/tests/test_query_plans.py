@@ -0,0 +1,166 @@
+"""
+Query-plan regression check for the API endpoints.
+
+Builds a throwaway SQLite database with the declared schema, calls every
+endpoint listed in scenarios() through the Flask test client, records each SQL
+statement the request runs and asks SQLite for its EXPLAIN QUERY PLAN. Any
+full table scan ("SCAN <table>" without an index) that is not listed in
+ALLOWED_SCANS fails the test.
+"""
+import re
+from datetime import time
+
+import pytest
+from sqlalchemy import event
+
+from src.extensions import init_schema
+from src.main import create_app, db
+from src.models.user import User
+from src.models.merchant import Merchant, StoreLocation
+from src.models.product import Product, ProductCategory
+from src.models.bill import Bill, Payment
+from src.models.sms_service import SMSService
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+# (scenario, table) pairs whose full scans are intended, e.g. ('categories.rebuild', 'product_categories')
+ALLOWED_SCANS = set()
+
+
+def seed():
+    user = User(username='plan', email='plan@example.com', phone_number='9000000001', password_hash='x')
+    merchant = Merchant(
+        business_name='Plan Stores', gst_number='GSTPLAN', email='shop@example.com',
+        phone_number='9000000002', password_hash='x'
+    )
+    db.session.add_all([user, merchant])
+    db.session.flush()
+
+    store = StoreLocation(
+        merchant_id=merchant.id, store_name='Main', address_line1='1 Road', city='City', state='State',
+        postal_code='000000', location='0,0', opening_time=time(0, 0), closing_time=time(23, 59)
+    )
+    category = ProductCategory(name='Groceries')
+    db.session.add_all([store, category])
+    db.session.flush()
+
+    product = Product(name='Rice', sku='RICE-1', barcode='890000000001', base_price=50, category_id=category.id)
+    db.session.add(product)
+    db.session.flush()
+
+    bill = Bill(bill_number='BILL-PLAN-1', merchant_id=merchant.id, store_id=store.id, user_id=user.id, total_amount=50)
+    db.session.add(bill)
+    db.session.flush()
+    db.session.add(Payment(bill_id=bill.id, payment_method='cash', amount=10))
+    db.session.commit()
+
+    return {
+        'user': user.id, 'merchant': merchant.id, 'store': store.id,
+        'category': category.id, 'product': product.id, 'bill': bill.id,
+        'token': SMSService.generate_temporary_link(bill.id, user.id)['token']
+    }
+
+
+def scenarios(ids):
+    """Yield (name, method, url, json body) for each endpoint to check."""
+    yield 'bills.list', 'GET', f"/api/bills/?user_id={ids['user']}&status=pending", None
+    yield 'bills.list_fields', 'GET', f"/api/bills/?user_id={ids['user']}&fields=id,total_amount,store_name&format=columnar", None
+    yield 'bills.get', 'GET', f"/api/bills/{ids['bill']}", None
+    yield 'bills.batch', 'GET', f"/api/bills/batch?user_id={ids['user']}&ids={ids['bill']},999999", None
+    yield 'bills.create', 'POST', '/api/bills/', {
+        'merchant_id': ids['merchant'], 'store_id': ids['store'], 'user_id': ids['user'],
+        'items': [{'product_id': ids['product'], 'product_name': 'Rice', 'quantity': 1, 'unit_price': 50}]
+    }
+    yield 'bills.payment', 'POST', f"/api/bills/{ids['bill']}/payment", {'payment_method': 'cash', 'amount': 5}
+    yield 'ledger.merchant', 'GET', f"/api/ledger/?merchant_id={ids['merchant']}", None
+    yield 'ledger.user', 'GET', f"/api/ledger/?user_id={ids['user']}&fields=merchant_name,balance", None
+    yield 'ledger.top_debtors', 'GET', f"/api/ledger/top-debtors?merchant_id={ids['merchant']}", None
+    yield 'auth.register', 'POST', '/api/auth/register', {
+        'username': 'plan-check', 'email': 'plan-check@example.com', 'phone_number': '5550000001', 'password': 'plan-check-pw'
+    }
+    yield 'auth.login', 'POST', '/api/auth/login', {'login': 'plan-check@example.com', 'password': 'plan-check-pw'}
+    yield 'sms.validate', 'GET', f"/api/sms/validate-link/{ids['token']}", None
+    yield 'stores.open', 'GET', f"/api/stores/open?store_ids={ids['store']}", None
+    yield 'search.products', 'GET', '/api/search/products?q=ric', None
+    yield 'search.autocomplete', 'GET', '/api/search/merchants/autocomplete?q=pla', None
+    yield 'categories.products', 'GET', f"/api/categories/{ids['category']}/products", None
+    yield 'categories.facets', 'GET', f"/api/categories/{ids['category']}/facets", None
+    yield 'inventory.import', 'POST', f"/api/inventory/import?merchant_id={ids['merchant']}&format=ndjson", (
+        f'{{"sku": "RICE-1", "store_id": {ids["store"]}, "price": 55, "stock_quantity": 10}}\n'
+    )
+    yield 'inventory.scan', 'POST', '/api/inventory/scan', {
+        'merchant_id': ids['merchant'], 'store_id': ids['store'], 'codes': ['890000000001']
+    }
+    yield 'shopping_lists.sync_push', 'POST', '/api/shopping-lists/sync', {
+        'user_id': ids['user'],
+        'mutations': [{'type': 'list', 'op': 'upsert', 'client_id': 'a', 'data': {'name': 'Weekly'}}]
+    }
+    yield 'shopping_lists.sync_pull', 'GET', f"/api/shopping-lists/sync?user_id={ids['user']}", None
+    yield 'pickups.create', 'POST', '/api/pickups/', {
+        'user_id': ids['user'], 'merchant_id': ids['merchant'], 'store_id': ids['store'],
+        'items': [{'product_id': ids['product'], 'quantity': 1}]
+    }
+    yield 'pickups.queue', 'GET', f"/api/pickups/queue?store_id={ids['store']}&include_items=1", None
+    yield 'pickups.queue_fields', 'GET', f"/api/pickups/queue?store_id={ids['store']}&fields=id,status&format=columnar", None
+    yield 'pickups.slots', 'GET', f"/api/pickups/slots?store_id={ids['store']}", None
+    yield 'pickups.availability', 'POST', '/api/pickups/availability', {'pickup_request_ids': [1]}
+    yield 'pickups.status', 'POST', '/api/pickups/1/status', {'status': 'accepted'}
+
+
+def explain(connection, statement, parameters):
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else ()
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'plans.db'}")
+    monkeypatch.delenv('DATABASE_REPLICA_URLS', raising=False)
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    monkeypatch.setenv('RATE_LIMIT_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    return create_app()
+
+
+def test_no_statement_does_a_full_scan(app):
+    captured = []
+    current = ['startup']
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            captured.append((current[0], statement, parameters))
+
+    with app.app_context():
+        init_schema()
+        ids = seed()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            client = app.test_client()
+            for name, method, url, body in scenarios(ids):
+                current[0] = name
+                kwargs = {'json': body} if isinstance(body, dict) else {'data': body}
+                response = client.open(url, method=method, **kwargs)
+                assert response.status_code < 400, (
+                    f'{name}: {method} {url} failed with {response.status_code}: '
+                    f'{response.get_data(as_text=True)[:200]}'
+                )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        failures = []
+        with db.engine.connect() as connection:
+            for name, statement, parameters in captured:
+                plan = explain(connection, statement, parameters)
+                # Subqueries and co-routines also show up as SCAN, only real tables count
+                scans = [
+                    match.group(1) for match in map(FULL_SCAN.match, plan)
+                    if match and match.group(1) in db.metadata.tables
+                ]
+                bad = [table for table in scans if (name, table) not in ALLOWED_SCANS]
+                if bad:
+                    failures.append(f'[{name}] {", ".join(bad)}: {" ".join(statement.split())[:160]}')
+
+    assert captured
+    assert not failures, '\n'.join(failures)
@@ -0,0 +1,48 @@
+"""Rate limit buckets are keyed on the authenticated principal (src/rate_limit.py)."""
+import pytest
+
+from src.extensions import init_schema
+from src.main import create_app
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'rate.db'}")
+    monkeypatch.setenv('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough-for-hs256')
+    monkeypatch.setenv('BILL_LINK_SECRET_KEY', 'test-bill-link-key-that-is-long-enough-too')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    monkeypatch.setenv('RATE_LIMIT_BACKEND', 'memory')
+    monkeypatch.setenv('RATE_LIMITS', 'bill_reads.user=0.001/2,bill_reads.ip=1000/1000')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+    return app
+
+
+def _get(client, app, user_id, token_user_id=None):
+    headers = {}
+    if token_user_id is not None:
+        token, _ = app.extensions['auth'].codec.issue('user', token_user_id, f'user-{token_user_id}')
+        headers['Authorization'] = f'Bearer {token}'
+    return client.get(f'/api/bills/?user_id={user_id}', headers=headers).status_code
+
+
+def test_user_bucket_is_keyed_on_the_token(app):
+    client = app.test_client()
+    assert [_get(client, app, 1, 1) for _ in range(3)] == [200, 200, 429]
+    assert _get(client, app, 2, 2) == 200
+
+
+def test_rejected_requests_do_not_drain_a_users_bucket(app):
+    client = app.test_client()
+    # Unauthenticated and wrong-subject requests naming user 1 are turned away before the limiter
+    assert [_get(client, app, 1) for _ in range(3)] == [401, 401, 401]
+    assert [_get(client, app, 1, 2) for _ in range(3)] == [403, 403, 403]
+    assert _get(client, app, 1, 1) == 200
+
+
+def test_without_auth_only_the_ip_bucket_applies(app, monkeypatch):
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    app = create_app()
+    client = app.test_client()
+    assert {_get(client, app, 1) for _ in range(5)} == {200}
@@ -0,0 +1,77 @@
+"""Weekly slot masks (src/models/store_hours_service.py)."""
+from datetime import datetime, time
+
+from src.models.store_hours_service import FULL_WEEK, SLOTS_PER_WEEK, StoreHoursService
+
+MONDAY = datetime(2026, 10, 19)
+
+
+def _slots(mask):
+    return [slot for slot in range(SLOTS_PER_WEEK) if mask >> slot & 1]
+
+
+def test_range_starting_mid_slot_covers_the_slot_it_ends_in():
+    start, end = MONDAY.replace(hour=9, minute=10), MONDAY.replace(hour=9, minute=20)
+    first = StoreHoursService.slot_for(MONDAY.replace(hour=9))
+    assert _slots(StoreHoursService.mask_for(start, end)) == [first, first + 1]
+
+
+def test_range_ending_on_a_boundary_stops_before_it():
+    start, end = MONDAY.replace(hour=9), MONDAY.replace(hour=10)
+    assert len(_slots(StoreHoursService.mask_for(start, end))) == 4
+
+
+def test_range_wraps_at_the_end_of_the_week():
+    start, end = datetime(2026, 10, 24, 23, 50), datetime(2026, 10, 25, 0, 10)  # Saturday into Sunday
+    assert _slots(StoreHoursService.mask_for(start, end)) == [0, SLOTS_PER_WEEK - 1]
+
+
+def test_week_long_range_covers_every_slot():
+    assert StoreHoursService.mask_for(MONDAY, datetime(2026, 10, 26)) == FULL_WEEK
+
+
+def test_store_closing_mid_range_is_not_open_for_it():
+    class Store:
+        is_active = True
+        opening_time = time(8, 0)
+        closing_time = time(9, 15)
+
+    bitmap = StoreHoursService.build_bitmap(Store(), [])
+    mask = StoreHoursService.mask_for(MONDAY.replace(hour=9, minute=10), MONDAY.replace(hour=9, minute=20))
+    assert bitmap & mask != mask
+
+
+def test_invalidation_during_a_read_is_not_overwritten(tmp_path, monkeypatch):
+    from sqlalchemy import event
+
+    from src.extensions import db, init_schema
+    from src.main import create_app
+    from src.models.merchant import Merchant, StoreLocation, StoreOperatingHours
+
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'hours.db'}")
+    monkeypatch.setenv('AUTH_ENABLED', '0')
+    monkeypatch.setenv('SLOW_QUERY_LOG', '0')
+    app = create_app()
+    with app.app_context():
+        init_schema()
+        db.session.add(Merchant(business_name='m', gst_number='g', email='m@x', phone_number='9', password_hash='x'))
+        db.session.flush()
+        store = StoreLocation(merchant_id=1, store_name='s', address_line1='a', location='0,0', state='s', city='c',
+                              postal_code='1')
+        db.session.add(store)
+        db.session.commit()
+        StoreHoursService.invalidate()
+
+        def invalidate_mid_read(state):
+            if state.is_select and StoreOperatingHours.__table__ in state.statement.get_final_froms():
+                StoreHoursService.invalidate([store.id])
+
+        event.listen(db.session, 'do_orm_execute', invalidate_mid_read)
+        try:
+            assert store.id in StoreHoursService.get_bitmaps([store.id])
+        finally:
+            event.remove(db.session, 'do_orm_execute', invalidate_mid_read)
+        assert store.id not in StoreHoursService._bitmaps
+
+        StoreHoursService.get_bitmaps([store.id])
+        assert store.id in StoreHoursService._bitmaps
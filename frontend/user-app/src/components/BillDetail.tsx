@@ -4,6 +4,7 @@ import { Badge } from "./ui/badge";
 import { Button } from "./ui/button";
 import { Separator } from "./ui/separator";
 import { format } from 'date-fns';
+import { authHeaders } from '../lib/auth';
 
 interface BillItem {
   id: number;
@@ -84,7 +85,9 @@ const BillDetail: React.FC<BillDetailProps> = ({ billId, onBack, onRecordPayment
       try {
         setLoading(true);
         // In a real implementation, this would be an API call
-        const response = await fetch(`/api/bills/${billId}`);
+        const response = await fetch(`/api/bills/${billId}`, {
+          headers: authHeaders(),
+        });
         
         if (!response.ok) {
           throw new Error('Failed to fetch bill details');
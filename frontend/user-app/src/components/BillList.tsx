@@ -4,6 +4,7 @@ import { Badge } from "./ui/badge";
 import { Button } from "./ui/button";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "./ui/tabs";
 import { format } from 'date-fns';
+import { authHeaders } from '../lib/auth';
 
 interface Bill {
   id: number;
@@ -16,6 +17,9 @@ interface Bill {
   status: string;
 }
 
+// Only the fields the list renders; the API projects its query to these
+const BILL_LIST_FIELDS = 'id,bill_number,merchant_name,store_name,bill_date,due_date,total_amount,status';
+
 interface BillListProps {
   userId: number;
   onViewBill: (billId: number) => void;
@@ -32,7 +36,9 @@ const BillList: React.FC<BillListProps> = ({ userId, onViewBill }) => {
       try {
         setLoading(true);
         // In a real implementation, this would be an API call
-        const response = await fetch(`/api/bills?user_id=${userId}`);
+        const response = await fetch(`/api/bills?user_id=${userId}&fields=${BILL_LIST_FIELDS}`, {
+          headers: authHeaders(),
+        });
         
         if (!response.ok) {
           throw new Error('Failed to fetch bills');
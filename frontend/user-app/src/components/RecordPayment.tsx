@@ -6,6 +6,7 @@ import { Label } from "./ui/label";
 import { RadioGroup, RadioGroupItem } from "./ui/radio-group";
 import { Separator } from "./ui/separator";
 import { format } from 'date-fns';
+import { authHeaders } from '../lib/auth';
 
 interface RecordPaymentProps {
   billId: number;
@@ -51,9 +52,9 @@ const RecordPayment: React.FC<RecordPaymentProps> = ({
       // In a real implementation, this would be an API call
       const response = await fetch(`/api/bills/${billId}/payment`, {
         method: 'POST',
-        headers: {
+        headers: authHeaders({
           'Content-Type': 'application/json',
-        },
+        }),
         body: JSON.stringify({
           payment_method: paymentMethod,
           amount: amountValue,
@@ -0,0 +1,8 @@
+// Where the sign-in flow keeps the access token from POST /api/auth/login
+export const ACCESS_TOKEN_KEY = "access_token"
+
+// Request headers with the bearer token the API requires, when signed in
+export function authHeaders(headers: Record<string, string> = {}): Record<string, string> {
+  const token = localStorage.getItem(ACCESS_TOKEN_KEY)
+  return token ? { ...headers, Authorization: `Bearer ${token}` } : headers
+}